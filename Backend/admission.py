@@ -0,0 +1,167 @@
+import math
+import threading
+import time
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Outcomes of an admission attempt
+ADMITTED = 'admitted'
+QUEUE_FULL = 'queue_full'
+TIMED_OUT = 'timed_out'
+
+# (concurrent requests, queued requests, queue-time budget in ms) per class.
+# Override with ADMISSION_<CLASS>=limit,queue,budget_ms, e.g. ADMISSION_CHAT=4,8,500
+DEFAULT_LIMITS = {
+    'auth': (8, 32, 2000),
+    'booking': (16, 64, 1000),
+    'dashboard': (16, 64, 2000),
+    'chat': (4, 8, 500),
+    'admin': (4, 16, 5000)
+}
+
+# View functions whose class cannot be told from the URL prefix
+ENDPOINT_CLASSES = {
+    'login': 'auth',
+    'logout': 'auth',
+    'chat_with_ai': 'chat',
+    'add_workout': 'booking',
+    'get_available_sessions': 'booking',
+    'book_session': 'booking',
+    'leave_session_waitlist': 'booking',
+    'cancel_session': 'booking'
+}
+
+ADMIN_PREFIXES = ('/api/admin/', '/api/dashboard/admin/')
+
+# A batch takes no slot itself; each of its sub-requests is admitted
+# against its own class
+BATCH_ENDPOINT = 'batch_requests'
+
+class EndpointClass:
+    """Concurrency limit with a bounded, time-budgeted wait queue.
+
+    Requests beyond the limit wait up to the queue budget for a slot. When
+    the queue itself is full they are rejected at once, so a slow class
+    (chat waiting on OpenAI) sheds its own excess instead of tying up the
+    workers every other class needs.
+    """
+
+    def __init__(self, name, limit, max_queue, queue_budget_ms):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_budget = queue_budget_ms / 1000.0
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_queue_time = 0.0
+        self.avg_service_time = 0.0  # exponentially weighted
+
+    def acquire(self):
+        with self._cond:
+            if self.in_flight < self.limit and self.queued == 0:
+                self.in_flight += 1
+                self.admitted += 1
+                return ADMITTED
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                return QUEUE_FULL
+
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            started = time.monotonic()
+            deadline = started + self.queue_budget
+            try:
+                while self.in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        return TIMED_OUT
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+
+            self.in_flight += 1
+            self.admitted += 1
+            self.total_queue_time += time.monotonic() - started
+            return ADMITTED
+
+    def split(self):
+        """Hand half of the limit to the async server's counterpart and return that half.
+
+        Under asgi_app one process admits requests on two paths, its
+        coroutine routes and the Flask routes it falls through to, so each
+        gets a share and together they stay within the class limit. A limit
+        of 1 cannot be split and is kept by both.
+        """
+        with self._cond:
+            share = max(1, self.limit // 2)
+            self.limit = max(1, self.limit - share)
+            return share
+
+    def release(self, service_time):
+        with self._cond:
+            self.in_flight -= 1
+            if self.avg_service_time:
+                self.avg_service_time = 0.9 * self.avg_service_time + 0.1 * service_time
+            else:
+                self.avg_service_time = service_time
+            self._cond.notify()
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained, at least 1."""
+        with self._cond:
+            backlog = self.queued + self.in_flight
+            return max(1, math.ceil(self.avg_service_time * backlog / self.limit))
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'maxQueue': self.max_queue,
+                'queueBudgetMs': int(self.queue_budget * 1000),
+                'inFlight': self.in_flight,
+                'queueDepth': self.queued,
+                'peakQueueDepth': self.peak_queued,
+                'admitted': self.admitted,
+                'rejectedQueueFull': self.rejected_queue_full,
+                'rejectedTimeout': self.rejected_timeout,
+                'avgQueueMs': round(self.total_queue_time * 1000 / self.admitted, 2) if self.admitted else 0.0,
+                'avgServiceMs': round(self.avg_service_time * 1000, 2)
+            }
+
+def _load_classes():
+    classes = {}
+    for name, (limit, max_queue, budget_ms) in DEFAULT_LIMITS.items():
+        override = os.getenv(f'ADMISSION_{name.upper()}')
+        if override:
+            limit, max_queue, budget_ms = (int(part) for part in override.split(','))
+        classes[name] = EndpointClass(name, limit, max_queue, budget_ms)
+    return classes
+
+CLASSES = _load_classes()
+
+# Event-loop counterparts registered by asgi_app, reported with their class
+ASYNC_CLASSES = {}
+
+def classify(endpoint, path):
+    """Return the EndpointClass for a request, or None for non-API routes and batches."""
+    if not path.startswith('/api/') or endpoint == BATCH_ENDPOINT:
+        return None
+    name = ENDPOINT_CLASSES.get(endpoint)
+    if name is None:
+        name = 'admin' if path.startswith(ADMIN_PREFIXES) else 'dashboard'
+    return CLASSES[name]
+
+def get_metrics():
+    metrics = {name: endpoint_class.metrics() for name, endpoint_class in CLASSES.items()}
+    for name, async_class in ASYNC_CLASSES.items():
+        metrics[name]['async'] = async_class.metrics()
+    return metrics
@@ -7,8 +7,43 @@ load_dotenv()
 
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
-def generate_smart_ai_response(question, member_info, workouts, health_metrics, sessions):
-    """Generate intelligent AI responses using OpenAI GPT-4."""
+CHAT_MODEL = "gpt-4o-mini"  # Using GPT-4o mini for cost efficiency
+
+SUMMARY_MAX_TOKENS = 300
+
+_async_client = None
+
+# Identical for every member and request, so it opens every prompt and the
+# provider can serve it from its prompt cache
+COACH_INSTRUCTIONS = """You are an expert AI fitness coach and personal trainer assistant for GymFit. You have access to the member's complete fitness data and should provide personalized, actionable advice.
+
+**Instructions:**
+1. Provide personalized, specific advice based on the member's actual data
+2. Use markdown formatting for better readability (headers, lists, bold, etc.)
+3. Be motivating, supportive, and professional
+4. Include specific numbers and data points from their history
+5. When suggesting workout plans, consider their current activity level
+6. Always back your advice with reasoning based on their data
+7. Use emojis sparingly for visual appeal
+8. Keep responses concise but informative (aim for 150-300 words unless asked for detailed plans)
+9. If asked about workout plans, create specific day-by-day schedules
+10. Reference their actual workout history when making suggestions
+11. Earlier turns of the conversation and a summary of older ones may follow; stay consistent with them
+12. The member's current data is given just before their latest question and supersedes figures quoted earlier"""
+
+SUMMARY_INSTRUCTIONS = """Summarize this conversation between a gym member and their AI fitness coach so the coach can continue it later. Keep the member's goals, preferences, injuries or limitations, plans and schedules agreed on, and open questions. Drop greetings and figures that can be looked up again. Write at most 150 words in the third person."""
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for prompt budgeting."""
+    return max(1, (len(text) + 3) // 4)
+
+def build_prompt(member_info, workouts, health_metrics, sessions):
+    """Build the member profile, the current data snapshot and the data-only fallback reply.
+
+    The profile only changes with the membership, so it stays part of the
+    cacheable prompt prefix; the snapshot changes as data is logged and is
+    sent after the conversation history.
+    """
     
     # Calculate statistics
     total_workouts = len(workouts)
@@ -55,15 +90,14 @@ def generate_smart_ai_response(question, member_info, workouts, health_metrics,
             'time': str(session['SessionTime']) if session['SessionTime'] else 'N/A'
         })
     
-    # Build context for AI
-    context = f"""You are an expert AI fitness coach and personal trainer assistant for GymFit. You have access to the member's complete fitness data and should provide personalized, actionable advice.
-
-**Member Profile:**
+    profile = f"""**Member Profile:**
 - Name: {member_info['Name']}
 - Age: {member_info['Age']}
 - Membership: {member_info['MembershipType']} (member since {member_info['JoinDate'].strftime('%B %Y')})
 
-**Recent Activity (Last 30 Days):**
+Remember: You're talking to {member_info['Name']}, a real person with real goals. Make your advice actionable and personalized."""
+
+    snapshot = f"""**Recent Activity (Last 30 Days):**
 - Total workouts: {total_workouts}
 - Average workout duration: {avg_duration:.1f} minutes
 - Total calories burned: {total_calories:.0f} kcal
@@ -80,39 +114,9 @@ def generate_smart_ai_response(question, member_info, workouts, health_metrics,
 - Water intake: {current_water} liters
 
 **Upcoming Sessions:**
-{upcoming_session_summary if upcoming_session_summary else 'No sessions booked'}
+{upcoming_session_summary if upcoming_session_summary else 'No sessions booked'}"""
 
-**Instructions:**
-1. Provide personalized, specific advice based on the member's actual data
-2. Use markdown formatting for better readability (headers, lists, bold, etc.)
-3. Be motivating, supportive, and professional
-4. Include specific numbers and data points from their history
-5. When suggesting workout plans, consider their current activity level
-6. Always back your advice with reasoning based on their data
-7. Use emojis sparingly for visual appeal
-8. Keep responses concise but informative (aim for 150-300 words unless asked for detailed plans)
-9. If asked about workout plans, create specific day-by-day schedules
-10. Reference their actual workout history when making suggestions
-
-Remember: You're talking to {member_info['Name']}, a real person with real goals. Make your advice actionable and personalized."""
-
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",  # Using GPT-4o mini for cost efficiency
-            messages=[
-                {"role": "system", "content": context},
-                {"role": "user", "content": question}
-            ],
-            temperature=0.7,
-            max_tokens=800
-        )
-        
-        return response.choices[0].message.content
-        
-    except Exception as e:
-        print(f"OpenAI API Error: {e}")
-        # Fallback response
-        return f"""I apologize, but I'm having trouble connecting to my AI brain right now. 
+    fallback = f"""I apologize, but I'm having trouble connecting to my AI brain right now. 
 
 **However, here's what I can tell you from your data:**
 
@@ -126,4 +130,97 @@ Remember: You're talking to {member_info['Name']}, a real person with real goals
 - Steps: {current_steps}
 - Sleep: {current_sleep} hours
 
-Please try your question again, or contact support if the issue persists."""
\ No newline at end of file
+Please try your question again, or contact support if the issue persists."""
+
+    return profile, snapshot, fallback
+
+def build_messages(profile, snapshot, question, conversation=None):
+    """Order the prompt from most to least stable: instructions, profile,
+    summary and history (append-only between summaries) form a prefix that
+    repeats across a member's requests; current data and the question come last.
+
+    conversation (a chat_memory.Conversation) contributes its summary and as
+    much recent history as fits in the prompt token budget.
+    """
+    head = [
+        {"role": "system", "content": COACH_INSTRUCTIONS},
+        {"role": "system", "content": profile}
+    ]
+    if conversation and conversation.summary:
+        head.append({"role": "system", "content": f"**Summary of the earlier conversation:**\n{conversation.summary}"})
+    tail = [
+        {"role": "system", "content": f"**Current member data:**\n\n{snapshot}"},
+        {"role": "user", "content": question}
+    ]
+    history = []
+    if conversation:
+        history = conversation.fit(sum(estimate_tokens(message['content']) for message in head + tail))
+    return head + history + tail
+
+def _usage(response):
+    usage = response.usage
+    if usage is None:
+        return None
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'promptTokens': usage.prompt_tokens,
+        'cachedTokens': (getattr(details, 'cached_tokens', None) or 0) if details else 0,
+        'completionTokens': usage.completion_tokens
+    }
+
+def generate_smart_ai_response(question, member_info, workouts, health_metrics, sessions, conversation=None):
+    """Generate intelligent AI responses using OpenAI GPT-4.
+
+    Returns (reply, usage); usage is None when the fallback reply was used.
+    """
+    profile, snapshot, fallback = build_prompt(member_info, workouts, health_metrics, sessions)
+    try:
+        response = openai.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=build_messages(profile, snapshot, question, conversation),
+            temperature=0.7,
+            max_tokens=800
+        )
+        return response.choices[0].message.content, _usage(response)
+    except Exception as e:
+        print(f"OpenAI API Error: {e}")
+        return fallback, None
+
+async def generate_smart_ai_response_async(question, member_info, workouts, health_metrics, sessions, conversation=None):
+    """Same as generate_smart_ai_response, awaiting the OpenAI call instead of blocking."""
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(api_key=openai.api_key)
+
+    profile, snapshot, fallback = build_prompt(member_info, workouts, health_metrics, sessions)
+    try:
+        response = await _async_client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=build_messages(profile, snapshot, question, conversation),
+            temperature=0.7,
+            max_tokens=800
+        )
+        return response.choices[0].message.content, _usage(response)
+    except Exception as e:
+        print(f"OpenAI API Error: {e}")
+        return fallback, None
+
+def summarize_conversation(summary, messages):
+    """Fold older chat messages (and the previous summary) into a new summary. None on failure."""
+    transcript = '\n\n'.join(f"{message['Role']}: {message['Content']}" for message in messages)
+    if summary:
+        transcript = f"Summary so far:\n{summary}\n\nLater messages:\n{transcript}"
+    try:
+        response = openai.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {"role": "user", "content": transcript}
+            ],
+            temperature=0.2,
+            max_tokens=SUMMARY_MAX_TOKENS
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"OpenAI API Error while summarizing: {e}")
+        return None
@@ -1,15 +1,35 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, g
 from flask_cors import CORS
-import mysql.connector
 from mysql.connector import Error
 from datetime import datetime, timedelta
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from recommendations import generate_workout_recommendations
-from notifications import check_membership_renewals
-from ai_chatbot import generate_smart_ai_response
+from notifications import BROADCAST_TYPES, broadcast, check_membership_renewals, mark_notifications_read, member_notifications
+from gym_stats import get_gym_breakdown, sum_gym_breakdown, reconcile_gym_stats
+import admission
+import db
+import auth
+import booking
+from chart_data import to_series
+from reference_data import reference_data
+from shard_router import shard_router
+from session_index import session_index
+from leaderboard import leaderboards, METRICS as LEADERBOARD_METRICS
+from member_analytics import member_analytics
+from chat_router import chat_router, classify_question, answer_question
+from workout_journal import workout_journal, validate_workout, WRITE_BEHIND_ENABLED
+from ai_chatbot import generate_smart_ai_response, estimate_tokens
+from chat_memory import chat_memory
+from cold_archive import cold_archive, merge_series
+import outbox
+from outbox import outbox_consumer
+from profiler import route_profiler
+from traffic_capture import traffic_capture
+from streaks import member_streaks
 
 load_dotenv()
 
@@ -29,22 +49,49 @@ app.config['SESSION_TYPE'] = 'filesystem'  # Add this line
 CORS(app, supports_credentials=True, origins=['http://localhost:5000', 'http://127.0.0.1:5000'])
 
 # --- Database Configuration ---
-# It is recommended to use environment variables for database credentials in production.
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'GymFitDB')
-}
-
-def get_db_connection():
-    """Create and return a new database connection."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+# Credentials come from the environment (see db.py); connections are pooled
+# per shard and routed by the gym in the session (see shard_router.py).
+
+def get_db_connection(gym_id=None):
+    """Borrow a pooled database connection; close() hands it back to the pool.
+
+    Connects to the shard of gym_id, or of the logged-in user's gym when
+    none is given (admins use the default shard). Inside a batch sub-request
+    the session's connection is the one shared by its lane.
+    """
+    if gym_id is None:
+        shared = g.get('shared_connection')
+        if shared is not None:
+            return shared
+        gym_id = session.get('gym_id')
+    return db.get_connection(shard_router.shard_for_gym(gym_id))
+
+def _emit_flushed_workouts(conn, entries):
+    for entry in entries:
+        outbox.emit(conn, outbox.WORKOUT_LOGGED, entry['member_id'], date=entry['date'], journal_seq=entry['seq'])
+
+# Gym -> shard directory; read before anything that loads from every shard
+if not shard_router.start():
+    print("Shard directory not loaded: default shard unreachable, retrying in the background.")
+
+# Gym, membership type and trainer lookups are served from memory
+if not reference_data.start():
+    print("Reference data cache not warmed: MySQL unreachable, loading on first use.")
+
+# Side effects of writes (notifications, cache refreshes) arrive through the outbox
+outbox_consumer.start()
+
+# Opt-in anonymized request log for Benchmarks/traffic_replay.py
+traffic_capture.start()
+
+# Optional write-behind mode for add_workout; replays the journal on startup.
+# The journal flushes to the default shard only, so it is not used with shards.
+if WRITE_BEHIND_ENABLED and shard_router.enabled:
+    print("Workout write-behind disabled: not supported with DB_SHARDS.")
+elif WRITE_BEHIND_ENABLED:
+    workout_journal.on_applied = _emit_flushed_workouts
+    if not workout_journal.start():
+        print("Workout write-behind disabled: could not recover the journal position from MySQL.")
 
 # --- Utilities & Decorators ---
 
@@ -77,6 +124,78 @@ def role_required(required_role):
         return decorated_function
     return decorator
 
+# --- Traffic Capture ---
+
+@app.before_request
+def start_capture():
+    if traffic_capture.enabled and not g.get('batch_subrequest') and traffic_capture.sampled():
+        g.capture_started = time.perf_counter()
+    return None
+
+@app.after_request
+def capture_request(response):
+    """Record the anonymized request in the traffic capture (batch sub-requests go with their batch)."""
+    # Requests shed by admission control are part of the mix too
+    started = g.pop('capture_started', None)
+    if started is not None:
+        traffic_capture.record(request, session, response.status_code, time.perf_counter() - started)
+    return response
+
+# --- Shard Routing ---
+
+@app.before_request
+def refuse_frozen_writes():
+    """Gyms being moved between shards stay readable but take no writes."""
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or not shard_router.enabled:
+        return None
+    if shard_router.is_frozen(session.get('gym_id')):
+        return jsonify({'error': 'Your gym is being moved to a new server. Please retry shortly.'}), 503, {'Retry-After': '5'}
+    return None
+
+# --- Admission Control ---
+
+@app.before_request
+def admit_request():
+    """Admit API requests per endpoint class, shedding excess with 429/503."""
+    endpoint_class = admission.classify(request.endpoint, request.path)
+    if endpoint_class is None:
+        return None
+
+    outcome = endpoint_class.acquire()
+    if outcome == admission.QUEUE_FULL:
+        return jsonify({'error': 'Too many requests. Please retry shortly.'}), 429, {'Retry-After': str(endpoint_class.retry_after())}
+    if outcome == admission.TIMED_OUT:
+        return jsonify({'error': 'Server is busy. Please retry shortly.'}), 503, {'Retry-After': str(endpoint_class.retry_after())}
+
+    g.admission = (endpoint_class, time.monotonic())
+    return None
+
+@app.teardown_request
+def release_admission(error):
+    admitted = g.pop('admission', None)
+    if admitted:
+        endpoint_class, started = admitted
+        endpoint_class.release(time.monotonic() - started)
+
+# --- Profiling ---
+
+@app.before_request
+def start_profiling():
+    """Profile a sample of requests while an admin has profiling switched on."""
+    if not route_profiler.enabled or request.url_rule is None:
+        return None
+    # A batch is profiled through its sub-requests; the profiler's own routes not at all
+    if request.endpoint == 'batch_requests' or request.path.startswith('/api/admin/profiling'):
+        return None
+    g.profile_run = route_profiler.start(f"{request.method} {request.url_rule.rule}", request.endpoint)
+    return None
+
+@app.teardown_request
+def stop_profiling(error):
+    run = g.pop('profile_run', None)
+    if run is not None:
+        route_profiler.stop(run)
+
 # --- Main Routes ---
 
 @app.route('/')
@@ -95,37 +214,37 @@ def login():
     if not all([email, password, role]):
         return jsonify({'error': 'Email, password, and role are required.'}), 400
 
-    conn = get_db_connection()
+    if role not in auth.ROLE_TABLES:
+        return jsonify({'error': 'Invalid role specified.'}), 400
+
+    try:
+        # Members and trainers sign in on the shard that holds their gym
+        shard = shard_router.locate_user(email, role)
+    except Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    if shard is None:
+        return jsonify({'error': 'Invalid credentials or role.'}), 401
+
+    conn = db.get_connection(shard)
     if not conn:
         return jsonify({'error': 'Database connection failed.'}), 500
     
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        table_map = {
-            'member': ('Member', 'M_ID'),
-            'trainer': ('Trainer', 'T_ID'),
-            'admin': ('Admin', 'A_ID')
-        }
-        
-        if role not in table_map:
-            return jsonify({'error': 'Invalid role specified.'}), 400
+        user = auth.authenticate(conn, email, password, role)
 
-        table_name, id_column = table_map[role]
-        
-        # Passwords are now hashed.
-        query = f"SELECT {id_column} as user_id, Name, Email, Password FROM {table_name} WHERE Email = %s"
-        cursor.execute(query, (email,))
-        user_data = cursor.fetchone()
+        if user:
+            # Persist a transparently upgraded password hash, if any
+            conn.commit()
+            user_id, name = user
 
-        if user_data and check_password_hash(user_data['Password'], password):
             # Clear any existing session data first
             session.clear()
             
             # Set session data
-            session['user_id'] = user_data['user_id']
-            session['user_name'] = user_data['Name']
+            session['user_id'] = user_id
+            session['user_name'] = name
             session['user_role'] = role
+            session['gym_id'] = shard_router.user_gym(conn, role, user_id)
             session.permanent = True  # Make session permanent
             
             # Force session to be saved
@@ -133,8 +252,8 @@ def login():
             
             response = jsonify({
                 'success': True,
-                'user_id': user_data['user_id'],
-                'name': user_data['Name'],
+                'user_id': user_id,
+                'name': name,
                 'role': role
             })
             
@@ -142,10 +261,12 @@ def login():
         else:
             return jsonify({'error': 'Invalid credentials or role.'}), 401
             
+    except auth.KDFOverloaded:
+        return jsonify({'error': 'Too many login attempts in progress. Please retry shortly.'}), 503, {'Retry-After': '1'}
     except Error as e:
+        conn.rollback()
         return jsonify({'error': f'Database query failed: {e}'}), 500
     finally:
-        cursor.close()
         conn.close()
 
 @app.route('/api/logout', methods=['POST'])
@@ -155,6 +276,49 @@ def logout():
     return jsonify({'success': True, 'message': 'You have been logged out.'})
 
 # --- Member Dashboard ---
+
+# Hot dashboard queries, run as cached prepared statements on pooled connections.
+# Gym, membership type and trainer names come from the reference cache, not joins.
+MEMBER_INFO_QUERY = """
+    SELECT M_ID, Name, Email, Age, JoinDate, MembershipType_ID, Gym_ID
+    FROM Member
+    WHERE M_ID = %s
+"""
+
+TODAY_STATS_QUERY = """
+    SELECT 
+        COALESCE(SUM(CaloriesBurnt), 0) AS TodayCalories,
+        COALESCE(SUM(Distance), 0) AS TodayDistance,
+        COUNT(*) AS TodayWorkouts
+    FROM WorkoutLog
+    WHERE M_ID = %s AND Date = CURDATE()
+"""
+
+TODAY_HEALTH_QUERY = """
+    SELECT Weight, Height, SleepHours, WaterLiters, Steps 
+    FROM HealthMetrics
+    WHERE M_ID = %s AND Date = CURDATE()
+    ORDER BY Metric_ID DESC LIMIT 1
+"""
+
+RECENT_WORKOUTS_QUERY = """
+    SELECT wl.L_ID, wl.Exercise, wl.Date, wl.Duration, wl.CaloriesBurnt, s.Details AS SessionDetails
+    FROM WorkoutLog wl
+    LEFT JOIN Session s ON wl.S_ID = s.S_ID
+    WHERE wl.M_ID = %s
+    ORDER BY wl.Date DESC, wl.L_ID DESC
+    LIMIT 5
+"""
+
+UPCOMING_SESSIONS_QUERY = """
+    SELECT s.S_ID, s.Details, s.SessionDate, s.SessionTime, s.T_ID, wl.L_ID as BookingID
+    FROM WorkoutLog wl
+    JOIN Session s ON wl.S_ID = s.S_ID
+    WHERE wl.M_ID = %s AND s.SessionDate >= CURDATE() AND wl.Exercise = 'Session Booking'
+    ORDER BY s.SessionDate, s.SessionTime
+    LIMIT 5
+"""
+
 @app.route('/api/dashboard/member/<int:member_id>', methods=['GET'])
 @login_required
 @role_required('member')
@@ -167,113 +331,104 @@ def get_member_dashboard(member_id):
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
-    cursor = conn.cursor(dictionary=True)
-    
     try:
         # Get member info
-        cursor.execute("""
-            SELECT m.M_ID, m.Name, m.Email, m.Age, m.JoinDate, mt.Name AS MembershipType, g.Location AS GymLocation
-            FROM Member m
-            LEFT JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-            LEFT JOIN Gym g ON m.Gym_ID = g.Gym_ID
-            WHERE m.M_ID = %s
-        """, (member_id,))
-        member_info = cursor.fetchone()
+        member_info = reference_data.resolve_member(db.query_one(conn, MEMBER_INFO_QUERY, (member_id,)))
         
         # Get today's workout stats
-        cursor.execute("""
-            SELECT 
-                COALESCE(SUM(CaloriesBurnt), 0) AS TodayCalories,
-                COALESCE(SUM(Distance), 0) AS TodayDistance,
-                COUNT(*) AS TodayWorkouts
-            FROM WorkoutLog
-            WHERE M_ID = %s AND Date = CURDATE()
-        """, (member_id,))
-        today_stats = cursor.fetchone()
+        today_stats = db.query_one(conn, TODAY_STATS_QUERY, (member_id,))
         
         # Get latest health metrics for today
-        cursor.execute("""
-            SELECT Weight, Height, SleepHours, WaterLiters, Steps 
-            FROM HealthMetrics
-            WHERE M_ID = %s AND Date = CURDATE()
-            ORDER BY Metric_ID DESC LIMIT 1
-        """, (member_id,))
-        health_metrics = cursor.fetchone()
+        health_metrics = db.query_one(conn, TODAY_HEALTH_QUERY, (member_id,))
         
         # Get recent workout logs
-        cursor.execute("""
-            SELECT wl.L_ID, wl.Exercise, wl.Date, wl.Duration, wl.CaloriesBurnt, s.Details AS SessionDetails
-            FROM WorkoutLog wl
-            LEFT JOIN Session s ON wl.S_ID = s.S_ID
-            WHERE wl.M_ID = %s
-            ORDER BY wl.Date DESC, wl.L_ID DESC
-            LIMIT 5
-        """, (member_id,))
-        recent_workouts = cursor.fetchall()
+        recent_workouts = db.query_all(conn, RECENT_WORKOUTS_QUERY, (member_id,))
         
         # Get upcoming booked sessions
-        cursor.execute("""
-            SELECT s.S_ID, s.Details, s.SessionDate, s.SessionTime, t.Name AS TrainerName, wl.L_ID as BookingID
-            FROM WorkoutLog wl
-            JOIN Session s ON wl.S_ID = s.S_ID
-            JOIN Trainer t ON s.T_ID = t.T_ID
-            WHERE wl.M_ID = %s AND s.SessionDate >= CURDATE() AND wl.Exercise = 'Session Booking'
-            ORDER BY s.SessionDate, s.SessionTime
-            LIMIT 5
-        """, (member_id,))
-        upcoming_sessions = cursor.fetchall()
+        upcoming_sessions = db.query_all(conn, UPCOMING_SESSIONS_QUERY, (member_id,))
+        reference_data.resolve(upcoming_sessions, 'trainers', 'T_ID', {'Name': 'TrainerName'})
+        
+        # Streaks, weekly goal and consistency, kept in memory per member
+        streaks = member_streaks.summary(conn, member_id)
         
         return jsonify({
             'member': member_info,
             'todayStats': today_stats,
             'healthMetrics': health_metrics,
             'recentWorkouts': [dict(row) for row in recent_workouts],
-            'upcomingSessions': [dict(row) for row in upcoming_sessions]
+            'upcomingSessions': [dict(row) for row in upcoming_sessions],
+            'streaks': streaks
         })
         
     except Error as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cursor.close()
         conn.close()
 
+WORKOUT_FREQUENCY_QUERY = """
+    SELECT Date, COUNT(*) as workout_count
+    FROM WorkoutLog
+    WHERE M_ID = %s AND Date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+    GROUP BY Date
+    ORDER BY Date
+"""
+
+WEIGHT_PROGRESS_QUERY = """
+    SELECT Date, Weight
+    FROM HealthMetrics
+    WHERE M_ID = %s AND Weight IS NOT NULL
+    ORDER BY Date
+"""
+
+CALORIE_TREND_QUERY = """
+    SELECT Date, SUM(CaloriesBurnt) as daily_calories
+    FROM WorkoutLog
+    WHERE M_ID = %s AND CaloriesBurnt IS NOT NULL
+    GROUP BY Date
+    ORDER BY Date
+"""
+
 @app.route('/api/member/<int:member_id>/progress', methods=['GET'])
 @login_required
 @role_required('member')
 def get_member_progress(member_id):
     """Get comprehensive progress data for charts"""
+    # format=columnar returns parallel arrays; points=N downsamples long series (LTTB)
+    columnar = request.args.get('format') == 'columnar'
+    try:
+        points = max(int(request.args.get('points', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid points value.'}), 400
+
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    cursor = conn.cursor(dictionary=not columnar)
     try:
         # Weekly workout frequency
-        cursor.execute("""
-            SELECT Date, COUNT(*) as workout_count
-            FROM WorkoutLog
-            WHERE M_ID = %s AND Date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY Date
-            ORDER BY Date
-        """, (member_id,))
+        cursor.execute(WORKOUT_FREQUENCY_QUERY, (member_id,))
         workout_frequency = cursor.fetchall()
 
         # Weight progress
-        cursor.execute("""
-            SELECT Date, Weight
-            FROM HealthMetrics
-            WHERE M_ID = %s AND Weight IS NOT NULL
-            ORDER BY Date
-        """, (member_id,))
+        cursor.execute(WEIGHT_PROGRESS_QUERY, (member_id,))
         weight_progress = cursor.fetchall()
 
         # Calories burned trend
-        cursor.execute("""
-            SELECT Date, SUM(CaloriesBurnt) as daily_calories
-            FROM WorkoutLog
-            WHERE M_ID = %s AND CaloriesBurnt IS NOT NULL
-            GROUP BY Date
-            ORDER BY Date
-        """, (member_id,))
+        cursor.execute(CALORIE_TREND_QUERY, (member_id,))
         calorie_trend = cursor.fetchall()
 
+        # Months moved to the cold archive
+        archived_weights, archived_calories = cold_archive.progress(member_id)
+        weight_progress = merge_series(archived_weights, weight_progress, ('Date', 'Weight'), not columnar)
+        calorie_trend = merge_series(archived_calories, calorie_trend, ('Date', 'daily_calories'), not columnar,
+                                     summed=True)
+
+        if columnar:
+            return jsonify({
+                'workoutFrequency': to_series(workout_frequency, 'counts', typecode='l'),
+                'weightProgress': to_series(weight_progress, 'weights', points),
+                'calorieTrend': to_series(calorie_trend, 'calories', points)
+            })
+
         return jsonify({
             'workoutFrequency': [dict(row) for row in workout_frequency],
             'weightProgress': [dict(row) for row in weight_progress],
@@ -293,9 +448,124 @@ def get_recommendations(member_id):
     if session['user_id'] != member_id:
         return jsonify({'error': 'You are not authorized to access this resource.'}), 403
     
-    recommendations = generate_workout_recommendations(member_id)
+    conn = get_db_connection()
+    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        recommendations = generate_workout_recommendations(member_id, conn)
+    finally:
+        conn.close()
     return jsonify({'recommendations': recommendations})
 
+@app.route('/api/member/<int:member_id>/leaderboard', methods=['GET'])
+@login_required
+@role_required('member')
+def get_leaderboard(member_id):
+    """Weekly top-N for the member's gym, plus the member's own rank"""
+    if session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}), 403
+
+    metric = request.args.get('metric', 'calories')
+    if metric not in LEADERBOARD_METRICS:
+        return jsonify({'error': f"Invalid metric. Use one of: {', '.join(LEADERBOARD_METRICS)}."}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit.'}), 400
+
+    conn = get_db_connection()
+    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    cursor = conn.cursor()
+    try:
+        gym_id = leaderboards.get_gym_id(cursor, member_id)
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+    if gym_id is None:
+        return jsonify({'error': 'Member not found'}), 404
+
+    if request.args.get('week') == 'previous':
+        previous = leaderboards.previous_week(gym_id, metric)
+        return jsonify({
+            'metric': metric,
+            'weekStart': previous['weekStart'] if previous else None,
+            'top': previous['top'][:limit] if previous else []
+        })
+
+    return jsonify({
+        'metric': metric,
+        'weekStart': leaderboards.week_start.isoformat() if leaderboards.week_start else None,
+        'top': leaderboards.top(gym_id, metric, limit),
+        'me': leaderboards.rank(gym_id, metric, member_id)
+    })
+
+@app.route('/api/member/<int:member_id>/leaderboard/rank', methods=['GET'])
+@login_required
+@role_required('member')
+def get_leaderboard_rank(member_id):
+    """The member's current weekly rank on every leaderboard metric"""
+    if session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}), 403
+
+    conn = get_db_connection()
+    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    cursor = conn.cursor()
+    try:
+        gym_id = leaderboards.get_gym_id(cursor, member_id)
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+    if gym_id is None:
+        return jsonify({'error': 'Member not found'}), 404
+
+    return jsonify({
+        'weekStart': leaderboards.week_start.isoformat() if leaderboards.week_start else None,
+        'ranks': {metric: leaderboards.rank(gym_id, metric, member_id) for metric in LEADERBOARD_METRICS}
+    })
+
+@app.route('/api/member/<int:member_id>/analytics', methods=['GET'])
+@login_required
+@role_required('member')
+def get_member_analytics(member_id):
+    """BMI, calories, consistency, durations, weight change, steps and expiry in one call"""
+    if session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}), 403
+
+    conn = get_db_connection()
+    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        analytics = member_analytics.get_member(conn, member_id)
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+    if analytics is None:
+        return jsonify({'error': 'Member not found'}), 404
+    return jsonify(analytics)
+
+def _refuse_new_user(data, role):
+    """Error response if a member or trainer cannot be added to data['gym_id'] right now.
+
+    Emails are only UNIQUE within one shard, so other shards are checked too.
+    """
+    try:
+        gym_id = int(data['gym_id'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid gym_id.'}), 400
+    if not shard_router.enabled:
+        return None
+    if shard_router.is_frozen(gym_id):
+        return jsonify({'error': 'This gym is being moved to a new server. Please retry shortly.'}), 503, {'Retry-After': '5'}
+    try:
+        if shard_router.locate_user(data['email'], role) is not None:
+            return jsonify({'error': 'Email already exists'}), 400
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    return None
+
 @app.route('/api/admin/member', methods=['POST'])
 @login_required
 @role_required('admin')
@@ -306,15 +576,19 @@ def add_member():
     required_fields = ['name', 'email', 'password', 'age', 'membership_type_id', 'gym_id']
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
+
+    refused = _refuse_new_user(data, 'member')
+    if refused:
+        return refused
     
-    conn = get_db_connection()
+    conn = get_db_connection(int(data['gym_id']))
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     cursor = conn.cursor()
     try:
         # Hash the password
-        hashed_password = generate_password_hash(data['password'])
+        hashed_password = auth.hash_password(data['password'])
         join_date = datetime.now().strftime('%Y-%m-%d')
         
         cursor.execute("""
@@ -324,9 +598,14 @@ def add_member():
             data['name'], data['email'], hashed_password, data['age'],
             join_date, data.get('phone', ''), data['membership_type_id'], data['gym_id']
         ))
+        member_id = cursor.lastrowid
+        outbox.emit(conn, outbox.MEMBER_ADDED, member_id, gym=int(data['gym_id']))
         
         conn.commit()
-        return jsonify({'success': True, 'member_id': cursor.lastrowid, 'message': 'Member added successfully.'})
+        outbox_consumer.wake()
+        return jsonify({'success': True, 'member_id': member_id, 'message': 'Member added successfully.'})
+    except auth.KDFOverloaded:
+        return jsonify({'error': 'Server is busy. Please retry shortly.'}), 503, {'Retry-After': '1'}
     except Error as e:
         conn.rollback()
         if 'Duplicate entry' in str(e):
@@ -346,23 +625,32 @@ def add_trainer():
     required_fields = ['name', 'email', 'password', 'specialization', 'gym_id']
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
+
+    refused = _refuse_new_user(data, 'trainer')
+    if refused:
+        return refused
     
-    conn = get_db_connection()
+    conn = get_db_connection(int(data['gym_id']))
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     cursor = conn.cursor()
     try:
         # Hash the password
-        hashed_password = generate_password_hash(data['password'])
+        hashed_password = auth.hash_password(data['password'])
         
         cursor.execute("""
             INSERT INTO Trainer (Name, Email, Password, Specialization, Gym_ID)
             VALUES (%s, %s, %s, %s, %s)
         """, (data['name'], data['email'], hashed_password, data['specialization'], data['gym_id']))
+        trainer_id = cursor.lastrowid
+        outbox.emit(conn, outbox.TRAINER_ADDED, trainer=trainer_id, gym=int(data['gym_id']))
         
         conn.commit()
-        return jsonify({'success': True, 'trainer_id': cursor.lastrowid, 'message': 'Trainer added successfully.'})
+        outbox_consumer.wake()
+        return jsonify({'success': True, 'trainer_id': trainer_id, 'message': 'Trainer added successfully.'})
+    except auth.KDFOverloaded:
+        return jsonify({'error': 'Server is busy. Please retry shortly.'}), 503, {'Retry-After': '1'}
     except Error as e:
         conn.rollback()
         if 'Duplicate entry' in str(e):
@@ -373,6 +661,36 @@ def add_trainer():
         conn.close()
 
 # Replace the chat endpoint
+# Chat context queries, shared with the async serving path (asgi_app.py)
+CHAT_MEMBER_QUERY = """
+    SELECT M_ID, Name, Age, JoinDate, MembershipType_ID, Gym_ID
+    FROM Member
+    WHERE M_ID = %s
+"""
+
+CHAT_WORKOUTS_QUERY = """
+    SELECT Exercise, Date, Duration, CaloriesBurnt, Distance
+    FROM WorkoutLog
+    WHERE M_ID = %s AND Date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+    ORDER BY Date DESC
+"""
+
+CHAT_HEALTH_QUERY = """
+    SELECT Weight, Height, SleepHours, WaterLiters, Steps, Date
+    FROM HealthMetrics
+    WHERE M_ID = %s
+    ORDER BY Date DESC LIMIT 5
+"""
+
+CHAT_SESSIONS_QUERY = """
+    SELECT s.Details, s.SessionDate, s.SessionTime
+    FROM WorkoutLog wl
+    JOIN Session s ON wl.S_ID = s.S_ID
+    WHERE wl.M_ID = %s AND s.SessionDate >= CURDATE() AND wl.Exercise = 'Session Booking'
+    ORDER BY s.SessionDate
+    LIMIT 5
+"""
+
 @app.route('/api/member/<int:member_id>/chat', methods=['POST'])
 @login_required
 @role_required('member')
@@ -388,17 +706,10 @@ def chat_with_ai(member_id):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Check if member has Gold membership
-        cursor.execute("""
-            SELECT mt.Name as MembershipType
-            FROM Member m
-            JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-            WHERE m.M_ID = %s
-        """, (member_id,))
-        
-        member_data = cursor.fetchone()
+        # Check if member has Gold membership; the row is also the prompt's member context
+        member_info = reference_data.resolve_member(db.query_one(conn, CHAT_MEMBER_QUERY, (member_id,)))
         
-        if not member_data or member_data['MembershipType'] != 'Gold':
+        if not member_info or member_info['MembershipType'] != 'Gold':
             return jsonify({'error': 'AI Chatbot is only available for Gold members. Please upgrade your membership to access this feature.'}), 403
         
         # Get user question
@@ -407,48 +718,48 @@ def chat_with_ai(member_id):
         if not question:
             return jsonify({'error': 'Please provide a question'}), 400
         
-        # Get comprehensive member data for context
-        cursor.execute("""
-            SELECT m.M_ID, m.Name, m.Age, m.JoinDate, mt.Name as MembershipType
-            FROM Member m
-            JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-            WHERE m.M_ID = %s
-        """, (member_id,))
-        member_info = cursor.fetchone()
+        # Factual lookups are answered from the member's cached stats
+        started = time.perf_counter()
+        route = classify_question(question)
+        if route.local:
+            stats = member_analytics.get_member(conn, member_id)
+            sessions = None
+            if 'sessions' in route.topics:
+                cursor.execute(CHAT_SESSIONS_QUERY, (member_id,))
+                sessions = cursor.fetchall()
+            streaks = member_streaks.summary(conn, member_id) if 'streak' in route.topics else None
+            response = answer_question(route, member_info, stats, sessions, streaks)
+            if response:
+                chat_router.record_local(route, (time.perf_counter() - started) * 1000)
+                chat_memory.append(conn, member_id, question, response)
+                return jsonify({'success': True, 'response': response, 'isMarkdown': True, 'source': 'local'})
+            route.reason = 'no_stats'
+
+        # Rolling summary plus the history that has not been summarized yet
+        conversation = chat_memory.load(conn, member_id)
         
         # Get recent workouts (last 30 days)
-        cursor.execute("""
-            SELECT Exercise, Date, Duration, CaloriesBurnt, Distance
-            FROM WorkoutLog
-            WHERE M_ID = %s AND Date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            ORDER BY Date DESC
-        """, (member_id,))
+        cursor.execute(CHAT_WORKOUTS_QUERY, (member_id,))
         recent_workouts = cursor.fetchall()
         
         # Get latest health metrics (last 5 entries)
-        cursor.execute("""
-            SELECT Weight, Height, SleepHours, WaterLiters, Steps, Date
-            FROM HealthMetrics
-            WHERE M_ID = %s
-            ORDER BY Date DESC LIMIT 5
-        """, (member_id,))
+        cursor.execute(CHAT_HEALTH_QUERY, (member_id,))
         health_metrics = cursor.fetchall()
         
         # Get upcoming sessions
-        cursor.execute("""
-            SELECT s.Details, s.SessionDate, s.SessionTime
-            FROM WorkoutLog wl
-            JOIN Session s ON wl.S_ID = s.S_ID
-            WHERE wl.M_ID = %s AND s.SessionDate >= CURDATE() AND wl.Exercise = 'Session Booking'
-            ORDER BY s.SessionDate
-            LIMIT 5
-        """, (member_id,))
+        cursor.execute(CHAT_SESSIONS_QUERY, (member_id,))
         upcoming_sessions = cursor.fetchall()
         
         # Generate AI response using OpenAI
-        response = generate_smart_ai_response(question, member_info, recent_workouts, health_metrics, upcoming_sessions)
+        response, usage = generate_smart_ai_response(question, member_info, recent_workouts, health_metrics, upcoming_sessions, conversation)
+        chat_router.record_escalated(route, (time.perf_counter() - started) * 1000)
+
+        chat_memory.append(conn, member_id, question, response, usage)
+        chat_memory.record_usage(conversation, usage)
+        chat_memory.maybe_summarize(conversation, member_id, estimate_tokens(question) + estimate_tokens(response),
+                                    shard_router.shard_for_gym(session.get('gym_id')))
         
-        return jsonify({'success': True, 'response': response, 'isMarkdown': True})
+        return jsonify({'success': True, 'response': response, 'isMarkdown': True, 'source': 'model'})
         
     except Exception as e:
         print(f"Chat error: {e}")
@@ -457,6 +768,53 @@ def chat_with_ai(member_id):
         cursor.close()
         conn.close()
 
+CHAT_HISTORY_LIMIT = 50
+
+@app.route('/api/member/<int:member_id>/chat/history', methods=['GET'])
+@login_required
+@role_required('member')
+def get_chat_history(member_id):
+    """The member's most recent chat messages, oldest first."""
+    if session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}), 403
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        messages = chat_memory.recent(conn, member_id, CHAT_HISTORY_LIMIT)
+        return jsonify([{
+            'role': message['Role'],
+            'content': message['Content'],
+            'createdAt': message['CreatedAt'].isoformat() if message['CreatedAt'] else None
+        } for message in messages])
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/member/<int:member_id>/chat/history', methods=['DELETE'])
+@login_required
+@role_required('member')
+def clear_chat_history(member_id):
+    """Forget the member's chat history and its summary."""
+    if session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}), 403
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        chat_memory.clear(conn, member_id)
+        return jsonify({'success': True, 'message': 'Chat history cleared'})
+    except Error as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
 def generate_ai_response(question, member_info, workouts, health_metrics, sessions):
     """Generate rule-based AI responses based on member data."""
     
@@ -635,18 +993,12 @@ def get_notifications():
     
     try:
         if user_role == 'member':
-            cursor.execute("""
-                SELECT * FROM Notifications
-                WHERE M_ID = %s
-                ORDER BY CreatedAt DESC
-                LIMIT 10
-            """, (user_id,))
+            notifications = member_notifications(cursor, user_id)
         else:
             # Admin/Trainer notifications logic (not specified in the plan)
             # For now, return an empty list for other roles
             return jsonify({'notifications': []})
 
-        notifications = cursor.fetchall()
         # Convert datetime objects to string
         for notification in notifications:
             notification['CreatedAt'] = notification['CreatedAt'].isoformat()
@@ -658,13 +1010,82 @@ def get_notifications():
         cursor.close()
         conn.close()
 
+@app.route('/api/notifications/read', methods=['POST'])
+@login_required
+@role_required('member')
+def read_notifications():
+    """Mark all of the logged-in member's notifications, broadcasts included, as read."""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        mark_notifications_read(conn, session['user_id'])
+        conn.commit()
+        return jsonify({'success': True})
+    except Error as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/admin/broadcast', methods=['POST'])
+@login_required
+@role_required('admin')
+def broadcast_notification():
+    """Notify every member of a gym and/or membership tier (all members when neither is given)."""
+    data = request.json or {}
+    message = (data.get('message') or '').strip()
+    notif_type = data.get('type', 'announcement')
+    if not message:
+        return jsonify({'error': 'Message required'}), 400
+    if len(message) > 1000:
+        return jsonify({'error': 'Message must be at most 1000 characters.'}), 400
+    if notif_type not in BROADCAST_TYPES:
+        return jsonify({'error': f"Type must be one of: {', '.join(BROADCAST_TYPES)}."}), 400
+    try:
+        gym_id = int(data['gym_id']) if data.get('gym_id') is not None else None
+        type_id = int(data['membership_type_id']) if data.get('membership_type_id') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid gym_id or membership_type_id.'}), 400
+    if gym_id is not None and reference_data.gym(gym_id) is None:
+        return jsonify({'error': 'Gym not found'}), 404
+    if type_id is not None and reference_data.membership_type(type_id) is None:
+        return jsonify({'error': 'Membership type not found'}), 404
+
+    def send(conn):
+        try:
+            broadcast_id = broadcast(conn, message, notif_type, gym_id, type_id)
+            conn.commit()
+            return broadcast_id
+        except Error:
+            conn.rollback()
+            raise
+
+    try:
+        if gym_id is None:
+            # Every shard holds members of the tier: one row on each
+            broadcast_ids = list(shard_router.fan_out(send).values())
+        else:
+            if shard_router.is_frozen(gym_id):
+                return jsonify({'error': 'This gym is being moved to a new server. Please retry shortly.'}), 503, {'Retry-After': '5'}
+            conn = get_db_connection(gym_id)
+            if not conn:
+                return jsonify({'error': 'Database connection failed'}), 500
+            try:
+                broadcast_ids = [send(conn)]
+            finally:
+                conn.close()
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'success': True, 'broadcast_ids': broadcast_ids, 'message': 'Broadcast sent.'})
+
 @app.route('/api/admin/check_renewals', methods=['POST'])
 @login_required
 @role_required('admin')
 def run_check_renewals():
     """Manually trigger the membership renewal check."""
     try:
-        check_membership_renewals()
+        shard_router.fan_out(check_membership_renewals)
         return jsonify({'success': True, 'message': 'Membership renewal check completed.'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -685,15 +1106,12 @@ def get_trainer_dashboard(trainer_id):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("SELECT T_ID, Name, Email, Specialization FROM Trainer WHERE T_ID = %s", (trainer_id,))
-        trainer_info = cursor.fetchone()
+        trainer_info = reference_data.trainer(trainer_id)
         
         cursor.execute("""
-            SELECT 
-                COUNT(DISTINCT wl.M_ID) as totalClients
-            FROM Session s
-            JOIN WorkoutLog wl ON s.S_ID = wl.S_ID
-            WHERE s.T_ID = %s
+            SELECT COUNT(*) as totalClients
+            FROM TrainerClient
+            WHERE T_ID = %s
         """, (trainer_id,))
         total_clients = cursor.fetchone()
 
@@ -709,8 +1127,7 @@ def get_trainer_dashboard(trainer_id):
         }
         
         cursor.execute("""
-            SELECT s.*, 
-                   (SELECT COUNT(*) FROM WorkoutLog wl WHERE wl.S_ID = s.S_ID AND wl.Exercise = 'Session Booking') as participantCount
+            SELECT s.*, s.BookedCount as participantCount
             FROM Session s
             WHERE s.T_ID = %s AND s.SessionDate >= CURDATE()
             ORDER BY s.SessionDate, s.SessionTime
@@ -718,12 +1135,12 @@ def get_trainer_dashboard(trainer_id):
         sessions = cursor.fetchall()
         
         cursor.execute("""
-            SELECT DISTINCT m.M_ID, m.Name, m.Email, 
-                   (SELECT MAX(Date) FROM WorkoutLog wl WHERE wl.M_ID = m.M_ID) as lastWorkout
-            FROM Member m
-            JOIN WorkoutLog wl ON m.M_ID = wl.M_ID
-            JOIN Session s ON wl.S_ID = s.S_ID
-            WHERE s.T_ID = %s
+            SELECT m.M_ID, m.Name, m.Email, tc.LastWorkout as lastWorkout,
+                   tc.FirstSession as firstSession, tc.LastSession as lastSession,
+                   tc.SessionCount as sessionCount
+            FROM TrainerClient tc
+            JOIN Member m ON tc.M_ID = m.M_ID
+            WHERE tc.T_ID = %s
             ORDER BY m.Name
         """, (trainer_id,))
         clients = cursor.fetchall()
@@ -754,44 +1171,20 @@ def get_admin_dashboard(admin_id):
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute("SELECT (SELECT COUNT(*) FROM Member) as totalMembers")
-        total_members = cursor.fetchone()
-        cursor.execute("SELECT (SELECT COUNT(*) FROM Trainer) as totalTrainers")
-        total_trainers = cursor.fetchone()
-        cursor.execute("SELECT (SELECT COUNT(*) FROM Session WHERE SessionDate >= CURDATE()) as activeSessions")
-        active_sessions = cursor.fetchone()
-        cursor.execute("""
-            SELECT COALESCE(SUM(mt.Price), 0) as totalRevenue
-            FROM Member m
-            JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-        """)
-        total_revenue = cursor.fetchone()
-
-        stats = {**total_members, **total_trainers, **active_sessions, **total_revenue}
-        
-        cursor.execute("""
-            SELECT m.M_ID, m.Name, m.Email, m.JoinDate, mt.Name as MembershipType, g.Location as GymLocation
-            FROM Member m
-            LEFT JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-            LEFT JOIN Gym g ON m.Gym_ID = g.Gym_ID
-            ORDER BY m.JoinDate DESC
-        """)
-        members = cursor.fetchall()
-        
-        cursor.execute("""
-            SELECT t.T_ID, t.Name, t.Email, t.Specialization, g.Location as GymLocation,
-                   (SELECT COUNT(DISTINCT wl.M_ID) 
-                    FROM Session s 
-                    JOIN WorkoutLog wl ON s.S_ID = wl.S_ID 
-                    WHERE s.T_ID = t.T_ID) as clientCount
-            FROM Trainer t
-            LEFT JOIN Gym g ON t.Gym_ID = g.Gym_ID
-            ORDER BY t.Name
-        """)
-        trainers = cursor.fetchall()
+        # Every shard reports its own gyms; totals come from the
+        # trigger-maintained GymStats counters
+        overviews = shard_router.fan_out(_admin_overview)
+        stats = sum_gym_breakdown(shard_router.owned({shard: rows[0] for shard, rows in overviews.items()}))
+        members = shard_router.owned({shard: rows[1] for shard, rows in overviews.items()})
+        members.sort(key=lambda row: row['JoinDate'], reverse=True)
+        trainers = shard_router.owned({shard: rows[2] for shard, rows in overviews.items()})
+        trainers.sort(key=lambda row: row['Name'])
+
+        # Gym and membership type names come from the reference cache
+        reference_data.resolve(members, 'membership_types', 'MembershipType_ID', {'Name': 'MembershipType'})
+        reference_data.resolve(members, 'gyms', 'Gym_ID', {'Location': 'GymLocation'})
+        reference_data.resolve(trainers, 'gyms', 'Gym_ID', {'Location': 'GymLocation'})
         
         return jsonify({
             'stats': stats,
@@ -802,50 +1195,330 @@ def get_admin_dashboard(admin_id):
     except Error as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cursor.close()
         conn.close()
 
+def _admin_overview(conn):
+    """One shard's GymStats rows, members and trainers for the admin dashboard."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        gyms = get_gym_breakdown(cursor)
+        cursor.execute("""
+            SELECT M_ID, Name, Email, JoinDate, MembershipType_ID, Gym_ID
+            FROM Member
+        """)
+        members = cursor.fetchall()
+        cursor.execute("""
+            SELECT t.T_ID, t.Name, t.Email, t.Specialization, t.Gym_ID,
+                   (SELECT COUNT(*) FROM TrainerClient tc WHERE tc.T_ID = t.T_ID) as clientCount
+            FROM Trainer t
+        """)
+        return gyms, members, cursor.fetchall()
+    finally:
+        cursor.close()
+
+@app.route('/api/admin/gym_stats', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_gym_stats():
+    """Per-gym breakdown of the materialized admin counters, each gym from its shard."""
+    def breakdown(conn):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            return get_gym_breakdown(cursor)
+        finally:
+            cursor.close()
+
+    try:
+        gyms = shard_router.owned(shard_router.fan_out(breakdown))
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'gyms': sorted(gyms, key=lambda row: row['Gym_ID'])})
+
+@app.route('/api/admin/gym_stats/reconcile', methods=['POST'])
+@login_required
+@role_required('admin')
+def run_reconcile_gym_stats():
+    """Manually trigger the GymStats reconciliation check on every shard."""
+    try:
+        results = shard_router.fan_out(reconcile_gym_stats)
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    if any(drifted is None for drifted in results.values()):
+        return jsonify({'error': 'Gym statistics reconciliation failed.'}), 500
+    drifted = [gym for gyms in results.values() for gym in gyms]
+    return jsonify({'success': True, 'driftedGyms': drifted, 'message': 'Gym statistics reconciliation completed.'})
+
+@app.route('/api/admin/admission', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_admission_metrics():
+    """Queue depth, in-flight requests and rejections per endpoint class."""
+    return jsonify({'classes': admission.get_metrics()})
+
+@app.route('/api/admin/reference_cache', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_reference_cache_metrics():
+    """Reference cache version, sizes, load time and reload counts."""
+    return jsonify(reference_data.metrics())
+
+@app.route('/api/admin/analytics', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_gym_analytics():
+    """Member analytics for one gym (gym_id) or every gym, from one grouped pass per gym."""
+    gym_id = request.args.get('gym_id')
+    if gym_id is not None:
+        try:
+            gym_ids = [int(gym_id)]
+        except ValueError:
+            return jsonify({'error': 'Invalid gym_id.'}), 400
+    else:
+        gym_ids = sorted(reference_data.gyms())
+
+    gyms = []
+    for gym in gym_ids:
+        conn = get_db_connection(gym)
+        if not conn: return jsonify({'error': 'Database connection failed'}), 500
+        try:
+            gyms.append({'gymId': gym, 'members': member_analytics.get_gym(conn, gym)})
+        except Error as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            conn.close()
+    return jsonify({'gyms': gyms})
+
+@app.route('/api/admin/analytics_cache', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_analytics_cache_metrics():
+    """Member analytics cache hits, misses and grouped-pass timings."""
+    return jsonify(member_analytics.metrics())
+
+@app.route('/api/admin/chat_router', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_chat_router_metrics():
+    """Chat questions answered locally vs escalated to the model, with latency."""
+    return jsonify(chat_router.metrics())
+
+@app.route('/api/admin/shards', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_shard_metrics():
+    """Configured shards, the gyms placed on each, frozen gyms and fan-out timings."""
+    return jsonify(shard_router.metrics())
+
+@app.route('/api/admin/cold_archive', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_cold_archive_metrics():
+    """Open archive segments, segment cache hits and progress scan timings."""
+    return jsonify(cold_archive.metrics())
+
+@app.route('/api/admin/outbox', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_outbox_metrics():
+    """Events sequenced and applied by this process, notifications created and batch timings."""
+    return jsonify(outbox_consumer.metrics())
+
+@app.route('/api/admin/traffic_capture', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_traffic_capture_metrics():
+    """Traffic capture file, requests recorded and records dropped by this process."""
+    return jsonify(traffic_capture.metrics())
+
+@app.route('/api/admin/streaks', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_streak_metrics():
+    """Members held by the streak engine, state loads and workouts applied in this process."""
+    return jsonify(member_streaks.metrics())
+
+@app.route('/api/admin/profiling', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_profiling():
+    """Profiler settings and per-route results (optional route, limit)."""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'settings': route_profiler.metrics(),
+        'routes': route_profiler.report(request.args.get('route'), max(1, min(limit, 200)))
+    })
+
+@app.route('/api/admin/profiling', methods=['POST'])
+@login_required
+@role_required('admin')
+def configure_profiling():
+    """Switch profiling on or off and change its mode, sample rate, rate cap or endpoints."""
+    data = request.json or {}
+    try:
+        route_profiler.configure(
+            enabled=data.get('enabled'),
+            mode=data.get('mode'),
+            sample_rate=data.get('sample_rate'),
+            max_per_second=data.get('max_per_second'),
+            endpoints=data.get('endpoints')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(route_profiler.metrics())
+
+@app.route('/api/admin/profiling', methods=['DELETE'])
+@login_required
+@role_required('admin')
+def reset_profiling():
+    """Discard collected profiles."""
+    route_profiler.reset()
+    return jsonify({'success': True})
+
+@app.route('/api/admin/profiling/flamegraph', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_profiling_flamegraph():
+    """Sampled stacks in folded format, for flamegraph.pl or speedscope (optional route)."""
+    return route_profiler.folded(request.args.get('route')), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@app.route('/api/admin/profiling/pstats', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_profiling_pstats():
+    """A route's cProfile results as a pstats file (route required)."""
+    dump = route_profiler.pstats_dump(request.args.get('route'))
+    if dump is None:
+        return jsonify({'error': 'No cProfile results for this route'}), 404
+    return dump, 200, {
+        'Content-Type': 'application/octet-stream',
+        'Content-Disposition': 'attachment; filename="route.pstats"'
+    }
+
+@app.route('/api/admin/chat_memory', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_chat_memory_metrics():
+    """Chat prompt token usage, provider prefix cache hits and summarization."""
+    return jsonify(chat_memory.metrics())
+
+@app.route('/api/admin/workout_journal', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_workout_journal_metrics():
+    """Write-behind journal backlog and flush statistics."""
+    return jsonify(workout_journal.metrics())
+
 @app.route('/api/admin/member/<int:member_id>', methods=['DELETE'])
 @login_required
 @role_required('admin')
 def delete_member(member_id):
-    """Admin action to delete a member."""
-    conn = get_db_connection()
-    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    """Admin action to delete a member, on the shard that owns their gym."""
+    return _delete_owned(
+        'Member', "SELECT Gym_ID FROM Member WHERE M_ID = %s",
+        "DELETE FROM Member WHERE M_ID = %s AND Gym_ID <=> %s", member_id,
+        (outbox.MEMBER_DELETED, member_id, {}), release_seats=True
+    )
+
+def _locate_owned(locate_sql, row_id):
+    """Find a row by ID on the shard that owns its gym.
+
+    Returns ([(shard, Gym_ID)] for each owned copy found, unreachable
+    shards). Shards are asked one by one, so a shard that is down does not
+    hide rows on the others. Copies on a shard that does not own the gym
+    (mid-move) are ignored.
+    """
+    found, unreachable = [], []
+    for shard in db.SHARDS:
+        conn = db.get_connection(shard)
+        if not conn:
+            unreachable.append(shard)
+            continue
+        try:
+            row = db.query_one(conn, locate_sql, (row_id,), dictionary=False)
+        except Error as e:
+            print(f"Error locating row on shard {shard}: {e}")
+            unreachable.append(shard)
+            continue
+        finally:
+            conn.close()
+        if row and shard_router.shard_for_gym(row[0]) == shard:
+            found.append((shard, row[0]))
+    return found, unreachable
+
+def _delete_owned(entity, locate_sql, delete_sql, row_id, event, release_seats=False):
+    """Delete a member or trainer on its owning shard only.
+
+    The owning shard is that of the ?gym_id= given by the caller, or else
+    the one found by _locate_owned. IDs are only unique across shards
+    under the auto_increment_offset setup, so an ID owned on several
+    shards is refused rather than deleted everywhere.
+    """
+    try:
+        gym_id = request.args.get('gym_id', type=int)
+        if gym_id is not None:
+            owners, unreachable = [(shard_router.shard_for_gym(gym_id), gym_id)], []
+        else:
+            owners, unreachable = _locate_owned(locate_sql, row_id)
+        if len(owners) > 1:
+            return jsonify({'error': f"{entity} ID {row_id} exists in several gyms. Pass gym_id to choose one."}), 409
+        if not owners:
+            if unreachable:
+                return jsonify({'error': f"{entity} could not be located. Unreachable shards: {', '.join(unreachable)}."}), 503, {'Retry-After': '5'}
+            return jsonify({'error': f'{entity} not found'}), 404
+
+        shard, gym_id = owners[0]
+        if shard_router.is_frozen(gym_id):
+            return jsonify({'error': 'This gym is being moved to a new server. Please retry shortly.'}), 503, {'Retry-After': '5'}
+        conn = db.get_connection(shard)
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        try:
+            deleted = _delete_row(conn, delete_sql, (row_id, gym_id), event, release_seats)
+        finally:
+            conn.close()
+        if not deleted:
+            return jsonify({'error': f'{entity} not found'}), 404
+        outbox_consumer.wake()
+        return jsonify({'success': True, 'message': f'{entity} deleted successfully.'})
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+
+def _delete_row(conn, sql, params, event, release_seats=False):
+    """Delete one row and, if it existed, emit event = (type, member_id, payload) with it.
+
+    With release_seats the row is a member: the ReleaseMemberBookings
+    trigger frees their booked seats and the waitlists of those sessions
+    are promoted in the same transaction.
+    """
     cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM Member WHERE M_ID = %s", (member_id,))
+        sessions = booking.member_bookings(conn, params[0]) if release_seats else []
+        cursor.execute(sql, params)
+        deleted = cursor.rowcount
+        if deleted:
+            event_type, member_id, payload = event
+            outbox.emit(conn, event_type, member_id, **payload)
+            for session_id in sessions:
+                promoted = booking.promote_from_waitlist(conn, session_id)
+                outbox.emit(conn, outbox.SESSION_CANCELLED, member_id, session=session_id, booking=None, promoted=promoted)
         conn.commit()
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Member not found'}), 404
-        return jsonify({'success': True, 'message': 'Member deleted successfully.'})
-    except Error as e:
+        return deleted
+    except Error:
         conn.rollback()
-        return jsonify({'error': str(e)}), 500
+        raise
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/api/admin/trainer/<int:trainer_id_to_delete>', methods=['DELETE'])
 @login_required
 @role_required('admin')
 def delete_trainer(trainer_id_to_delete):
-    """Admin action to delete a trainer."""
-    conn = get_db_connection()
-    if not conn: return jsonify({'error': 'Database connection failed'}), 500
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM Trainer WHERE T_ID = %s", (trainer_id_to_delete,))
-        conn.commit()
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Trainer not found'}), 404
-        return jsonify({'success': True, 'message': 'Trainer deleted successfully.'})
-    except Error as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
+    """Admin action to delete a trainer, on the shard that owns their gym."""
+    return _delete_owned(
+        'Trainer', "SELECT Gym_ID FROM Trainer WHERE T_ID = %s",
+        "DELETE FROM Trainer WHERE T_ID = %s AND Gym_ID <=> %s", trainer_id_to_delete,
+        (outbox.TRAINER_DELETED, None, {'trainer': trainer_id_to_delete})
+    )
 
 # --- Workout & Session Management ---
 
@@ -858,6 +1531,14 @@ def add_workout():
     data = request.json
     if not all(field in data for field in ['exercise', 'date', 'duration']):
         return jsonify({'error': 'Missing required fields: exercise, date, duration.'}), 400
+
+    if workout_journal.running:
+        error = validate_workout(data['date'], data['duration'], data.get('calories'), data.get('distance'))
+        if error:
+            return jsonify({'error': error}), 400
+        # Acknowledge once the journal has it; the flusher batches it into WorkoutLog
+        journal_seq = workout_journal.append(member_id, data)
+        return jsonify({'success': True, 'queued': True, 'journal_seq': journal_seq}), 202
     
     conn = get_db_connection()
     if not conn: return jsonify({'error': 'Database connection failed'}), 500
@@ -870,8 +1551,11 @@ def add_workout():
             member_id, data['exercise'], data['date'], data['duration'],
             data.get('calories'), data.get('distance'), data.get('progress')
         ))
+        workout_id = cursor.lastrowid
+        outbox.emit(conn, outbox.WORKOUT_LOGGED, member_id, workout=workout_id, date=data['date'])
         conn.commit()
-        return jsonify({'success': True, 'workout_id': cursor.lastrowid})
+        outbox_consumer.wake()
+        return jsonify({'success': True, 'workout_id': workout_id})
     except Error as e:
         conn.rollback()
         return jsonify({'error': str(e)}), 500
@@ -882,79 +1566,106 @@ def add_workout():
 @app.route('/api/sessions/available', methods=['GET'])
 @login_required
 def get_available_sessions():
-    """Get available sessions for booking."""
-    conn = get_db_connection()
-    if not conn: return jsonify({'error': 'Database connection failed'}), 500
-    cursor = conn.cursor(dictionary=True)
+    """Get available sessions for booking, served from the in-memory session index.
+
+    Optional query parameters: date_from, date_to (YYYY-MM-DD), trainer_id,
+    specialization, min_spots (default 1), limit (default 50, max 200), offset.
+    """
     try:
-        cursor.execute("""
-            SELECT s.*, t.Name AS TrainerName, t.Specialization,
-                   (SELECT COUNT(*) FROM WorkoutLog wl WHERE wl.S_ID = s.S_ID AND wl.Exercise = 'Session Booking') as participantCount
-            FROM Session s
-            JOIN Trainer t ON s.T_ID = t.T_ID
-            WHERE s.SessionDate >= CURDATE() 
-            AND (SELECT COUNT(*) FROM WorkoutLog wl WHERE wl.S_ID = s.S_ID AND wl.Exercise = 'Session Booking') < s.MaxParticipants
-            ORDER BY s.SessionDate, s.SessionTime
-        """)
-        sessions = cursor.fetchall()
-        return jsonify({'sessions': [dict(row) for row in sessions]})
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+    except ValueError:
+        return jsonify({'error': 'Dates must use the YYYY-MM-DD format'}), 400
+
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    gym_id = session.get('gym_id')
+    sessions, total = session_index.query(
+        date_from=date_from,
+        date_to=date_to,
+        trainer_id=request.args.get('trainer_id', type=int),
+        specialization=request.args.get('specialization'),
+        min_spots=request.args.get('min_spots', 1, type=int),
+        limit=limit,
+        offset=offset,
+        # Members only see sessions they can book: those on their gym's shard
+        shard=shard_router.shard_for_gym(gym_id) if shard_router.enabled and gym_id is not None else None
+    )
+    if not session_index.is_loaded:
+        return jsonify({'error': 'Database connection failed'}), 500
+    return jsonify({'sessions': sessions, 'total': total, 'limit': limit, 'offset': offset})
 
 @app.route('/api/sessions/book', methods=['POST'])
 @login_required
 @role_required('member')
 def book_session():
-    """Book a session for the logged-in member."""
+    """Book a session for the logged-in member, optionally joining the waitlist if full."""
     member_id = session['user_id']
     session_id = request.json.get('session_id')
+    join_waitlist = request.json.get('join_waitlist', False)
     if not session_id: return jsonify({'error': 'Session ID required'}), 400
     
     conn = get_db_connection()
     if not conn: return jsonify({'error': 'Database connection failed'}), 500
-    cursor = conn.cursor(dictionary=True)
     try:
-        # Check if session exists, is not full, and get its details
-        cursor.execute("""
-            SELECT Details, SessionDate, Duration, MaxParticipants,
-                   (SELECT COUNT(*) FROM WorkoutLog WHERE S_ID = %s AND Exercise = 'Session Booking') as currentParticipants
-            FROM Session WHERE S_ID = %s
-        """, (session_id, session_id))
-        session_info = cursor.fetchone()
+        # Capacity check, duplicate check and insert happen in one statement
+        outcome, booking_id = booking.reserve_seat(conn, member_id, session_id)
 
-        if not session_info:
+        if outcome == booking.NOT_FOUND:
+            conn.rollback()
             return jsonify({'error': 'Session not found'}), 404
-        if session_info['currentParticipants'] >= session_info['MaxParticipants']:
-            return jsonify({'error': 'Session is full'}), 400
-        
-        # Check if already booked
-        cursor.execute("SELECT L_ID FROM WorkoutLog WHERE M_ID = %s AND S_ID = %s AND Exercise = 'Session Booking'", (member_id, session_id))
-        if cursor.fetchone():
+        if outcome == booking.ALREADY_BOOKED:
+            conn.rollback()
             return jsonify({'error': 'You have already booked this session'}), 400
+        if outcome == booking.FULL:
+            if not join_waitlist:
+                conn.rollback()
+                return jsonify({'error': 'Session is full', 'waitlistAvailable': True}), 400
+            position = booking.join_waitlist(conn, member_id, session_id)
+            conn.commit()
+            return jsonify({'success': True, 'waitlisted': True, 'position': position,
+                            'message': f'Session is full. You are #{position} on the waitlist.'})
+
+        outbox.emit(conn, outbox.SESSION_BOOKED, member_id, session=int(session_id), booking=booking_id)
+        conn.commit()
+        outbox_consumer.wake()
+        return jsonify({'success': True, 'booking_id': booking_id, 'message': 'Session booked successfully.'})
+    except Error as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
 
-        # Book the session by creating a workout log entry
-        cursor.execute("""
-            INSERT INTO WorkoutLog (M_ID, S_ID, Exercise, Date, Duration, Progress)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (member_id, session_id, 'Session Booking', session_info['SessionDate'], session_info['Duration'], 'Booked'))
-        
+@app.route('/api/sessions/waitlist/leave', methods=['POST'])
+@login_required
+@role_required('member')
+def leave_session_waitlist():
+    """Remove the logged-in member from a session waitlist."""
+    member_id = session['user_id']
+    session_id = request.json.get('session_id')
+    if not session_id: return jsonify({'error': 'Session ID required'}), 400
+
+    conn = get_db_connection()
+    if not conn: return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        removed = booking.leave_waitlist(conn, member_id, session_id)
         conn.commit()
-        return jsonify({'success': True, 'message': 'Session booked successfully.'})
+        if not removed:
+            return jsonify({'error': 'You are not on the waitlist for this session'}), 404
+        return jsonify({'success': True, 'message': 'Removed from the waitlist.'})
     except Error as e:
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cursor.close()
         conn.close()
 
 @app.route('/api/sessions/cancel', methods=['POST'])
 @login_required
 @role_required('member')
 def cancel_session():
-    """Cancel a session booking for the logged-in member."""
+    """Cancel a session booking for the logged-in member and promote the waitlist."""
     member_id = session['user_id']
     booking_id = request.json.get('booking_id') # This is the L_ID from WorkoutLog
     if not booking_id: return jsonify({'error': 'Booking ID required'}), 400
@@ -964,10 +1675,22 @@ def cancel_session():
     cursor = conn.cursor()
     try:
         # Ensure the user is canceling their own booking
-        cursor.execute("DELETE FROM WorkoutLog WHERE L_ID = %s AND M_ID = %s AND Exercise = 'Session Booking'", (booking_id, member_id))
-        conn.commit()
-        if cursor.rowcount == 0:
+        cursor.execute("""
+            SELECT S_ID FROM WorkoutLog
+            WHERE L_ID = %s AND M_ID = %s AND Exercise = 'Session Booking'
+            FOR UPDATE
+        """, (booking_id, member_id))
+        row = cursor.fetchone()
+        if not row:
+            conn.rollback()
             return jsonify({'error': 'Booking not found or you do not have permission to cancel it'}), 404
+
+        # The ReleaseSessionCapacity trigger frees the seat
+        cursor.execute("DELETE FROM WorkoutLog WHERE L_ID = %s", (booking_id,))
+        promoted = booking.promote_from_waitlist(conn, row[0])
+        outbox.emit(conn, outbox.SESSION_CANCELLED, member_id, session=row[0], booking=int(booking_id), promoted=promoted)
+        conn.commit()
+        outbox_consumer.wake()
         return jsonify({'success': True, 'message': 'Session booking canceled.'})
     except Error as e:
         conn.rollback()
@@ -976,6 +1699,71 @@ def cancel_session():
         cursor.close()
         conn.close()
 
+# --- Batch Requests ---
+
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '10'))
+
+# Sub-requests of a batch are spread over this many lanes; each lane borrows
+# one pooled connection and runs its share of the sub-requests on it
+BATCH_LANES = int(os.getenv('BATCH_LANES', '3'))
+
+_batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv('BATCH_WORKERS', '16')), thread_name_prefix='batch')
+
+def _dispatch_subrequest(sub, cookie, shared):
+    """Run one GET sub-request through the full Flask pipeline (decorators,
+    hooks, error handlers) with the batch's session cookie and lane connection."""
+    with app.test_request_context(sub['path'], method='GET', headers={'Cookie': cookie}):
+        g.batch_subrequest = True
+        g.shared_connection = shared
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            print(f"Batch sub-request {sub['path']} failed: {e}")
+            return {'id': sub.get('id'), 'status': 500, 'body': {'error': 'Internal Server Error'}}
+        return {'id': sub.get('id'), 'status': response.status_code, 'body': response.get_json(silent=True)}
+
+def _run_batch_lane(lane, cookie, shard):
+    conn = db.get_connection(shard)
+    shared = db.SharedConnection(conn) if conn else None
+    try:
+        return [(index, _dispatch_subrequest(sub, cookie, shared)) for index, sub in lane]
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/api/batch', methods=['POST'])
+@login_required
+def batch_requests():
+    """Run several GET API requests in one round trip.
+
+    Body: {"requests": [{"id": "dashboard", "path": "/api/dashboard/member/1"}, ...]}
+    Each sub-request is authorized and admitted as the caller's own request
+    would be, and answered with its own status (429/503 when its class is
+    saturated); the batch itself returns 200 with the responses in order.
+    """
+    subrequests = (request.get_json(silent=True) or {}).get('requests')
+    if not isinstance(subrequests, list) or not subrequests:
+        return jsonify({'error': 'A non-empty list of requests is required.'}), 400
+    if len(subrequests) > BATCH_MAX_REQUESTS:
+        return jsonify({'error': f'At most {BATCH_MAX_REQUESTS} requests per batch.'}), 400
+    for sub in subrequests:
+        path = sub.get('path') if isinstance(sub, dict) else None
+        if not isinstance(path, str) or not path.startswith('/api/') or path.startswith('/api/batch'):
+            return jsonify({'error': 'Each request needs an /api/ path.'}), 400
+        if sub.get('method', 'GET').upper() != 'GET':
+            return jsonify({'error': 'Only GET requests can be batched.'}), 400
+
+    cookie = request.headers.get('Cookie', '')
+    lanes = [list(enumerate(subrequests))[i::BATCH_LANES] for i in range(min(BATCH_LANES, len(subrequests)))]
+    shard = shard_router.shard_for_gym(session.get('gym_id'))
+    futures = [_batch_executor.submit(_run_batch_lane, lane, cookie, shard) for lane in lanes]
+
+    responses = [None] * len(subrequests)
+    for future in futures:
+        for index, result in future.result():
+            responses[index] = result
+    return jsonify({'responses': responses})
+
 # --- Error Handlers ---
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,557 @@
+import asyncio
+import contextlib
+import contextvars
+import math
+import time
+from datetime import datetime
+from functools import wraps
+
+import aiomysql
+import pymysql.err
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from mysql.connector import Error, errorcode
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+import os
+from dotenv import load_dotenv
+
+import admission
+import booking
+import db
+import app as gymfit
+from ai_chatbot import generate_smart_ai_response_async, estimate_tokens
+from chart_data import to_series
+from chat_router import chat_router, classify_question, answer_question
+from chat_memory import chat_memory
+from cold_archive import cold_archive, merge_series
+from member_analytics import member_analytics
+import outbox
+from outbox import outbox_consumer
+from reference_data import reference_data
+from session_index import session_index
+from streaks import member_streaks
+from shard_router import shard_router
+
+load_dotenv()
+
+# Async serving path. The I/O-bound member routes (dashboard, progress, chat,
+# session browse/book/waitlist) are reimplemented as coroutines on aiomysql
+# and the async OpenAI client, reusing the SQL and helpers of app.py. Every
+# other route falls through to the Flask app, so one process serves the
+# whole API:
+#
+#     uvicorn asgi_app:app --port 5000
+
+# Connections in the aiomysql pool; each query of a gather() holds one
+ASYNC_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '32'))
+
+# Threads running the Flask routes that fall through
+WSGI_WORKERS = int(os.getenv('ASGI_WSGI_WORKERS', '16'))
+
+_pools = {}
+_pool_lock = asyncio.Lock()
+
+# Shard of the request being served; login_required sets it from the
+# session's gym and gathered queries and to_thread calls inherit it
+_request_shard = contextvars.ContextVar('request_shard', default=db.DEFAULT_SHARD)
+
+async def get_pool():
+    """The aiomysql pool of the current request's shard, created on first use."""
+    shard = _request_shard.get()
+    pool = _pools.get(shard)
+    if pool is None:
+        async with _pool_lock:
+            pool = _pools.get(shard)
+            if pool is None:
+                config = db.SHARDS[shard]
+                pool = _pools[shard] = await aiomysql.create_pool(
+                    host=config['host'],
+                    port=config.get('port', 3306),
+                    user=config['user'],
+                    password=config['password'],
+                    db=config['database'],
+                    minsize=1,
+                    maxsize=ASYNC_POOL_SIZE,
+                    autocommit=True
+                )
+                print(f"aiomysql pool ready{f' for shard {shard}' if shard_router.enabled else ''}: up to {ASYNC_POOL_SIZE} connections")
+    return pool
+
+async def query_all(sql, params=(), dictionary=True):
+    """Run one read on its own pooled connection, so several can be gathered."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cursor:
+            await cursor.execute(sql, params)
+            return list(await cursor.fetchall())
+
+async def query_one(sql, params=(), dictionary=True):
+    rows = await query_all(sql, params, dictionary)
+    return rows[0] if rows else None
+
+# --- Responses, Sessions & Decorators ---
+
+class JSONResponse(Response):
+    """JSON response encoded by Flask's provider, so both paths serialize rows alike."""
+    media_type = 'application/json'
+
+    def render(self, content):
+        return gymfit.app.json.dumps(content).encode('utf-8')
+
+def jsonify(payload, status_code=200, headers=None):
+    return JSONResponse(payload, status_code, headers)
+
+def database_error(e):
+    # Client-side errors (2000+) mean MySQL could not be reached
+    if e.args and isinstance(e.args[0], int) and e.args[0] >= 2000:
+        print(f"Error connecting to MySQL: {e}")
+        return jsonify({'error': 'Database connection failed'}, 500)
+    return jsonify({'error': str(e)}, 500)
+
+_session_serializer = gymfit.app.session_interface.get_signing_serializer(gymfit.app)
+_session_max_age = int(gymfit.app.permanent_session_lifetime.total_seconds())
+
+def get_session(request):
+    """Decode the Flask session cookie set by /api/login."""
+    cookie = request.cookies.get(gymfit.app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return {}
+    try:
+        return _session_serializer.loads(cookie, max_age=_session_max_age)
+    except BadSignature:
+        return {}
+
+def login_required(f):
+    """Decorator to ensure a user is logged in."""
+    @wraps(f)
+    async def decorated_function(request):
+        request.state.session = get_session(request)
+        if 'user_id' not in request.state.session:
+            return jsonify({'error': 'Authentication required. Please log in.'}, 401)
+        gym_id = request.state.session.get('gym_id')
+        if request.method != 'GET' and shard_router.enabled and shard_router.is_frozen(gym_id):
+            return jsonify({'error': 'Your gym is being moved to a new server. Please retry shortly.'}, 503, {'Retry-After': '5'})
+        _request_shard.set(shard_router.shard_for_gym(gym_id))
+        return await f(request)
+    return decorated_function
+
+def role_required(required_role):
+    """Decorator to ensure a user has the specified role."""
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(request):
+            if request.state.session.get('user_role') != required_role:
+                return jsonify({'error': 'Insufficient permissions for this action.'}, 403)
+            return await f(request)
+        return decorated_function
+    return decorator
+
+# --- Admission Control ---
+
+class AsyncEndpointClass:
+    """Event-loop counterpart of admission.EndpointClass.
+
+    Takes half of its class's concurrency limit (see EndpointClass.split),
+    the Flask routes keeping the other half, so the process as a whole stays
+    within the configured limit. Waiting requests park on the loop instead
+    of holding a thread.
+    """
+
+    def __init__(self, endpoint_class):
+        self.name = endpoint_class.name
+        self.limit = endpoint_class.split()
+        self.max_queue = endpoint_class.max_queue
+        self.queue_budget = endpoint_class.queue_budget
+        self._slots = asyncio.Semaphore(self.limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.avg_service_time = 0.0
+
+    async def acquire(self):
+        if self._slots.locked() or self.queued:
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                return admission.QUEUE_FULL
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_budget)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                return admission.TIMED_OUT
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        return admission.ADMITTED
+
+    def release(self, service_time):
+        self.in_flight -= 1
+        if self.avg_service_time:
+            self.avg_service_time = 0.9 * self.avg_service_time + 0.1 * service_time
+        else:
+            self.avg_service_time = service_time
+        self._slots.release()
+
+    def retry_after(self):
+        backlog = self.queued + self.in_flight
+        return max(1, math.ceil(self.avg_service_time * backlog / self.limit))
+
+    def metrics(self):
+        return {
+            'limit': self.limit,
+            'inFlight': self.in_flight,
+            'queueDepth': self.queued,
+            'peakQueueDepth': self.peak_queued,
+            'admitted': self.admitted,
+            'rejectedQueueFull': self.rejected_queue_full,
+            'rejectedTimeout': self.rejected_timeout,
+            'avgServiceMs': round(self.avg_service_time * 1000, 2)
+        }
+
+# Only these classes have coroutine routes; the others keep their whole
+# limit on the Flask side
+ASYNC_CLASSES = {name: AsyncEndpointClass(admission.CLASSES[name]) for name in ('dashboard', 'chat', 'booking')}
+admission.ASYNC_CLASSES.update(ASYNC_CLASSES)
+
+def admit(class_name):
+    """Admit a request to its endpoint class, shedding excess with 429/503."""
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(request):
+            endpoint_class = ASYNC_CLASSES[class_name]
+            outcome = await endpoint_class.acquire()
+            if outcome == admission.QUEUE_FULL:
+                return jsonify({'error': 'Too many requests. Please retry shortly.'}, 429,
+                               {'Retry-After': str(endpoint_class.retry_after())})
+            if outcome == admission.TIMED_OUT:
+                return jsonify({'error': 'Server is busy. Please retry shortly.'}, 503,
+                               {'Retry-After': str(endpoint_class.retry_after())})
+            started = time.monotonic()
+            try:
+                return await f(request)
+            finally:
+                endpoint_class.release(time.monotonic() - started)
+        return decorated_function
+    return decorator
+
+# --- Member Routes ---
+
+@admit('dashboard')
+@login_required
+@role_required('member')
+async def get_member_dashboard(request):
+    """Get member dashboard data, running the five queries concurrently."""
+    member_id = request.path_params['member_id']
+    if request.state.session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}, 403)
+
+    params = (member_id,)
+    try:
+        member_info, today_stats, health_metrics, recent_workouts, upcoming_sessions, streaks = await asyncio.gather(
+            query_one(gymfit.MEMBER_INFO_QUERY, params),
+            query_one(gymfit.TODAY_STATS_QUERY, params),
+            query_one(gymfit.TODAY_HEALTH_QUERY, params),
+            query_all(gymfit.RECENT_WORKOUTS_QUERY, params),
+            query_all(gymfit.UPCOMING_SESSIONS_QUERY, params),
+            asyncio.to_thread(_pooled, member_streaks.summary, member_id)
+        )
+    except (pymysql.err.MySQLError, Error) as e:
+        return database_error(e)
+
+    reference_data.resolve_member(member_info)
+    reference_data.resolve(upcoming_sessions, 'trainers', 'T_ID', {'Name': 'TrainerName'})
+    return jsonify({
+        'member': member_info,
+        'todayStats': today_stats,
+        'healthMetrics': health_metrics,
+        'recentWorkouts': recent_workouts,
+        'upcomingSessions': upcoming_sessions,
+        'streaks': streaks
+    })
+
+@admit('dashboard')
+@login_required
+@role_required('member')
+async def get_member_progress(request):
+    """Get comprehensive progress data for charts"""
+    member_id = request.path_params['member_id']
+    columnar = request.query_params.get('format') == 'columnar'
+    try:
+        points = max(int(request.query_params.get('points', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid points value.'}, 400)
+
+    params = (member_id,)
+    try:
+        workout_frequency, weight_progress, calorie_trend, archived = await asyncio.gather(
+            query_all(gymfit.WORKOUT_FREQUENCY_QUERY, params, dictionary=not columnar),
+            query_all(gymfit.WEIGHT_PROGRESS_QUERY, params, dictionary=not columnar),
+            query_all(gymfit.CALORIE_TREND_QUERY, params, dictionary=not columnar),
+            asyncio.to_thread(cold_archive.progress, member_id)
+        )
+    except pymysql.err.MySQLError as e:
+        return database_error(e)
+
+    archived_weights, archived_calories = archived
+    weight_progress = merge_series(archived_weights, weight_progress, ('Date', 'Weight'), not columnar)
+    calorie_trend = merge_series(archived_calories, calorie_trend, ('Date', 'daily_calories'), not columnar,
+                                 summed=True)
+
+    if columnar:
+        return jsonify({
+            'workoutFrequency': to_series(workout_frequency, 'counts', typecode='l'),
+            'weightProgress': to_series(weight_progress, 'weights', points),
+            'calorieTrend': to_series(calorie_trend, 'calories', points)
+        })
+
+    return jsonify({
+        'workoutFrequency': workout_frequency,
+        'weightProgress': weight_progress,
+        'calorieTrend': calorie_trend
+    })
+
+async def _none():
+    return None
+
+def _pooled(fn, *args):
+    # The analytics cache and chat memory are shared with the Flask routes and
+    # use their pool; run through asyncio.to_thread
+    conn = db.get_connection(_request_shard.get())
+    if not conn:
+        return None
+    try:
+        return fn(conn, *args)
+    finally:
+        conn.close()
+
+@admit('chat')
+@login_required
+@role_required('member')
+async def chat_with_ai(request):
+    """AI chatbot for Gold members only."""
+    member_id = request.path_params['member_id']
+    if request.state.session['user_id'] != member_id:
+        return jsonify({'error': 'You are not authorized to access this resource.'}, 403)
+
+    params = (member_id,)
+    try:
+        # One member lookup serves both the membership check and the prompt
+        member_info = reference_data.resolve_member(await query_one(gymfit.CHAT_MEMBER_QUERY, params))
+        if not member_info or member_info['MembershipType'] != 'Gold':
+            return jsonify({'error': 'AI Chatbot is only available for Gold members. Please upgrade your membership to access this feature.'}, 403)
+
+        question = ((await request.json()).get('question') or '').strip()
+        if not question:
+            return jsonify({'error': 'Please provide a question'}, 400)
+
+        # Factual lookups are answered from the member's cached stats
+        started = time.perf_counter()
+        route = classify_question(question)
+        if route.local:
+            stats, sessions, streaks = await asyncio.gather(
+                asyncio.to_thread(_pooled, member_analytics.get_member, member_id),
+                query_all(gymfit.CHAT_SESSIONS_QUERY, params) if 'sessions' in route.topics else _none(),
+                asyncio.to_thread(_pooled, member_streaks.summary, member_id) if 'streak' in route.topics else _none()
+            )
+            response = answer_question(route, member_info, stats, sessions, streaks)
+            if response:
+                chat_router.record_local(route, (time.perf_counter() - started) * 1000)
+                await asyncio.to_thread(_pooled, chat_memory.append, member_id, question, response)
+                return jsonify({'success': True, 'response': response, 'isMarkdown': True, 'source': 'local'})
+            route.reason = 'no_stats'
+
+        recent_workouts, health_metrics, upcoming_sessions, conversation = await asyncio.gather(
+            query_all(gymfit.CHAT_WORKOUTS_QUERY, params),
+            query_all(gymfit.CHAT_HEALTH_QUERY, params),
+            query_all(gymfit.CHAT_SESSIONS_QUERY, params),
+            asyncio.to_thread(_pooled, chat_memory.load, member_id)
+        )
+
+        response, usage = await generate_smart_ai_response_async(
+            question, member_info, recent_workouts, health_metrics, upcoming_sessions, conversation
+        )
+        chat_router.record_escalated(route, (time.perf_counter() - started) * 1000)
+
+        await asyncio.to_thread(_pooled, chat_memory.append, member_id, question, response, usage)
+        if conversation:
+            chat_memory.record_usage(conversation, usage)
+            chat_memory.maybe_summarize(conversation, member_id, estimate_tokens(question) + estimate_tokens(response),
+                                        _request_shard.get())
+        return jsonify({'success': True, 'response': response, 'isMarkdown': True, 'source': 'model'})
+
+    except Exception as e:
+        print(f"Chat error: {e}")
+        return jsonify({'error': 'An error occurred while processing your request. Please try again.'}, 500)
+
+# --- Session Routes ---
+
+def _int_arg(request, name, default=None):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+@admit('booking')
+@login_required
+async def get_available_sessions(request):
+    """Get available sessions for booking, served from the in-memory session index."""
+    args = request.query_params
+    try:
+        date_from = args.get('date_from')
+        date_to = args.get('date_to')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+    except ValueError:
+        return jsonify({'error': 'Dates must use the YYYY-MM-DD format'}, 400)
+
+    limit = min(max(_int_arg(request, 'limit', 50), 1), 200)
+    offset = max(_int_arg(request, 'offset', 0), 0)
+    gym_id = request.state.session.get('gym_id')
+    # A stale index reloads from MySQL with the blocking driver; keep that off the loop
+    sessions, total = await asyncio.to_thread(
+        session_index.query,
+        date_from=date_from,
+        date_to=date_to,
+        trainer_id=_int_arg(request, 'trainer_id'),
+        specialization=args.get('specialization'),
+        min_spots=_int_arg(request, 'min_spots', 1),
+        limit=limit,
+        offset=offset,
+        # Members only see sessions they can book: those on their gym's shard
+        shard=shard_router.shard_for_gym(gym_id) if shard_router.enabled and gym_id is not None else None
+    )
+    if not session_index.is_loaded:
+        return jsonify({'error': 'Database connection failed'}, 500)
+    return jsonify({'sessions': sessions, 'total': total, 'limit': limit, 'offset': offset})
+
+async def reserve_seat(cursor, member_id, session_id):
+    """Async booking.reserve_seat: the same single INSERT, the same outcomes."""
+    try:
+        await cursor.execute(booking.RESERVE_SEAT, (member_id, session_id))
+    except pymysql.err.IntegrityError as e:
+        if e.args[0] == errorcode.ER_DUP_ENTRY:
+            return booking.ALREADY_BOOKED, None
+        raise
+    except pymysql.err.OperationalError as e:
+        # SIGNAL SQLSTATE '45000' from CheckSessionCapacity
+        if e.args[0] == errorcode.ER_SIGNAL_EXCEPTION and 'full' in str(e.args[1]):
+            return booking.FULL, None
+        raise
+
+    if cursor.rowcount == 0:
+        return booking.NOT_FOUND, None
+    return booking.BOOKED, cursor.lastrowid
+
+@admit('booking')
+@login_required
+@role_required('member')
+async def book_session(request):
+    """Book a session for the logged-in member, optionally joining the waitlist if full."""
+    member_id = request.state.session['user_id']
+    data = await request.json()
+    session_id = data.get('session_id')
+    join_waitlist = data.get('join_waitlist', False)
+    if not session_id: return jsonify({'error': 'Session ID required'}, 400)
+
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    outcome, booking_id = await reserve_seat(cursor, member_id, session_id)
+
+                    if outcome == booking.NOT_FOUND:
+                        await conn.rollback()
+                        return jsonify({'error': 'Session not found'}, 404)
+                    if outcome == booking.ALREADY_BOOKED:
+                        await conn.rollback()
+                        return jsonify({'error': 'You have already booked this session'}, 400)
+                    if outcome == booking.FULL:
+                        if not join_waitlist:
+                            await conn.rollback()
+                            return jsonify({'error': 'Session is full', 'waitlistAvailable': True}, 400)
+                        await cursor.execute(booking.JOIN_WAITLIST, (session_id, member_id))
+                        await cursor.execute(booking.WAITLIST_POSITION, (member_id, session_id))
+                        position = (await cursor.fetchone())[0]
+                        await conn.commit()
+                        return jsonify({'success': True, 'waitlisted': True, 'position': position,
+                                        'message': f'Session is full. You are #{position} on the waitlist.'})
+
+                    await cursor.execute(outbox.EMIT_SQL, outbox.event_params(
+                        outbox.SESSION_BOOKED, member_id, session=int(session_id), booking=booking_id
+                    ))
+                await conn.commit()
+            except pymysql.err.MySQLError:
+                await conn.rollback()
+                raise
+    except pymysql.err.MySQLError as e:
+        return database_error(e)
+
+    outbox_consumer.wake()
+    return jsonify({'success': True, 'booking_id': booking_id, 'message': 'Session booked successfully.'})
+
+@admit('booking')
+@login_required
+@role_required('member')
+async def leave_session_waitlist(request):
+    """Remove the logged-in member from a session waitlist."""
+    member_id = request.state.session['user_id']
+    session_id = (await request.json()).get('session_id')
+    if not session_id: return jsonify({'error': 'Session ID required'}, 400)
+
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # autocommit: the DELETE is its own transaction
+                removed = await cursor.execute(booking.LEAVE_WAITLIST, (session_id, member_id)) > 0
+    except pymysql.err.MySQLError as e:
+        return database_error(e)
+
+    if not removed:
+        return jsonify({'error': 'You are not on the waitlist for this session'}, 404)
+    return jsonify({'success': True, 'message': 'Removed from the waitlist.'})
+
+# --- Application ---
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    yield
+    for pool in _pools.values():
+        pool.close()
+        await pool.wait_closed()
+
+routes = [
+    Route('/api/dashboard/member/{member_id:int}', get_member_dashboard, methods=['GET']),
+    Route('/api/member/{member_id:int}/progress', get_member_progress, methods=['GET']),
+    Route('/api/member/{member_id:int}/chat', chat_with_ai, methods=['POST']),
+    Route('/api/sessions/available', get_available_sessions, methods=['GET']),
+    Route('/api/sessions/book', book_session, methods=['POST']),
+    Route('/api/sessions/waitlist/leave', leave_session_waitlist, methods=['POST']),
+    # Everything else (login, admin, workouts, cancellations, ...) runs on Flask
+    Mount('/', app=WSGIMiddleware(gymfit.app, workers=WSGI_WORKERS))
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['http://localhost:5000', 'http://127.0.0.1:5000'],
+                           allow_credentials=True, allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+# --- Main Execution ---
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('ASGI_PORT', '5000')))
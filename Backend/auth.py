@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+import os
+from dotenv import load_dotenv
+
+import db
+
+load_dotenv()
+
+# werkzeug method string including its cost parameters, e.g. "scrypt:32768:8:1"
+# or "pbkdf2:sha256:600000". Stored hashes with a different prefix are
+# upgraded on the next successful login.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+# Threads doing KDF work (0 runs it inline on the request thread) and how many
+# more requests may wait for one before new attempts are turned away.
+KDF_WORKERS = int(os.getenv('AUTH_KDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+KDF_QUEUE_LIMIT = int(os.getenv('AUTH_KDF_QUEUE_LIMIT', '32'))
+KDF_TIMEOUT_SECONDS = float(os.getenv('AUTH_KDF_TIMEOUT_SECONDS', '10'))
+
+ROLE_TABLES = {
+    'member': ('Member', 'M_ID'),
+    'trainer': ('Trainer', 'T_ID'),
+    'admin': ('Admin', 'A_ID')
+}
+
+CREDENTIALS_QUERY = """
+    SELECT User_ID, Name, Password
+    FROM UserCredentials
+    WHERE Email = %s AND Role = %s
+"""
+
+class KDFOverloaded(Exception):
+    """Raised when the KDF pool is saturated and the request should be retried later."""
+
+_executor = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix='kdf') if KDF_WORKERS > 0 else None
+_slots = threading.BoundedSemaphore(KDF_WORKERS + KDF_QUEUE_LIMIT) if KDF_WORKERS > 0 else None
+
+def _run_kdf(fn, *args):
+    """Run KDF work on the bounded pool.
+
+    hashlib's scrypt and pbkdf2 release the GIL, so the pool caps how many
+    cores logins can take while request threads keep serving other routes.
+    """
+    if _executor is None:
+        return fn(*args)
+    if not _slots.acquire(blocking=False):
+        raise KDFOverloaded()
+    try:
+        future = _executor.submit(fn, *args)
+    except RuntimeError:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=KDF_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        raise KDFOverloaded()
+
+def needs_rehash(password_hash):
+    """True if a stored hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    return password_hash.split('$', 1)[0] != PASSWORD_HASH_METHOD
+
+def hash_password(password):
+    """Hash a new password with the configured method."""
+    return _run_kdf(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def _verify_and_upgrade(password_hash, password):
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if needs_rehash(password_hash):
+        return True, generate_password_hash(password, PASSWORD_HASH_METHOD)
+    return True, None
+
+def authenticate(conn, email, password, role):
+    """Check credentials for a role. Returns (user_id, name) or None.
+
+    Looks the user up through the UserCredentials view with a prepared
+    statement and, when the stored hash uses outdated parameters, rewrites
+    it in the same step. The caller owns the transaction and must commit to
+    keep the upgraded hash.
+    """
+    row = db.query_one(conn, CREDENTIALS_QUERY, (email, role), dictionary=False)
+    if not row:
+        return None
+
+    user_id, name, password_hash = row
+    valid, new_hash = _run_kdf(_verify_and_upgrade, password_hash, password)
+    if not valid:
+        return None
+
+    if new_hash:
+        table_name, id_column = ROLE_TABLES[role]
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"UPDATE {table_name} SET Password = %s WHERE {id_column} = %s AND Password = %s",
+                (new_hash, user_id, password_hash)
+            )
+        finally:
+            cursor.close()
+    return user_id, name
@@ -0,0 +1,109 @@
+from mysql.connector import Error, errorcode
+
+import db
+
+# Outcomes of a reservation attempt
+BOOKED = 'booked'
+FULL = 'full'
+ALREADY_BOOKED = 'already_booked'
+NOT_FOUND = 'not_found'
+
+# Hot booking statements, run as cached server-side prepared statements
+RESERVE_SEAT = """
+    INSERT INTO WorkoutLog (M_ID, S_ID, Exercise, Date, Duration, Progress)
+    SELECT %s, S_ID, 'Session Booking', SessionDate, Duration, 'Booked'
+    FROM Session
+    WHERE S_ID = %s AND SessionDate >= CURDATE()
+"""
+
+JOIN_WAITLIST = """
+    INSERT IGNORE INTO SessionWaitlist (S_ID, M_ID)
+    VALUES (%s, %s)
+"""
+
+WAITLIST_POSITION = """
+    SELECT COUNT(*)
+    FROM SessionWaitlist w
+    JOIN SessionWaitlist mine ON mine.S_ID = w.S_ID AND mine.M_ID = %s
+    WHERE w.S_ID = %s AND w.W_ID <= mine.W_ID
+"""
+
+LEAVE_WAITLIST = "DELETE FROM SessionWaitlist WHERE S_ID = %s AND M_ID = %s"
+
+MEMBER_BOOKINGS = """
+    SELECT DISTINCT S_ID
+    FROM WorkoutLog
+    WHERE M_ID = %s AND S_ID IS NOT NULL AND Exercise = 'Session Booking'
+    FOR UPDATE
+"""
+
+def reserve_seat(conn, member_id, session_id):
+    """Book a session seat with a single INSERT.
+
+    The CheckSessionCapacity trigger reserves capacity with a conditional
+    UPDATE on Session.BookedCount and the uq_workoutlog_booking key rejects
+    duplicates, so the whole check-and-book is one atomic statement.
+    Returns (outcome, booking_id). The caller owns the transaction.
+    """
+    try:
+        cursor = db.execute(conn, RESERVE_SEAT, (member_id, session_id))
+    except Error as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return ALREADY_BOOKED, None
+        if e.sqlstate == '45000' and 'full' in (e.msg or ''):
+            return FULL, None
+        raise
+
+    if cursor.rowcount == 0:
+        return NOT_FOUND, None
+    return BOOKED, cursor.lastrowid
+
+def join_waitlist(conn, member_id, session_id):
+    """Add a member to the FIFO waitlist of a session and return their position."""
+    db.execute(conn, JOIN_WAITLIST, (session_id, member_id))
+    return db.query_one(conn, WAITLIST_POSITION, (member_id, session_id), dictionary=False)[0]
+
+def leave_waitlist(conn, member_id, session_id):
+    """Remove a member from a session waitlist. Returns True if they were on it."""
+    return db.execute(conn, LEAVE_WAITLIST, (session_id, member_id)).rowcount > 0
+
+def member_bookings(conn, member_id):
+    """Sessions a member holds a seat in, locked until the caller's transaction ends."""
+    return [row[0] for row in db.query_all(conn, MEMBER_BOOKINGS, (member_id,), dictionary=False)]
+
+def promote_from_waitlist(conn, session_id):
+    """Book the first waitlisted member into a freed seat.
+
+    Entries are locked with SKIP LOCKED so concurrent cancellations promote
+    different members instead of queueing behind each other. Returns the
+    promoted member ID, or None if nobody could be promoted. The promoted
+    member is notified by the outbox consumer (see outbox.SESSION_CANCELLED).
+    """
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute("""
+                SELECT W_ID, M_ID
+                FROM SessionWaitlist
+                WHERE S_ID = %s
+                ORDER BY W_ID
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """, (session_id,))
+            entry = cursor.fetchone()
+            if not entry:
+                return None
+
+            waitlist_id, member_id = entry
+            outcome, _ = reserve_seat(conn, member_id, session_id)
+
+            if outcome in (FULL, NOT_FOUND):
+                # Seat already taken by a direct booking, or the session has passed
+                return None
+
+            cursor.execute("DELETE FROM SessionWaitlist WHERE W_ID = %s", (waitlist_id,))
+            if outcome == ALREADY_BOOKED:
+                continue
+            return member_id
+    finally:
+        cursor.close()
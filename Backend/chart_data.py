@@ -0,0 +1,62 @@
+from array import array
+
+def lttb_indices(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of at most `threshold` points that keep the visual
+    shape of the series: the first and last points plus, per bucket, the
+    point forming the largest triangle with the previous pick and the
+    average of the next bucket.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_count
+        avg_y = sum(ys[avg_start:avg_end]) / avg_count
+
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        selected.append(next_a)
+        a = next_a
+
+    selected.append(n - 1)
+    return selected
+
+def to_series(rows, value_key, points=0, typecode='d'):
+    """Turn (date, value) tuple rows into {'dates': [...], value_key: [...]}.
+
+    Values are collected into a typed array instead of per-row dicts. When
+    `points` is set and the series is longer, it is downsampled with LTTB.
+    """
+    if not rows:
+        return {'dates': [], value_key: []}
+
+    dates, raw_values = zip(*rows)
+    if typecode == 'd':
+        values = array('d', (float(value) for value in raw_values))
+    else:
+        values = array(typecode, raw_values)
+
+    if points and len(dates) > points:
+        xs = array('d', (day.toordinal() for day in dates))
+        keep = lttb_indices(xs, values, points)
+        dates = [dates[i] for i in keep]
+        values = array(typecode, (values[i] for i in keep))
+
+    return {'dates': [day.isoformat() for day in dates], value_key: values.tolist()}
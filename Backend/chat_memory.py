@@ -0,0 +1,209 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+import db
+from ai_chatbot import estimate_tokens, summarize_conversation
+
+load_dotenv()
+
+# Upper bound for everything sent to the model on one chat request
+PROMPT_TOKEN_BUDGET = int(os.getenv('CHAT_PROMPT_TOKEN_BUDGET', '3000'))
+
+# Unsummarized history above this many tokens is folded into the summary,
+# keeping the most recent messages verbatim
+HISTORY_TOKEN_LIMIT = int(os.getenv('CHAT_HISTORY_TOKENS', '1200'))
+KEEP_RECENT_MESSAGES = int(os.getenv('CHAT_KEEP_RECENT_MESSAGES', '4'))
+
+SUMMARY_QUERY = "SELECT Summary, Tokens, SummarizedThrough FROM ChatSummary WHERE M_ID = %s"
+
+HISTORY_QUERY = """
+    SELECT Msg_ID, Role, Content, Tokens
+    FROM ChatMessage
+    WHERE M_ID = %s AND Msg_ID > %s
+    ORDER BY Msg_ID
+"""
+
+RECENT_MESSAGES_QUERY = """
+    SELECT Msg_ID, Role, Content, CreatedAt
+    FROM ChatMessage
+    WHERE M_ID = %s
+    ORDER BY Msg_ID DESC
+    LIMIT %s
+"""
+
+INSERT_MESSAGE = """
+    INSERT INTO ChatMessage (M_ID, Role, Content, Tokens, PromptTokens, CachedTokens, CompletionTokens)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+UPSERT_SUMMARY = """
+    INSERT INTO ChatSummary (M_ID, Summary, Tokens, SummarizedThrough)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        Summary = VALUES(Summary),
+        Tokens = VALUES(Tokens),
+        SummarizedThrough = VALUES(SummarizedThrough)
+"""
+
+class Conversation:
+    """A member's rolling summary plus the messages it does not cover yet."""
+
+    __slots__ = ('summary', 'summary_tokens', 'summarized_through', 'messages', 'trimmed')
+
+    def __init__(self, summary, summary_tokens, summarized_through, messages):
+        self.summary = summary
+        self.summary_tokens = summary_tokens
+        self.summarized_through = summarized_through
+        self.messages = messages
+        self.trimmed = 0
+
+    @property
+    def history_tokens(self):
+        return sum(message['Tokens'] for message in self.messages)
+
+    def fit(self, fixed_tokens):
+        """The newest messages that fit in the budget next to fixed_tokens of prompt, oldest first."""
+        available = PROMPT_TOKEN_BUDGET - fixed_tokens
+        kept = []
+        for message in reversed(self.messages):
+            if message['Tokens'] > available:
+                break
+            available -= message['Tokens']
+            kept.append(message)
+        kept.reverse()
+        # Never open the history with an orphaned answer
+        while kept and kept[0]['Role'] != 'user':
+            kept.pop(0)
+        self.trimmed = len(self.messages) - len(kept)
+        return [{'role': message['Role'], 'content': message['Content']} for message in kept]
+
+class ChatMemory:
+    """Persisted AI coach history with a rolling summary and a prompt token budget.
+
+    Each request sends the summary plus as many of the newest unsummarized
+    messages as fit in PROMPT_TOKEN_BUDGET. When the unsummarized history
+    grows past HISTORY_TOKEN_LIMIT, a background summarization folds all but
+    the last KEEP_RECENT_MESSAGES into the summary. Until it finishes, the
+    budget trims the oldest messages instead, so prompts never grow past it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-summary')
+        self._summarizing = set()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hits = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self.trimmed_messages = 0
+
+    def load(self, conn, member_id):
+        row = db.query_one(conn, SUMMARY_QUERY, (member_id,))
+        summary, summary_tokens, through = (row['Summary'], row['Tokens'], row['SummarizedThrough']) if row else (None, 0, 0)
+        messages = db.query_all(conn, HISTORY_QUERY, (member_id, through))
+        return Conversation(summary, summary_tokens, through, messages)
+
+    def append(self, conn, member_id, question, answer, usage=None):
+        """Store one question/answer turn; usage is the model's token usage, None for local answers."""
+        usage = usage or {}
+        db.execute(conn, INSERT_MESSAGE, (member_id, 'user', question, estimate_tokens(question), None, None, None))
+        db.execute(conn, INSERT_MESSAGE, (
+            member_id, 'assistant', answer, estimate_tokens(answer),
+            usage.get('promptTokens'), usage.get('cachedTokens'), usage.get('completionTokens')
+        ))
+        conn.commit()
+
+    def record_usage(self, conversation, usage):
+        """Count a model request's token usage and the history its prompt had to leave out."""
+        if not usage:
+            return
+        with self._lock:
+            self.trimmed_messages += conversation.trimmed
+            self.requests += 1
+            self.prompt_tokens += usage['promptTokens']
+            self.cached_tokens += usage['cachedTokens']
+            self.completion_tokens += usage['completionTokens']
+            if usage['cachedTokens']:
+                self.cache_hits += 1
+
+    def maybe_summarize(self, conversation, member_id, added_tokens, shard=None):
+        """Schedule a background summary once the unsummarized history is over the limit.
+
+        shard is the database shard holding the member's gym (default shard if None).
+        """
+        if conversation.history_tokens + added_tokens <= HISTORY_TOKEN_LIMIT:
+            return
+        with self._lock:
+            if member_id in self._summarizing:
+                return
+            self._summarizing.add(member_id)
+        self._executor.submit(self._summarize, member_id, shard)
+
+    def _summarize(self, member_id, shard=None):
+        conn = db.get_connection(shard)
+        if not conn:
+            with self._lock:
+                self._summarizing.discard(member_id)
+            return
+        try:
+            conversation = self.load(conn, member_id)
+            older = conversation.messages[:-KEEP_RECENT_MESSAGES] if KEEP_RECENT_MESSAGES else conversation.messages
+            if not older:
+                return
+            summary = summarize_conversation(conversation.summary, older)
+            if summary is None:
+                with self._lock:
+                    self.summary_failures += 1
+                return
+            db.execute(conn, UPSERT_SUMMARY, (member_id, summary, estimate_tokens(summary), older[-1]['Msg_ID']))
+            conn.commit()
+            with self._lock:
+                self.summaries += 1
+        except Error as e:
+            print(f"Error summarizing chat history for member {member_id}: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+            with self._lock:
+                self._summarizing.discard(member_id)
+
+    def recent(self, conn, member_id, limit):
+        """The member's last `limit` messages, oldest first, for redisplay."""
+        rows = db.query_all(conn, RECENT_MESSAGES_QUERY, (member_id, limit))
+        rows.reverse()
+        return rows
+
+    def clear(self, conn, member_id):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM ChatMessage WHERE M_ID = %s", (member_id,))
+            cursor.execute("DELETE FROM ChatSummary WHERE M_ID = %s", (member_id,))
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'modelRequests': self.requests,
+                'promptTokens': self.prompt_tokens,
+                'cachedPromptTokens': self.cached_tokens,
+                'completionTokens': self.completion_tokens,
+                'avgPromptTokens': round(self.prompt_tokens / self.requests, 1) if self.requests else None,
+                'cachePrefixHitRate': round(self.cache_hits / self.requests, 4) if self.requests else None,
+                'cachedTokenShare': round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else None,
+                'summaries': self.summaries,
+                'summaryFailures': self.summary_failures,
+                'summariesRunning': len(self._summarizing),
+                'trimmedMessages': self.trimmed_messages,
+                'promptTokenBudget': PROMPT_TOKEN_BUDGET
+            }
+
+chat_memory = ChatMemory()
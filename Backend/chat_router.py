@@ -0,0 +1,216 @@
+import re
+import threading
+
+# Topics a member can look up from their cached stats. Each pattern is one
+# alternative of a single compiled regex, so one scan of the question finds
+# every topic it mentions.
+TOPICS = {
+    'workouts': r'workouts?|exercis(?:e|es|ed|ing)|trained|training sessions?|gym visits?|times? (?:did i|have i) (?:go|gone|been)',
+    'consistency': r'consisten(?:t|cy)|active days|how often',
+    'streak': r'streaks?|in a row',
+    'duration': r'durations?|how long|minutes?|average workout',
+    'calories': r'calories|kcal|burn(?:ed|t)?',
+    'weight': r'weigh(?:t|s|ed)?|kgs?|kilos?',
+    'bmi': r'bmi|body mass',
+    'steps': r'steps?|walk(?:ed|ing)?',
+    'sleep': r'sleep|slept',
+    'sessions': r'sessions?|class(?:es)?|booking|booked',
+    'membership': r'membership|expir(?:e|es|y|ation)|renew(?:al)?|member since|plan end'
+}
+
+TOPIC_PATTERN = re.compile(
+    '|'.join(rf'(?P<{topic}>\b(?:{pattern})\b)' for topic, pattern in TOPICS.items())
+)
+
+# Questions asking for a number or a list
+LOOKUP_PATTERN = re.compile(
+    r"\b(?:how (?:many|much|long|often)|what(?:'s| is| was| are| were)? (?:my|the)|"
+    r"when (?:is|does|are|do|was)|which|show(?: me)?|tell me|list|did i|have i|"
+    r"my (?:current|latest|last|average|avg|total)|do i have)\b"
+)
+
+# Open-ended coaching: always goes to the model
+COACHING_PATTERN = re.compile(
+    r"\b(?:should|could|would|how (?:can|do|to|should)|why|advice|advise|tips?|suggest\w*|"
+    r"recommend\w*|improve|better|help me|plans?(?! ends?\b)|goals?|los(?:e|ing)|gain(?:ing)?|"
+    r"routine for|diet|meal|eat|nutrition|"
+    r"motivat\w*|injur\w*|pain|sore|is (?:it|that|this) (?:good|bad|ok|okay|normal|healthy)|"
+    r"am i (?:doing|on track)|compare|vs|versus)\b"
+)
+
+# Periods the cached stats do not cover (they hold 7 and 30 day windows)
+UNSUPPORTED_PERIOD_PATTERN = re.compile(
+    r"\b(?:years?|yesterday|today|ever|all time|since|weekends?|last month|"
+    r"(?:last|past) (?!(?:7|seven|30|thirty) days\b)\w+ (?:days|weeks|months)|"
+    r"\w+ (?:days?|weeks?|months?) ago|(?:19|20)\d{2}|"
+    r"(?:mon|tues|wednes|thurs|fri|satur|sun)days?|"
+    r"(?:january|february|march|april|may|june|july|august|september|october|november|december))\b"
+)
+
+WEEK_PATTERN = re.compile(r'\b(?:this|last|past) (?:week|7 days)\b|\bweekly\b')
+
+# Topics with a 7-day figure; a weekly question about any other is escalated
+WEEKLY_TOPICS = {'workouts', 'steps', 'sleep', 'sessions', 'membership', 'bmi', 'weight'}
+
+# "workouts" only qualifies these ("how long are my workouts") when they appear
+WORKOUT_DETAIL_TOPICS = {'duration', 'calories', 'consistency', 'streak'}
+
+# Questions longer than this are treated as conversational
+MAX_LOOKUP_WORDS = 20
+
+class Route:
+    __slots__ = ('topics', 'reason', 'weekly')
+
+    def __init__(self, topics, reason, weekly=False):
+        self.topics = topics
+        self.reason = reason
+        self.weekly = weekly
+
+    @property
+    def local(self):
+        return self.reason == 'local'
+
+def classify_question(question):
+    """Decide whether a chat question can be answered from the member's stats.
+
+    Returns a Route; route.local is True for factual lookups about known
+    topics. Anything that asks for advice, covers a period the stats do not
+    hold or matches no topic is escalated, with the reason recorded.
+    """
+    text = ' '.join(question.lower().split())
+    if COACHING_PATTERN.search(text):
+        return Route((), 'coaching')
+    topics = []
+    for match in TOPIC_PATTERN.finditer(text):
+        if match.lastgroup not in topics:
+            topics.append(match.lastgroup)
+    if not topics:
+        return Route((), 'no_topic')
+    words = len(text.split())
+    if words > MAX_LOOKUP_WORDS or (words > 4 and not LOOKUP_PATTERN.search(text)):
+        return Route(tuple(topics), 'not_lookup')
+    weekly = bool(WEEK_PATTERN.search(text))
+    if UNSUPPORTED_PERIOD_PATTERN.search(text) or (weekly and not WEEKLY_TOPICS.issuperset(topics)):
+        return Route(tuple(topics), 'period')
+    if 'workouts' in topics and WORKOUT_DETAIL_TOPICS.intersection(topics):
+        topics.remove('workouts')
+    return Route(tuple(topics), 'local', weekly=weekly)
+
+def _bmi_category(bmi):
+    if bmi < 18.5:
+        return 'underweight'
+    if bmi < 25:
+        return 'normal'
+    if bmi < 30:
+        return 'overweight'
+    return 'obese'
+
+def _answer_topic(topic, route, member_info, stats, sessions, streaks):
+    if topic == 'workouts':
+        if route.weekly:
+            return f"🏋️ You logged **{stats['weeklyWorkouts']} workouts** in the last 7 days."
+        return (f"🏋️ You logged **{stats['workoutsLast30Days']} workouts** in the last 30 days "
+                f"({stats['weeklyWorkouts']} in the last 7 days).")
+    if topic == 'consistency':
+        active_days = round(stats['consistencyPercent'] * 30 / 100)
+        return f"📅 You worked out on **{active_days} of the last 30 days**, a consistency of {stats['consistencyPercent']:.0f}%."
+    if topic == 'streak':
+        if not streaks:
+            return None
+        longest = f"your longest is {streaks['longestStreak']} days"
+        if not streaks['currentStreak']:
+            return f"🔥 You don't have a streak going right now ({longest}). Log a workout today to start one!"
+        return f"🔥 You're on a **{streaks['currentStreak']}-day workout streak** ({longest})."
+    if topic == 'duration':
+        return f"⏱️ Your average workout over the last 30 days lasted **{stats['avgWorkoutDuration']:.1f} minutes**."
+    if topic == 'calories':
+        average = stats['avgMonthlyCalories']
+        per_workout = f", about {average:.0f} kcal per workout" if average else ''
+        return f"🔥 You burned **{stats['caloriesLast30Days']:.0f} kcal** in the last 30 days{per_workout}."
+    if topic == 'weight':
+        if stats['currentWeight'] is None:
+            return "⚖️ You haven't logged your weight yet."
+        change = stats['weightChange30Days']
+        trend = f"{'down' if change < 0 else 'up'} {abs(change):.1f} kg over 30 days" if change else 'unchanged over 30 days'
+        return f"⚖️ Your latest weight is **{stats['currentWeight']:.1f} kg** ({trend}; you started at {stats['startingWeight']:.1f} kg)."
+    if topic == 'bmi':
+        if not stats['bmi']:
+            return "📏 Log your weight and height to see your BMI."
+        return f"📏 Your BMI is **{stats['bmi']:.1f}** ({_bmi_category(stats['bmi'])})."
+    if topic == 'steps':
+        return f"👟 You averaged **{stats['avgDailySteps']:,} steps a day** over the last 7 days."
+    if topic == 'sleep':
+        if stats['avgWeeklySleep'] is None:
+            return "💤 No sleep logged in the last 7 days."
+        return f"💤 You averaged **{stats['avgWeeklySleep']:.1f} hours of sleep** a night over the last 7 days."
+    if topic == 'sessions':
+        if not sessions:
+            return "📅 You don't have any upcoming sessions booked. Use the \"Book Session\" button to schedule one!"
+        session_list = '\n'.join(f"- {s['Details']} on {s['SessionDate'].strftime('%B %d, %Y')}" for s in sessions[:3])
+        return f"📅 **Your upcoming sessions:**\n\n{session_list}"
+    if topic == 'membership':
+        days = stats['daysUntilExpiry']
+        expiry = (f"expires in **{days} days**" if days is not None and days >= 0
+                  else f"expired {-days} days ago" if days is not None else 'has no expiry on record')
+        return (f"🎫 Your **{member_info['MembershipType']}** membership (member since "
+                f"{member_info['JoinDate'].strftime('%B %Y')}) {expiry}.")
+    return None
+
+def answer_question(route, member_info, stats, sessions=None, streaks=None):
+    """Markdown answer for a local route, or None if the stats are missing.
+
+    streaks is member_streaks.summary() for routes with the 'streak' topic.
+    """
+    if not stats:
+        return None
+    parts = [_answer_topic(topic, route, member_info, stats, sessions, streaks) for topic in route.topics[:3]]
+    return '\n\n'.join(part for part in parts if part) or None
+
+class ChatRouter:
+    """Routing counters: local answers vs model escalations and their latency.
+
+    Latency saved is estimated as local answers times the difference between
+    the mean escalated and mean local latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.local_ms = 0.0
+        self.escalated = 0
+        self.escalated_ms = 0.0
+        self.by_topic = {}
+        self.by_reason = {}
+
+    def record_local(self, route, elapsed_ms):
+        with self._lock:
+            self.local += 1
+            self.local_ms += elapsed_ms
+            for topic in route.topics:
+                self.by_topic[topic] = self.by_topic.get(topic, 0) + 1
+
+    def record_escalated(self, route, elapsed_ms):
+        with self._lock:
+            self.escalated += 1
+            self.escalated_ms += elapsed_ms
+            self.by_reason[route.reason] = self.by_reason.get(route.reason, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            total = self.local + self.escalated
+            local_avg = self.local_ms / self.local if self.local else None
+            escalated_avg = self.escalated_ms / self.escalated if self.escalated else None
+            saved = (escalated_avg - local_avg) * self.local if local_avg is not None and escalated_avg is not None else None
+            return {
+                'questions': total,
+                'answeredLocally': self.local,
+                'escalated': self.escalated,
+                'hitRate': round(self.local / total, 4) if total else None,
+                'avgLocalMs': round(local_avg, 2) if local_avg is not None else None,
+                'avgEscalatedMs': round(escalated_avg, 2) if escalated_avg is not None else None,
+                'estimatedMsSaved': round(saved, 1) if saved is not None else None,
+                'localByTopic': dict(self.by_topic),
+                'escalatedByReason': dict(self.by_reason)
+            }
+
+chat_router = ChatRouter()
@@ -0,0 +1,509 @@
+"""
+Cold-tier archive of old WorkoutLog and HealthMetrics rows.
+
+Rows older than COLD_ARCHIVE_AFTER_DAYS (whole months) are moved out of
+MySQL into one columnar segment file per table, member and month:
+
+    <COLD_ARCHIVE_DIR>/<table>/<M_ID>/<YYYY-MM>.gfc
+
+A segment is a small JSON header followed by one zlib-compressed block per
+column: dates as day ordinals, integers as int64, DECIMAL(x,2) values as
+int64 hundredths (exact), text as a JSON list, plus a validity bitmap for
+columns holding NULLs. Files are memory-mapped and columns decoded on first
+use into typed arrays, so chart scans run as whole-array operations (bisect
+over the sorted dates, sum() over slices) rather than per-row Python.
+
+Only workouts not tied to a session are archived: bookings and session
+workouts feed Session.BookedCount and TrainerClient. Each member's oldest
+and newest HealthMetrics rows stay live for the starting/current weight
+figures. The hot queries look back 30 days at most and never see the
+archive; get_member_progress and exports merge it in (progress(),
+merge_series(), export_rows()).
+
+Usage:
+    python Backend/cold_archive.py --older-than-days 365 --chunk-size 1000
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import compress
+from operator import itemgetter
+
+from mysql.connector import Error
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Runtime state goes under GYMFIT_DATA_DIR (data/ at the project root, gitignored)
+DATA_DIR = os.getenv('GYMFIT_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+
+ARCHIVE_DIR = os.getenv('COLD_ARCHIVE_DIR', os.path.join(DATA_DIR, 'cold_archive'))
+
+# Rows older than this many days (rounded down to the start of a month) are archived
+ARCHIVE_AFTER_DAYS = int(os.getenv('COLD_ARCHIVE_AFTER_DAYS', '365'))
+
+# Memory-mapped segments kept open per process
+OPEN_SEGMENTS = int(os.getenv('COLD_ARCHIVE_OPEN_SEGMENTS', '256'))
+
+MAGIC = b'GFC1'
+SUFFIX = '.gfc'
+COMPRESSION_LEVEL = 6
+
+# Per archived table: primary key, rows eligible for the archive, and the
+# stored columns with their encoding. M_ID is implied by the file's directory.
+TABLES = {
+    'WorkoutLog': {
+        'key': 'L_ID',
+        'filter': 'S_ID IS NULL',
+        'columns': [
+            ('L_ID', 'int'), ('Date', 'date'), ('Exercise', 'text'), ('Duration', 'int'),
+            ('CaloriesBurnt', 'decimal'), ('Distance', 'decimal'), ('Progress', 'text')
+        ]
+    },
+    'HealthMetrics': {
+        'key': 'Metric_ID',
+        'filter': 'TRUE',
+        'columns': [
+            ('Metric_ID', 'int'), ('Date', 'date'), ('Weight', 'decimal'), ('Height', 'decimal'),
+            ('SleepHours', 'int'), ('WaterLiters', 'decimal'), ('Steps', 'int')
+        ]
+    }
+}
+
+TYPECODES = {'int': 'q', 'date': 'i', 'decimal': 'q'}
+
+def _encode(kind, values):
+    """(compressed data, compressed validity bitmap or None) for one column."""
+    valid = bytes(value is not None for value in values)
+    nulls = None if all(valid) else zlib.compress(valid, COMPRESSION_LEVEL)
+    if kind == 'text':
+        raw = json.dumps(values).encode('utf-8')
+    elif kind == 'date':
+        raw = array('i', (value.toordinal() if value is not None else 1 for value in values)).tobytes()
+    elif kind == 'decimal':
+        raw = array('q', (int(Decimal(value).scaleb(2).to_integral_value()) if value is not None else 0
+                          for value in values)).tobytes()
+    else:
+        raw = array('q', (int(value) if value is not None else 0 for value in values)).tobytes()
+    return zlib.compress(raw, COMPRESSION_LEVEL), nulls
+
+def write_segment(path, table, member_id, month, rows):
+    """Write rows (dicts keyed by column name) as a segment, atomically replacing path."""
+    columns = TABLES[table]['columns']
+    blocks = []
+    header_columns = {}
+    offset = 0
+    for name, kind in columns:
+        data, nulls = _encode(kind, [row[name] for row in rows])
+        entry = {'type': kind, 'offset': offset, 'length': len(data)}
+        blocks.append(data)
+        offset += len(data)
+        if nulls is not None:
+            entry['nulls'] = [offset, len(nulls)]
+            blocks.append(nulls)
+            offset += len(nulls)
+        header_columns[name] = entry
+
+    header = json.dumps({
+        'table': table, 'member': member_id, 'month': month, 'rows': len(rows),
+        'byteorder': sys.byteorder, 'columns': header_columns
+    }).encode('utf-8')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+class Segment:
+    """One memory-mapped segment; columns are decoded on first access."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not an archive segment")
+        header_length = int.from_bytes(self._map[4:8], 'little')
+        header = json.loads(self._map[8:8 + header_length])
+        self._data_start = 8 + header_length
+        self._columns = header['columns']
+        self._swap = header['byteorder'] != sys.byteorder
+        self.rows = header['rows']
+        self.month = header['month']
+        self._decoded = {}
+        self._valid = {}
+
+    def _block(self, offset, length):
+        start = self._data_start + offset
+        return zlib.decompress(self._map[start:start + length])
+
+    def column(self, name):
+        """Decoded column: a typed array (text columns: a list). NULLs read as 0 (dates as day 1)."""
+        values = self._decoded.get(name)
+        if values is None:
+            entry = self._columns[name]
+            raw = self._block(entry['offset'], entry['length'])
+            if entry['type'] == 'text':
+                values = json.loads(raw)
+            else:
+                values = array(TYPECODES[entry['type']])
+                values.frombytes(raw)
+                if self._swap:
+                    values.byteswap()
+            self._decoded[name] = values
+        return values
+
+    def valid(self, name):
+        """Validity bitmap of a column: one byte per row, 1 where not NULL."""
+        mask = self._valid.get(name)
+        if mask is None:
+            nulls = self._columns[name].get('nulls')
+            mask = self._block(*nulls) if nulls else b'\x01' * self.rows
+            self._valid[name] = mask
+        return mask
+
+    def records(self, names):
+        """Rows as dicts with SQL-typed values (date, Decimal, None), in stored order."""
+        decoded = []
+        for name in names:
+            kind = self._columns[name]['type']
+            values = self.column(name)
+            if kind == 'date':
+                values = [date.fromordinal(value) for value in values]
+            elif kind == 'decimal':
+                values = [Decimal(value).scaleb(-2) for value in values]
+            decoded.append([value if ok else None for value, ok in zip(values, self.valid(name))])
+        return [dict(zip(names, row)) for row in zip(*decoded)]
+
+    def close(self):
+        self._decoded.clear()
+        self._map.close()
+
+def _day_totals(dates, values, valid):
+    """Per-day (ordinal, sum, valid count) over date-sorted columns, one slice per day."""
+    totals = []
+    lo = 0
+    n = len(dates)
+    while lo < n:
+        day = dates[lo]
+        hi = bisect_right(dates, day, lo)
+        count = valid[lo:hi].count(1)
+        if count:
+            totals.append((day, sum(values[lo:hi]), count))
+        lo = hi
+    return totals
+
+class ColdArchive:
+    """Reads archive segments for the API and exports, with an LRU of open segments."""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._open = OrderedDict()  # (path, mtime_ns, size) -> Segment
+        self.segment_opens = 0
+        self.segment_hits = 0
+        self.scans = 0
+        self.rows_scanned = 0
+        self.scan_ms = 0.0
+
+    def member_dir(self, table, member_id):
+        return os.path.join(self.root, table, str(member_id))
+
+    def segment_path(self, table, member_id, month):
+        return os.path.join(self.member_dir(table, member_id), f"{month}{SUFFIX}")
+
+    def _paths(self, table, member_id):
+        try:
+            names = sorted(entry.name for entry in os.scandir(self.member_dir(table, member_id))
+                           if entry.name.endswith(SUFFIX))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.member_dir(table, member_id), name) for name in names]
+
+    def _segment(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            segment = self._open.get(key)
+            if segment is not None:
+                self._open.move_to_end(key)
+                self.segment_hits += 1
+                return segment
+        segment = Segment(path)
+        with self._lock:
+            self._open[key] = segment
+            self.segment_opens += 1
+            # Replaced files and the least recently used segments drop out; their
+            # maps are closed by garbage collection once no scan holds them
+            for stale in [other for other in self._open if other[0] == path and other != key]:
+                del self._open[stale]
+            while len(self._open) > OPEN_SEGMENTS:
+                self._open.popitem(last=False)
+        return segment
+
+    def segments(self, table, member_id):
+        """The member's segments for a table, oldest month first."""
+        return [self._segment(path) for path in self._paths(table, member_id)]
+
+    def progress(self, member_id):
+        """Archived chart series for get_member_progress, as (date, value) tuples by date.
+
+        Returns (weights, daily calories) shaped like WEIGHT_PROGRESS_QUERY and
+        CALORIE_TREND_QUERY rows.
+        """
+        started = time.perf_counter()
+        weights = []
+        calories = []
+        scanned = 0
+
+        for segment in self.segments('HealthMetrics', member_id):
+            dates = segment.column('Date')
+            values = segment.column('Weight')
+            valid = segment.valid('Weight')
+            # Rows are stored by date, so the filtered columns stay in order
+            weights.extend(zip(
+                map(date.fromordinal, compress(dates, valid)),
+                (Decimal(value).scaleb(-2) for value in compress(values, valid))
+            ))
+            scanned += segment.rows
+
+        for segment in self.segments('WorkoutLog', member_id):
+            for day, total, _ in _day_totals(segment.column('Date'), segment.column('CaloriesBurnt'),
+                                             segment.valid('CaloriesBurnt')):
+                calories.append((date.fromordinal(day), Decimal(total).scaleb(-2)))
+            scanned += segment.rows
+
+        with self._lock:
+            self.scans += 1
+            self.rows_scanned += scanned
+            self.scan_ms += (time.perf_counter() - started) * 1000
+        return weights, calories
+
+    def workout_days(self, member_id):
+        """Day ordinals of the member's archived workouts, sorted, each day once."""
+        days = set()
+        for segment in self.segments('WorkoutLog', member_id):
+            days.update(compress(segment.column('Date'), segment.valid('Date')))
+        return sorted(days)
+
+    def remove_member(self, member_id):
+        """Delete a deleted member's segments and drop them from the open-segment cache."""
+        for table in TABLES:
+            directory = self.member_dir(table, member_id)
+            with self._lock:
+                for key in [key for key in self._open if os.path.dirname(key[0]) == directory]:
+                    del self._open[key]
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def members(self, table):
+        try:
+            return sorted(int(entry.name) for entry in os.scandir(os.path.join(self.root, table))
+                          if entry.is_dir() and entry.name.isdigit())
+        except FileNotFoundError:
+            return []
+
+    def rows(self, table, member_id):
+        """A member's archived rows of a table, from the segment headers."""
+        return sum(segment.rows for segment in self.segments(table, member_id))
+
+    def count(self, table):
+        """Archived rows of a table, from the segment headers."""
+        return sum(self._segment(path).rows for member_id in self.members(table)
+                   for path in self._paths(table, member_id))
+
+    def export_rows(self, table, columns, member_ids=None):
+        """Yield archived rows as tuples of `columns`, by member and month.
+
+        M_ID comes from the segment's directory; columns the archive does
+        not store (WorkoutLog.S_ID) are None. With member_ids, members not
+        in it (deleted ones) are skipped.
+        """
+        stored = [name for name, _ in TABLES[table]['columns']]
+        for member_id in self.members(table):
+            if member_ids is not None and member_id not in member_ids:
+                continue
+            for segment in self.segments(table, member_id):
+                for record in segment.records(stored):
+                    record['M_ID'] = member_id
+                    yield tuple(record.get(column) for column in columns)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'archiveDir': self.root,
+                'openSegments': len(self._open),
+                'segmentOpens': self.segment_opens,
+                'segmentCacheHits': self.segment_hits,
+                'progressScans': self.scans,
+                'rowsScanned': self.rows_scanned,
+                'avgScanMs': round(self.scan_ms / self.scans, 3) if self.scans else None
+            }
+
+def merge_series(archived, live, names, dictionary, summed=False):
+    """Merge archived (date, value) tuples into live query rows, by date.
+
+    Output rows have the live rows' shape: dicts keyed by `names` when
+    `dictionary`, tuples otherwise. With `summed`, a day present in both
+    (a workout back-dated into an archived month) is added together.
+    """
+    if not archived:
+        return live
+    if dictionary:
+        archived = [dict(zip(names, row)) for row in archived]
+        key = itemgetter(names[0])
+    else:
+        key = itemgetter(0)
+    merged = list(heapq.merge(archived, live, key=key))
+    if not summed:
+        return merged
+
+    combined = []
+    for row in merged:
+        if combined and key(combined[-1]) == key(row):
+            previous = combined[-1]
+            if dictionary:
+                previous[names[1]] += row[names[1]]
+            else:
+                combined[-1] = (previous[0], previous[1] + row[1])
+        else:
+            combined.append(dict(row) if dictionary else row)
+    return combined
+
+cold_archive = ColdArchive()
+
+# --- Archiving ---
+
+def archive_cutoff(older_than_days, today=None):
+    """First day of the month containing today - older_than_days; rows before it are archived."""
+    day = (today or date.today()) - timedelta(days=older_than_days)
+    return day.replace(day=1)
+
+def _anchor_ids(cursor, member_id):
+    """The member's oldest and newest HealthMetrics rows, which stay live."""
+    cursor.execute("""
+        (SELECT Metric_ID FROM HealthMetrics WHERE M_ID = %s ORDER BY Date, Metric_ID LIMIT 1)
+        UNION
+        (SELECT Metric_ID FROM HealthMetrics WHERE M_ID = %s ORDER BY Date DESC, Metric_ID DESC LIMIT 1)
+    """, (member_id, member_id))
+    return {row['Metric_ID'] for row in cursor.fetchall()}
+
+def archive_member(conn, archive, table, member_id, cutoff, chunk_size):
+    """Move one member's rows older than cutoff into segments. Returns rows archived."""
+    spec = TABLES[table]
+    key = spec['key']
+    names = [name for name, _ in spec['columns']]
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT {', '.join(names)} FROM {table}
+            WHERE M_ID = %s AND Date < %s AND {spec['filter']}
+            ORDER BY Date, {key}
+        """, (member_id, cutoff))
+        rows = cursor.fetchall()
+        if table == 'HealthMetrics' and rows:
+            anchors = _anchor_ids(cursor, member_id)
+            rows = [row for row in rows if row[key] not in anchors]
+        if not rows:
+            return 0
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['Date'].strftime('%Y-%m'), []).append(row)
+
+        # Segments are written (and fsynced) before the rows are deleted, so a
+        # crash in between leaves rows in both places; the next run merges them
+        # into the segment by key and deletes them again
+        for month, month_rows in by_month.items():
+            path = archive.segment_path(table, member_id, month)
+            if os.path.exists(path):
+                existing = Segment(path)
+                try:
+                    kept = {record[key]: record for record in existing.records(names)}
+                finally:
+                    existing.close()
+                kept.update((row[key], row) for row in month_rows)
+                month_rows = sorted(kept.values(), key=itemgetter('Date', key))
+            write_segment(path, table, member_id, month, month_rows)
+
+        ids = [row[key] for row in rows]
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        conn.commit()
+        return len(rows)
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def archive_shard(conn, archive, cutoff, chunk_size):
+    """Archive every member on one database. Returns {table: rows archived}."""
+    archived = {table: 0 for table in TABLES}
+    cursor = conn.cursor()
+    try:
+        for table, spec in TABLES.items():
+            last_member = 0
+            while True:
+                cursor.execute(f"""
+                    SELECT DISTINCT M_ID FROM {table}
+                    WHERE M_ID > %s AND Date < %s AND {spec['filter']}
+                    ORDER BY M_ID
+                    LIMIT %s
+                """, (last_member, cutoff, chunk_size))
+                member_ids = [row[0] for row in cursor.fetchall()]
+                if not member_ids:
+                    break
+                for member_id in member_ids:
+                    archived[table] += archive_member(conn, archive, table, member_id, cutoff, chunk_size)
+                last_member = member_ids[-1]
+    finally:
+        cursor.close()
+    return archived
+
+def main():
+    import db
+
+    parser = argparse.ArgumentParser(description='Move old WorkoutLog and HealthMetrics rows to the cold archive')
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--chunk-size', type=int, default=1000, help='members per scan and rows per DELETE')
+    args = parser.parse_args()
+
+    cutoff = archive_cutoff(args.older_than_days)
+    print(f"Archiving rows dated before {cutoff.isoformat()} into {cold_archive.root}")
+    for shard in db.SHARDS:
+        conn = db.get_connection(shard)
+        if not conn:
+            continue
+        try:
+            started = time.perf_counter()
+            archived = archive_shard(conn, cold_archive, cutoff, args.chunk_size)
+            label = f" on shard {shard}" if len(db.SHARDS) > 1 else ''
+            summary = ', '.join(f"{count:,} {table}" for table, count in archived.items())
+            print(f"Archived {summary} row(s){label} in {time.perf_counter() - started:.1f}s.")
+        except Error as e:
+            print(f"Error archiving{' shard ' + shard if len(db.SHARDS) > 1 else ''}: {e}")
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    main()
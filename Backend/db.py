@@ -0,0 +1,162 @@
+import weakref
+
+import mysql.connector
+from mysql.connector import Error, HAVE_CEXT
+from mysql.connector.pooling import MySQLConnectionPool, PooledMySQLConnection, CNX_POOL_MAXSIZE
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+def _parse_shards(spec):
+    """DB_SHARDS="main=localhost:3306,east=10.0.0.2:3306/GymFitDB" -> {name: config}.
+
+    Each entry is name=host[:port][/database]; user and password are shared.
+    The first shard is the default: it holds the shard directory and Admin,
+    and serves every gym the directory does not place elsewhere.
+    """
+    shards = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, address = entry.partition('=')
+        address, _, database = address.partition('/')
+        host, _, port = address.partition(':')
+        config = dict(DB_CONFIG, host=host or DB_CONFIG['host'], database=database or DB_CONFIG['database'])
+        if port:
+            config['port'] = int(port)
+        shards[name.strip()] = config
+    return shards
+
+# Unset means a single database: every gym lives on the 'main' shard
+SHARDS = _parse_shards(os.getenv('DB_SHARDS', '')) or {'main': DB_CONFIG}
+DEFAULT_SHARD = next(iter(SHARDS))
+
+POOL_SIZE = min(int(os.getenv('DB_POOL_SIZE', '16')), CNX_POOL_MAXSIZE)
+
+# Use the C extension whenever it is installed and loads; DB_USE_PURE=true opts out
+USE_PURE = os.getenv('DB_USE_PURE', 'false').lower() in ('1', 'true', 'yes') or not HAVE_CEXT
+
+# Prepared cursors per physical connection: {sql: cursor}. Keyed weakly so
+# entries go away with the connection.
+_prepared_cache = weakref.WeakKeyDictionary()
+_pools = {}
+
+class _PooledConnection(PooledMySQLConnection):
+    """Pooled connection that ends any open transaction when returned.
+
+    The pool is created without session reset (which would deallocate the
+    cached prepared statements), so a read-only request that never
+    committed must not leave its snapshot open for the next borrower.
+    """
+
+    @property
+    def raw_connection(self):
+        return self._cnx
+
+    def close(self):
+        try:
+            if self._cnx is not None and self._cnx.in_transaction:
+                self._cnx.rollback()
+        except Error:
+            pass
+        finally:
+            super().close()
+
+class _Pool(MySQLConnectionPool):
+    def get_connection(self):
+        pooled = super().get_connection()
+        connection = pooled._cnx
+        pooled._cnx = None  # hand over without returning it to the queue
+        return _PooledConnection(self, connection)
+
+def _get_pool(shard):
+    pool = _pools.get(shard)
+    if pool is None:
+        pool = _pools[shard] = _Pool(
+            pool_name='gymfit' if shard == DEFAULT_SHARD else f'gymfit_{shard}',
+            pool_size=POOL_SIZE,
+            pool_reset_session=False,
+            use_pure=USE_PURE,
+            **SHARDS[shard]
+        )
+        label = f" for shard {shard}" if len(SHARDS) > 1 else ''
+        print(f"MySQL pool ready{label}: {POOL_SIZE} connections, {'pure Python' if USE_PURE else 'C extension'} driver")
+    return pool
+
+def get_connection(shard=None):
+    """Borrow a pooled connection to a shard (the default shard if None);
+    close() returns it. Falls back to a direct connection when the pool is
+    exhausted. Returns None if MySQL is unreachable."""
+    shard = shard or DEFAULT_SHARD
+    try:
+        return _get_pool(shard).get_connection()
+    except mysql.connector.errors.PoolError:
+        pass
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+    try:
+        return mysql.connector.connect(use_pure=USE_PURE, **SHARDS[shard])
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+
+class SharedConnection:
+    """A connection lent to several consecutive units of work (see /api/batch).
+
+    close() is a no-op so code written for per-request connections can run
+    unchanged; the lender closes the underlying connection when done.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def raw_connection(self):
+        return getattr(self._conn, 'raw_connection', self._conn)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def prepared_cursor(conn, sql, dictionary=False):
+    """Return the cached server-side prepared cursor for `sql` on this connection.
+
+    The driver re-prepares only when a cursor is given a different statement
+    object, so `sql` should be a module-level constant. Statements are
+    re-prepared automatically after a reconnect.
+    """
+    raw = conn.raw_connection if isinstance(conn, (_PooledConnection, SharedConnection)) else conn
+    cache = _prepared_cache.get(raw)
+    if cache is None or cache[0] != raw.connection_id:
+        cache = (raw.connection_id, {})
+        _prepared_cache[raw] = cache
+    key = (sql, dictionary)
+    cursor = cache[1].get(key)
+    if cursor is None:
+        cursor = raw.cursor(prepared=True, dictionary=dictionary)
+        cache[1][key] = cursor
+    return cursor
+
+def query_all(conn, sql, params=(), dictionary=True):
+    cursor = prepared_cursor(conn, sql, dictionary)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+def query_one(conn, sql, params=(), dictionary=True):
+    rows = query_all(conn, sql, params, dictionary)
+    return rows[0] if rows else None
+
+def execute(conn, sql, params=()):
+    """Run a prepared DML statement and return its cursor (rowcount, lastrowid)."""
+    cursor = prepared_cursor(conn, sql)
+    cursor.execute(sql, params)
+    return cursor
@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+def get_db_connection():
+    """Create and return a new database connection."""
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        return conn
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+
+def get_gym_breakdown(cursor):
+    """Return the materialized counters for every gym (one row per gym)."""
+    cursor.execute("""
+        SELECT g.Gym_ID, g.Location, g.Capacity,
+               gs.TotalMembers, gs.ActiveMembers, gs.TotalTrainers,
+               gs.UpcomingSessions, gs.TotalRevenue, gs.ActiveRevenue,
+               gs.LastReconciled
+        FROM GymStats gs
+        JOIN Gym g ON gs.Gym_ID = g.Gym_ID
+        ORDER BY g.Gym_ID
+    """)
+    return cursor.fetchall()
+
+def get_system_totals(cursor):
+    """Return system-wide totals summed over the per-gym counters."""
+    cursor.execute("""
+        SELECT CAST(COALESCE(SUM(TotalMembers), 0) AS SIGNED) as totalMembers,
+               CAST(COALESCE(SUM(TotalTrainers), 0) AS SIGNED) as totalTrainers,
+               CAST(COALESCE(SUM(UpcomingSessions), 0) AS SIGNED) as activeSessions,
+               COALESCE(SUM(TotalRevenue), 0) as totalRevenue
+        FROM GymStats
+    """)
+    return cursor.fetchone()
+
+def sum_gym_breakdown(gyms):
+    """The get_system_totals figures summed over breakdown rows (e.g. merged from several shards)."""
+    return {
+        'totalMembers': sum(int(gym['TotalMembers']) for gym in gyms),
+        'totalTrainers': sum(int(gym['TotalTrainers']) for gym in gyms),
+        'activeSessions': sum(int(gym['UpcomingSessions']) for gym in gyms),
+        'totalRevenue': sum((gym['TotalRevenue'] for gym in gyms), Decimal('0'))
+    }
+
+def reconcile_gym_stats(conn=None):
+    """Recompute GymStats from the base tables and return the gyms that had drifted.
+
+    Uses the caller's connection when one is given and leaves it open.
+    """
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_db_connection()
+    if not conn:
+        print("Failed to connect to database")
+        return None
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.callproc('ReconcileGymStats')
+        drifted = []
+        for result in cursor.stored_results():
+            drifted.extend(dict(zip(result.column_names, row)) for row in result.fetchall())
+        conn.commit()
+
+        if drifted:
+            print(f"GymStats reconciliation fixed drift in {len(drifted)} gym(s).")
+        else:
+            print("GymStats reconciliation completed. Counters are consistent.")
+        return drifted
+
+    except Error as e:
+        print(f"Error reconciling gym statistics: {e}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        if owns_connection:
+            conn.close()
+
+if __name__ == "__main__":
+    # Run from cron as a fallback when the MySQL event scheduler is disabled;
+    # covers every configured shard
+    import db
+    for shard in db.SHARDS:
+        conn = db.get_connection(shard)
+        if conn:
+            try:
+                reconcile_gym_stats(conn)
+            finally:
+                conn.close()
@@ -0,0 +1,408 @@
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+from shard_router import shard_router
+
+load_dotenv()
+
+METRICS = ('calories', 'duration', 'workouts')
+
+# Runtime state goes under GYMFIT_DATA_DIR (data/ at the project root, gitignored)
+DATA_DIR = os.getenv('GYMFIT_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+
+SNAPSHOT_PATH = os.getenv('LEADERBOARD_SNAPSHOT', os.path.join(DATA_DIR, 'leaderboard_snapshot.json'))
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv('LEADERBOARD_SNAPSHOT_SECONDS', '30'))
+
+WEEK_TOTALS_QUERY = """
+    SELECT wl.M_ID, m.Gym_ID, m.Name,
+           COALESCE(SUM(wl.CaloriesBurnt), 0),
+           COALESCE(SUM(wl.Duration), 0),
+           COUNT(*)
+    FROM WorkoutLog wl
+    JOIN Member m ON wl.M_ID = m.M_ID
+    WHERE wl.Date BETWEEN %s AND %s
+      AND (wl.Exercise IS NULL OR wl.Exercise <> 'Session Booking')
+    GROUP BY wl.M_ID, m.Gym_ID, m.Name
+"""
+
+MEMBER_WEEK_TOTALS_QUERY = """
+    SELECT wl.M_ID, m.Gym_ID, m.Name,
+           COALESCE(SUM(wl.CaloriesBurnt), 0),
+           COALESCE(SUM(wl.Duration), 0),
+           COUNT(*)
+    FROM WorkoutLog wl
+    JOIN Member m ON wl.M_ID = m.M_ID
+    WHERE wl.Date BETWEEN %s AND %s
+      AND (wl.Exercise IS NULL OR wl.Exercise <> 'Session Booking')
+      AND wl.M_ID IN ({})
+    GROUP BY wl.M_ID, m.Gym_ID, m.Name
+"""
+
+def week_start_for(day):
+    """Monday of the week containing the given date."""
+    return day - timedelta(days=day.weekday())
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        self.width = [0] * level  # positions advanced by each link
+
+class _RankIndex:
+    """Sorted keys in an indexable skip list.
+
+    Each link records how many keys it skips, so inserting, removing and
+    finding a key's position all take O(log n) expected time, and the
+    first n keys are a walk along the bottom level.
+    """
+
+    MAX_LEVEL = 32
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _find(self, key):
+        """Last node before key on each level, and how many keys precede each."""
+        update = [self._head] * self.MAX_LEVEL
+        before = [0] * self.MAX_LEVEL
+        node = self._head
+        position = 0
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            before[i] = position
+        return update, before
+
+    def insert(self, key):
+        update, before = self._find(key)
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        self._level = max(self._level, level)
+
+        node = _Node(key, level)
+        position = before[0] + 1
+        for i in range(self._level):
+            prev = update[i]
+            if i < level:
+                node.next[i] = prev.next[i]
+                if node.next[i] is not None:
+                    node.width[i] = prev.width[i] - (position - before[i]) + 1
+                prev.next[i] = node
+                prev.width[i] = position - before[i]
+            elif prev.next[i] is not None:
+                prev.width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        update, _ = self._find(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            return
+        for i in range(self._level):
+            prev = update[i]
+            if prev.next[i] is node:
+                prev.width[i] += node.width[i] - 1
+                prev.next[i] = node.next[i]
+            elif prev.next[i] is not None:
+                prev.width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def bisect_left(self, key):
+        """Number of keys lower than key."""
+        _, before = self._find(key)
+        return before[0]
+
+    def head(self, n):
+        keys = []
+        node = self._head.next[0]
+        while node is not None and len(keys) < n:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class Leaderboard:
+    """Scores for one gym and metric, ordered by (-score, member_id) in a _RankIndex.
+
+    Score updates, removals and "my rank" are O(log n) expected, and top-N
+    walks the head of the index.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.entries = _RankIndex()
+
+    def update(self, member_id, score):
+        old = self.scores.get(member_id)
+        if old is not None:
+            self.entries.remove((-old, member_id))
+        self.scores[member_id] = score
+        self.entries.insert((-score, member_id))
+
+    def remove(self, member_id):
+        old = self.scores.pop(member_id, None)
+        if old is not None:
+            self.entries.remove((-old, member_id))
+
+    def rank(self, member_id):
+        """1-based competition rank (ties share a rank), or None if unranked."""
+        score = self.scores.get(member_id)
+        if score is None:
+            return None
+        return self.entries.bisect_left((-score,)) + 1
+
+    def top(self, n):
+        result = []
+        rank = 0
+        previous = None
+        for position, (neg_score, member_id) in enumerate(self.entries.head(n), 1):
+            if neg_score != previous:
+                rank = position
+                previous = neg_score
+            result.append((rank, member_id, -neg_score))
+        return result
+
+class LeaderboardStore:
+    """Per-gym weekly leaderboards for calories, duration and workout count.
+
+    Members' totals are re-read when the outbox reports new workouts, in
+    every process, and the boards are snapshotted to a local JSON file so
+    restarts within the same week skip the rebuild query. The rebuild on
+    rollover and startup re-syncs everything with the database.
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_PATH):
+        self._lock = threading.Lock()
+        self._rollover_lock = threading.Lock()
+        self.snapshot_path = snapshot_path
+        self.week_start = None
+        self.boards = {}  # (gym_id, metric) -> Leaderboard
+        self.members = {}  # member_id -> {'gym_id': ..., 'name': ...}
+        self.previous = None  # final standings of the last finished week
+        self._last_snapshot = 0.0
+
+    # --- Loading & persistence ---
+
+    def _reset(self, week_start):
+        self.week_start = week_start
+        self.boards = {}
+
+    def _board(self, gym_id, metric):
+        board = self.boards.get((gym_id, metric))
+        if board is None:
+            board = self.boards[(gym_id, metric)] = Leaderboard()
+        return board
+
+    def _set_totals(self, member_id, gym_id, calories, duration, workouts):
+        self._board(gym_id, 'calories').update(member_id, calories)
+        self._board(gym_id, 'duration').update(member_id, duration)
+        self._board(gym_id, 'workouts').update(member_id, workouts)
+
+    def rebuild(self, week_start):
+        """Recompute the given week from WorkoutLog with one grouped query per shard."""
+        def read(conn):
+            cursor = conn.cursor()
+            try:
+                cursor.execute(WEEK_TOTALS_QUERY, (week_start, week_start + timedelta(days=6)))
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+        try:
+            # Column 1 is Gym_ID
+            rows = shard_router.owned(shard_router.fan_out(read), key=1)
+        except Error as e:
+            print(f"Error rebuilding leaderboards: {e}")
+            return False
+
+        with self._lock:
+            self._reset(week_start)
+            for member_id, gym_id, name, calories, duration, workouts in rows:
+                self.members[member_id] = {'gym_id': gym_id, 'name': name}
+                self._set_totals(member_id, gym_id, float(calories), float(duration), int(workouts))
+        self.save_snapshot(force=True)
+        return True
+
+    def load_snapshot(self):
+        """Restore the current week from the snapshot file. Returns False if unusable."""
+        try:
+            with open(self.snapshot_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('week_start') != week_start_for(date.today()).isoformat():
+            return False
+
+        with self._lock:
+            self._reset(date.fromisoformat(data['week_start']))
+            self.previous = data.get('previous')
+            for member_id, info in data['members'].items():
+                member_id = int(member_id)
+                self.members[member_id] = {'gym_id': info['gym_id'], 'name': info['name']}
+                if 'totals' in info:
+                    self._set_totals(member_id, info['gym_id'], *info['totals'])
+        return True
+
+    def save_snapshot(self, force=False):
+        """Write the boards to disk, at most once per SNAPSHOT_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if not force and now - self._last_snapshot < SNAPSHOT_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            members = {}
+            for member_id, info in self.members.items():
+                entry = dict(info)
+                board = self.boards.get((info['gym_id'], 'calories'))
+                if board and member_id in board.scores:
+                    entry['totals'] = [
+                        self.boards[(info['gym_id'], metric)].scores[member_id] for metric in METRICS
+                    ]
+                members[str(member_id)] = entry
+            data = {
+                'week_start': self.week_start.isoformat() if self.week_start else None,
+                'members': members,
+                'previous': self.previous
+            }
+            self._last_snapshot = now
+
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Error writing leaderboard snapshot: {e}")
+
+    def _ensure_current_week(self):
+        """Load on first use and roll over when a new week starts."""
+        current = week_start_for(date.today())
+        if self.week_start == current:
+            return
+        with self._rollover_lock:
+            if self.week_start == current:
+                return
+            if self.week_start is None and self.load_snapshot():
+                return
+            self._roll_over(current)
+
+    def _roll_over(self, current):
+        if self.week_start is not None:
+            # Keep last week's final top 10 per gym and metric
+            with self._lock:
+                self.previous = {
+                    'week_start': self.week_start.isoformat(),
+                    'standings': {
+                        f"{gym_id}:{metric}": self._format_top(board, 10)
+                        for (gym_id, metric), board in self.boards.items()
+                    }
+                }
+        self.rebuild(current)
+
+    # --- Updates ---
+
+    def refresh_members(self, conn, member_ids):
+        """Re-read the current week's totals of the given members (after they log workouts).
+
+        Sets totals rather than adding to them, so applying the same change
+        twice, or after a rebuild that already counted it, is harmless.
+        """
+        self._ensure_current_week()
+        member_ids = sorted(member_ids)
+        query = MEMBER_WEEK_TOTALS_QUERY.format(', '.join(['%s'] * len(member_ids)))
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, (self.week_start, self.week_start + timedelta(days=6), *member_ids))
+            rows = cursor.fetchall()
+        except Error as e:
+            print(f"Error refreshing leaderboards: {e}")
+            return
+        finally:
+            cursor.close()
+
+        with self._lock:
+            for member_id, gym_id, name, calories, duration, workouts in rows:
+                previous = self.members.get(member_id)
+                if previous and previous['gym_id'] != gym_id:
+                    for metric in METRICS:
+                        board = self.boards.get((previous['gym_id'], metric))
+                        if board:
+                            board.remove(member_id)
+                self.members[member_id] = {'gym_id': gym_id, 'name': name}
+                self._set_totals(member_id, gym_id, float(calories), float(duration), int(workouts))
+        self.save_snapshot()
+
+    def remove_member(self, member_id):
+        with self._lock:
+            info = self.members.pop(member_id, None)
+            if info:
+                for metric in METRICS:
+                    board = self.boards.get((info['gym_id'], metric))
+                    if board:
+                        board.remove(member_id)
+
+    # --- Queries ---
+
+    def _format_top(self, board, n):
+        return [
+            {'rank': rank, 'M_ID': member_id, 'Name': self.members.get(member_id, {}).get('name'), 'score': score}
+            for rank, member_id, score in board.top(n)
+        ]
+
+    def get_gym_id(self, cursor, member_id):
+        """Gym of a member, from the cached mapping or the database."""
+        info = self.members.get(member_id)
+        if info:
+            return info['gym_id']
+        cursor.execute("SELECT Gym_ID FROM Member WHERE M_ID = %s", (member_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return row['Gym_ID'] if isinstance(row, dict) else row[0]
+
+    def top(self, gym_id, metric, n=10):
+        self._ensure_current_week()
+        with self._lock:
+            board = self.boards.get((gym_id, metric))
+            return self._format_top(board, n) if board else []
+
+    def rank(self, gym_id, metric, member_id):
+        self._ensure_current_week()
+        with self._lock:
+            board = self.boards.get((gym_id, metric))
+            if not board:
+                return {'rank': None, 'score': 0, 'total': 0}
+            return {
+                'rank': board.rank(member_id),
+                'score': board.scores.get(member_id, 0),
+                'total': len(board.entries)
+            }
+
+    def previous_week(self, gym_id, metric):
+        self._ensure_current_week()
+        if not self.previous:
+            return None
+        return {
+            'weekStart': self.previous['week_start'],
+            'top': self.previous['standings'].get(f"{gym_id}:{metric}", [])
+        }
+
+leaderboards = LeaderboardStore()
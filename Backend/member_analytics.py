@@ -0,0 +1,217 @@
+import calendar
+import threading
+import time
+from datetime import date, timedelta
+
+from reference_data import reference_data
+
+# Windows the per-member SQL functions are usually called with
+WEEK_DAYS = 7
+MONTH_DAYS = 30
+
+# Grouped forms of the scalar functions in functions_code.sql. {scope}
+# restricts the members (m) covered by the pass; every member in scope gets
+# a row from the first query even without workouts. Workout counts leave out
+# bookings, which carry the (possibly future) session date.
+WORKOUT_ANALYTICS_SQL = """
+    SELECT m.M_ID, m.Name, m.Gym_ID, m.JoinDate, m.MembershipType_ID,
+           COUNT(CASE WHEN wl.Exercise != 'Session Booking' AND wl.Date <= %s THEN 1 END) AS MonthlyWorkouts,
+           COUNT(CASE WHEN wl.Exercise != 'Session Booking' AND wl.Date <= %s AND wl.Date >= %s THEN 1 END) AS WeeklyWorkouts,
+           COALESCE(SUM(wl.CaloriesBurnt), 0) AS TotalMonthlyCalories,
+           AVG(wl.CaloriesBurnt) AS AvgMonthlyCalories,
+           COUNT(DISTINCT wl.Date) AS ActiveDays,
+           AVG(CASE WHEN wl.Exercise != 'Session Booking' THEN wl.Duration END) AS AvgDuration
+    FROM Member m
+    LEFT JOIN WorkoutLog wl ON wl.M_ID = m.M_ID AND wl.Date >= %s
+    WHERE {scope}
+    GROUP BY m.M_ID
+"""
+
+HEALTH_ANALYTICS_SQL = """
+    SELECT M_ID,
+           MAX(CASE WHEN Newest = 1 THEN Weight END) AS CurrentWeight,
+           MAX(CASE WHEN Newest = 1 THEN Height END) AS CurrentHeight,
+           MAX(CASE WHEN Oldest = 1 THEN Weight END) AS StartingWeight,
+           MAX(CASE WHEN Date <= %s AND NewestBefore = 1 THEN Weight END) AS PastWeight,
+           AVG(CASE WHEN Date >= %s THEN Steps END) AS AvgSteps,
+           AVG(CASE WHEN Date >= %s THEN SleepHours END) AS AvgSleep
+    FROM (
+        SELECT h.M_ID, h.Date, h.Weight, h.Height, h.Steps, h.SleepHours,
+               ROW_NUMBER() OVER (PARTITION BY h.M_ID ORDER BY h.Date DESC, h.Metric_ID DESC) AS Newest,
+               ROW_NUMBER() OVER (PARTITION BY h.M_ID ORDER BY h.Date, h.Metric_ID) AS Oldest,
+               ROW_NUMBER() OVER (PARTITION BY h.M_ID, h.Date <= %s ORDER BY h.Date DESC, h.Metric_ID DESC) AS NewestBefore
+        FROM HealthMetrics h
+        JOIN Member m ON m.M_ID = h.M_ID
+        WHERE {scope}
+    ) ranked
+    GROUP BY M_ID
+"""
+
+def _add_months(day, months):
+    """DATE_ADD(day, INTERVAL months MONTH): clamps to the last day of the month."""
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+def _number(value, digits=2):
+    return round(float(value), digits) if value is not None else None
+
+def _build(workout, health, today):
+    """One member's metrics, matching the scalar functions' results."""
+    health = health or {}
+    weight, height = health.get('CurrentWeight'), health.get('CurrentHeight')
+    past_weight = health.get('PastWeight')
+    membership = reference_data.membership_type(workout['MembershipType_ID'])
+    expiry = _add_months(workout['JoinDate'], membership['Duration']) if membership and workout['JoinDate'] else None
+    return {
+        'memberId': workout['M_ID'],
+        'name': workout['Name'],
+        'gymId': workout['Gym_ID'],
+        'asOf': today.isoformat(),
+        # CalculateMemberBMI
+        'bmi': _number(weight / (height / 100) ** 2) if weight is not None and height else 0.0,
+        # GetTotalCaloriesBurned(M_ID, 30)
+        'caloriesLast30Days': _number(workout['TotalMonthlyCalories']),
+        'avgMonthlyCalories': _number(workout['AvgMonthlyCalories']),
+        # CalculateWorkoutConsistency(M_ID, 30)
+        'consistencyPercent': _number(workout['ActiveDays'] * 100 / MONTH_DAYS),
+        # GetAvgWorkoutDuration(M_ID, 30)
+        'avgWorkoutDuration': _number(workout['AvgDuration'] or 0),
+        'workoutsLast30Days': workout['MonthlyWorkouts'],
+        'weeklyWorkouts': workout['WeeklyWorkouts'],
+        # CalculateWeightChange(M_ID, 30)
+        'weightChange30Days': _number(weight - past_weight) if weight is not None and past_weight is not None else 0.0,
+        'currentWeight': _number(weight),
+        'startingWeight': _number(health.get('StartingWeight')),
+        # GetAvgDailySteps(M_ID, 7)
+        'avgDailySteps': int(round(health['AvgSteps'])) if health.get('AvgSteps') is not None else 0,
+        'avgWeeklySleep': _number(health.get('AvgSleep')),
+        # CheckMembershipExpiry
+        'daysUntilExpiry': (expiry - today).days if expiry else None
+    }
+
+class MemberAnalytics:
+    """Per-member progress metrics computed for many members in one grouped pass.
+
+    Replaces calling CalculateMemberBMI, GetTotalCaloriesBurned,
+    CalculateWorkoutConsistency, GetAvgWorkoutDuration, CalculateWeightChange,
+    GetAvgDailySteps and CheckMembershipExpiry once per member row: a batch
+    runs one GROUP BY over WorkoutLog and one over HealthMetrics, whether it
+    covers one member or a whole gym.
+
+    Results are cached per member for the current day; the cache is dropped
+    when the date changes. Logged workouts and bookings invalidate the
+    member's entry so their own numbers are never stale within the day.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._members = {}
+        self._gym_members = {}
+        self.hits = 0
+        self.misses = 0
+        self.passes = 0
+        self.members_computed = 0
+        self.last_pass_ms = 0.0
+
+    def _roll_day(self, today):
+        # Called with the lock held
+        if self._day != today:
+            self._day = today
+            self._members = {}
+            self._gym_members = {}
+
+    def _compute(self, conn, scope, scope_params, today):
+        """Run the grouped pass for the members in scope; returns {M_ID: metrics}."""
+        week_start = today - timedelta(days=WEEK_DAYS)
+        month_start = today - timedelta(days=MONTH_DAYS)
+        started = time.perf_counter()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(WORKOUT_ANALYTICS_SQL.format(scope=scope), (today, today, week_start, month_start) + scope_params)
+            workouts = cursor.fetchall()
+            cursor.execute(HEALTH_ANALYTICS_SQL.format(scope=scope),
+                           (month_start, week_start, week_start, month_start) + scope_params)
+            health = {row['M_ID']: row for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+        results = {row['M_ID']: _build(row, health.get(row['M_ID']), today) for row in workouts}
+        with self._lock:
+            self.passes += 1
+            self.members_computed += len(results)
+            self.last_pass_ms = (time.perf_counter() - started) * 1000
+        return results
+
+    def get_members(self, conn, member_ids):
+        """Return {member_id: metrics or None}; cache misses are computed in one pass."""
+        today = date.today()
+        with self._lock:
+            self._roll_day(today)
+            found = {member_id: self._members[member_id] for member_id in member_ids if member_id in self._members}
+            self.hits += len(found)
+        missing = sorted(set(member_ids) - set(found))
+        if missing:
+            scope = 'm.M_ID IN ({})'.format(', '.join(['%s'] * len(missing)))
+            computed = self._compute(conn, scope, tuple(missing), today)
+            with self._lock:
+                self.misses += len(missing)
+                if self._day == today:
+                    self._members.update(computed)
+            found.update(computed)
+        return {member_id: found.get(member_id) for member_id in member_ids}
+
+    def get_member(self, conn, member_id):
+        return self.get_members(conn, [member_id])[member_id]
+
+    def get_gym(self, conn, gym_id):
+        """Metrics for every member of a gym, ordered by M_ID.
+
+        A cold gym is computed in a single pass scoped by Gym_ID; after that
+        only members whose entries were invalidated are recomputed.
+        """
+        today = date.today()
+        with self._lock:
+            self._roll_day(today)
+            member_ids = self._gym_members.get(gym_id)
+            cold = member_ids is None or not any(member_id in self._members for member_id in member_ids)
+
+        if cold:
+            computed = self._compute(conn, 'm.Gym_ID = %s', (gym_id,), today)
+            with self._lock:
+                self.misses += len(computed)
+                if self._day == today:
+                    self._members.update(computed)
+                    self._gym_members[gym_id] = sorted(computed)
+            return [computed[member_id] for member_id in sorted(computed)]
+
+        results = self.get_members(conn, member_ids)
+        return [results[member_id] for member_id in member_ids if results[member_id] is not None]
+
+    def invalidate(self, member_id):
+        """Drop a member's cached metrics after their workouts change."""
+        with self._lock:
+            self._members.pop(member_id, None)
+
+    def invalidate_gyms(self):
+        """Forget gym member lists after members are added or removed."""
+        with self._lock:
+            self._gym_members = {}
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'day': self._day.isoformat() if self._day else None,
+                'cachedMembers': len(self._members),
+                'cachedGyms': len(self._gym_members),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else None,
+                'passes': self.passes,
+                'membersComputed': self.members_computed,
+                'lastPassMs': round(self.last_pass_ms, 2)
+            }
+
+member_analytics = MemberAnalytics()
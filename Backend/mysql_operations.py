@@ -1,83 +1,524 @@
-import mysql.connector
-from mysql.connector import Error
-from datetime import datetime
-
-# MySQL configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '729654',
-    'database': 'GymFitDB'
-}
-
-# Connect to MySQL
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            print("✅ Successfully connected to the database")
-            return conn
-    except Error as e:
-        print("❌ Error connecting to database:", e)
-    return None
-
-# Save a new member (no Role field)
-def save_member(name, age, email, password, phone, membership_type_id, gym_id):
-    conn = get_db_connection()
-    if not conn:
-        return
-    try:
-        cursor = conn.cursor()
-        join_date = datetime.now().strftime('%Y-%m-%d')
-
-        cursor.execute("""
-            INSERT INTO Member (Name, Age, Email, Password, JoinDate, Phone, MembershipType_ID, Gym_ID)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (name, age, email, password, join_date, phone, membership_type_id, gym_id))
-
-        conn.commit()
-        print("✅ Member saved successfully.")
-    except Error as e:
-        print("❌ Error saving member:", e)
-    finally:
-        cursor.close()
-        conn.close()
-
-# Fetch member by email
-def fetch_member_by_email(email):
-    conn = get_db_connection()
-    if not conn:
-        return
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM Member WHERE Email = %s", (email,))
-        user = cursor.fetchone()
-        if user:
-            print("👤 Member found:")
-            for key, value in user.items():
-                print(f"  {key}: {value}")
-        else:
-            print("ℹ️ No member found with this email.")
-    except Error as e:
-        print("❌ Error fetching member:", e)
-    finally:
-        cursor.close()
-        conn.close()
-
-# Example usage
-if __name__ == '__main__':
-    test_email = 'new.member@example.com'
-
-    # Uncomment to insert a new member
-    save_member(
-        name='New Member',
-        age=26,
-        email=test_email,
-        password='securepass123',
-        phone='9876543219',
-        membership_type_id=1,
-        gym_id=1
-    )
-
-    # Fetch member
-    fetch_member_by_email(test_email)
+"""
+Bulk import/export tool for GymFit data.
+
+Examples:
+    python mysql_operations.py import members members.csv --workers 8
+    python mysql_operations.py import workouts workouts.ndjson --chunk-size 5000
+    python mysql_operations.py import members members.csv --method load-data
+    python mysql_operations.py export members members.ndjson --chunk-size 10000
+
+Files use the table's column names as CSV headers / NDJSON keys (see
+ENTITIES). Plain-text passwords are hashed across a process pool; pass
+--prehashed for files exported with --include-password-hashes.
+
+With several shards (DB_SHARDS), each imported row goes to the shard of its
+gym: Gym_ID for members and trainers, the trainer's or member's gym for
+sessions, workouts and health metrics. Exports read every shard.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import Error
+from werkzeug.security import generate_password_hash
+import os
+from dotenv import load_dotenv
+
+import db
+from auth import PASSWORD_HASH_METHOD
+from cold_archive import cold_archive, TABLES as ARCHIVED_TABLES
+from shard_router import shard_router
+
+load_dotenv()
+
+# Importable/exportable tables: primary key, data columns, required columns.
+# Rows without a Gym_ID column belong to the shard of their parent's gym.
+ENTITIES = {
+    'members': {
+        'table': 'Member',
+        'key': 'M_ID',
+        'columns': ['Name', 'Email', 'Password', 'Age', 'JoinDate', 'Phone', 'MembershipEndDate',
+                    'IsActive', 'MembershipType_ID', 'Gym_ID'],
+        'required': ['Name', 'Email', 'Password', 'MembershipType_ID', 'Gym_ID'],
+        'defaults': {'JoinDate': lambda: date.today().isoformat()}
+    },
+    'trainers': {
+        'table': 'Trainer',
+        'key': 'T_ID',
+        'columns': ['Name', 'Email', 'Password', 'Specialization', 'Gym_ID'],
+        'required': ['Name', 'Email', 'Password']
+    },
+    'sessions': {
+        'table': 'Session',
+        'key': 'S_ID',
+        'columns': ['Details', 'SessionDate', 'SessionTime', 'Duration', 'T_ID', 'MaxParticipants', 'Status'],
+        'required': ['SessionDate', 'T_ID'],
+        'parent': ('Trainer', 'T_ID')
+    },
+    'workouts': {
+        'table': 'WorkoutLog',
+        'key': 'L_ID',
+        'columns': ['M_ID', 'S_ID', 'Exercise', 'Date', 'Duration', 'CaloriesBurnt', 'Distance', 'Progress'],
+        'required': ['M_ID', 'Date'],
+        'parent': ('Member', 'M_ID')
+    },
+    'health_metrics': {
+        'table': 'HealthMetrics',
+        'key': 'Metric_ID',
+        'columns': ['M_ID', 'Date', 'Weight', 'Height', 'SleepHours', 'WaterLiters', 'Steps'],
+        'required': ['M_ID', 'Date'],
+        'parent': ('Member', 'M_ID')
+    }
+}
+
+# Connect to a shard (the default one unless named)
+def get_db_connection(allow_local_infile=False, shard=None):
+    try:
+        conn = mysql.connector.connect(**db.SHARDS[shard or db.DEFAULT_SHARD], allow_local_infile=allow_local_infile)
+        if conn.is_connected():
+            return conn
+    except Error as e:
+        print("❌ Error connecting to database:", e)
+    return None
+
+# --- Progress reporting ---
+
+class Progress:
+    """Single-line progress report on stderr: rows done, rate and ETA."""
+
+    def __init__(self, label, total=None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+
+    def advance(self, rows):
+        self.done += rows
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        line = f"\r{self.label}: {self.done:,}"
+        if self.total:
+            line += f"/{self.total:,} ({self.done * 100 // self.total}%)"
+            if rate:
+                line += f", ETA {max(self.total - self.done, 0) / rate:.0f}s"
+        sys.stderr.write(f"{line}, {rate:,.0f} rows/s   ")
+        sys.stderr.flush()
+
+    def finish(self):
+        elapsed = time.monotonic() - self.started
+        sys.stderr.write('\n')
+        return elapsed
+
+# --- Reading input files ---
+
+def detect_format(path, file_format):
+    if file_format:
+        return file_format
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+def read_records(path, file_format):
+    """Yield one dict per record; empty CSV fields become None."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            for row in csv.DictReader(f):
+                yield {key: (value if value != '' else None) for key, value in row.items()}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def count_records(path, file_format):
+    """Approximate record count for the progress ETA (one record per line)."""
+    with open(path, 'rb') as f:
+        lines = sum(1 for line in f if line.strip())
+    return lines - 1 if file_format == 'csv' else lines
+
+def _hash_password(password):
+    # Module-level so it can be pickled into pool workers
+    return generate_password_hash(password, PASSWORD_HASH_METHOD)
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# --- Writing chunks ---
+
+def insert_chunk(cursor, table, columns, rows):
+    """Insert a chunk; executemany sends it as one multi-row INSERT."""
+    placeholders = ', '.join(['%s'] * len(columns))
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        rows
+    )
+
+def _load_data_field(value):
+    if value is None:
+        return 'NULL'
+    return '"' + str(value).replace('"', '""') + '"'
+
+def load_data_chunk(cursor, table, columns, rows):
+    """Stream a chunk through LOAD DATA LOCAL INFILE via a temporary CSV file.
+
+    With LOCAL, MySQL skips rows with duplicate keys (as warnings) instead
+    of failing the chunk.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as tmp:
+        for row in rows:
+            tmp.write(','.join(_load_data_field(value) for value in row) + '\n')
+        tmp_path = tmp.name
+    try:
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({', '.join(columns)})
+        """, (tmp_path,))
+    finally:
+        os.remove(tmp_path)
+
+# --- Shard routing ---
+
+def _id(value):
+    return int(value) if value is not None else None
+
+class ImportRouter:
+    """Splits import chunks by the shard that owns each row's gym.
+
+    Parent IDs (T_ID, M_ID) are looked up on every shard once, keeping the
+    copy on the shard that owns its gym, and remembered for later chunks.
+    """
+
+    def __init__(self, entity, columns, connect):
+        self._connect = connect  # shard -> open connection
+        self._parent = entity.get('parent')
+        column = self._parent[1] if self._parent else 'Gym_ID'
+        self._index = columns.index(column) if column in columns else None
+        self._parent_gyms = {}  # parent ID -> Gym_ID
+
+    def _resolve(self, parent_ids):
+        table, key = self._parent
+        parent_ids = sorted(parent_ids)
+        for shard in db.SHARDS:
+            cursor = self._connect(shard).cursor()
+            try:
+                cursor.execute(
+                    f"SELECT {key}, Gym_ID FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(parent_ids))})",
+                    parent_ids
+                )
+                for parent_id, gym_id in cursor.fetchall():
+                    if shard_router.shard_for_gym(gym_id) == shard:
+                        self._parent_gyms[parent_id] = gym_id
+            finally:
+                cursor.close()
+        unknown = [parent_id for parent_id in parent_ids if parent_id not in self._parent_gyms]
+        if unknown:
+            raise ValueError(f"unknown {key}: {', '.join(map(str, unknown[:10]))}")
+
+    def route(self, rows):
+        """{shard: rows} for one chunk."""
+        if not shard_router.enabled:
+            return {db.DEFAULT_SHARD: rows}
+        keys = [_id(row[self._index]) if self._index is not None else None for row in rows]
+        if self._parent:
+            missing = set(keys) - self._parent_gyms.keys()
+            if missing:
+                self._resolve(missing)
+            keys = [self._parent_gyms[key] for key in keys]
+
+        groups = {}
+        for row, gym_id in zip(rows, keys):
+            if shard_router.is_frozen(gym_id):
+                raise ValueError(f"gym {gym_id} is being moved between shards; retry once the move completes")
+            groups.setdefault(shard_router.shard_for_gym(gym_id), []).append(row)
+        return groups
+
+# --- Import ---
+
+def import_file(entity_name, path, file_format=None, chunk_size=1000, method='insert',
+                workers=None, prehashed=False, keep_ids=False):
+    """Import a CSV/NDJSON file into the entity's table, one transaction per chunk.
+
+    Password hashing for chunk N+1 runs in the process pool while chunk N is
+    being written. With several shards a chunk is one transaction per shard
+    it touches. Returns the number of rows imported.
+    """
+    entity = ENTITIES[entity_name]
+    file_format = detect_format(path, file_format)
+    records = read_records(path, file_format)
+
+    first = next(records, None)
+    if first is None:
+        print("ℹ️ Nothing to import.")
+        return 0
+
+    allowed = ([entity['key']] if keep_ids else []) + entity['columns']
+    defaults = entity.get('defaults', {})
+    columns = [column for column in allowed if column in first or column in defaults]
+    missing = [column for column in entity['required'] if column not in columns]
+    if missing:
+        print(f"❌ Missing required columns for {entity_name}: {', '.join(missing)}")
+        return 0
+
+    hash_passwords = 'Password' in columns and not prehashed
+    password_index = columns.index('Password') if hash_passwords else None
+
+    required_indexes = [columns.index(column) for column in entity['required']]
+
+    def to_row(record, number):
+        row = []
+        for column in columns:
+            value = record.get(column)
+            if value is None and column in defaults:
+                value = defaults[column]()
+            row.append(value)
+        if any(row[index] is None for index in required_indexes):
+            raise ValueError(f"record {number} is missing one of: {', '.join(entity['required'])}")
+        return row
+
+    if shard_router.enabled and not shard_router.load():
+        print("❌ Shard directory could not be read from the default shard.")
+        return 0
+    connections = {}
+
+    def connect(shard):
+        conn = connections.get(shard)
+        if conn is None:
+            conn = get_db_connection(allow_local_infile=(method == 'load-data'), shard=shard)
+            if not conn:
+                raise Error(msg=f"Shard {shard} is unreachable")
+            connections[shard] = conn
+        return conn
+
+    try:
+        connect(db.DEFAULT_SHARD)
+    except Error:
+        return 0
+    router = ImportRouter(entity, columns, connect)
+    write_chunk = load_data_chunk if method == 'load-data' else insert_chunk
+    progress = Progress(f"Importing {entity_name}", count_records(path, file_format))
+    pool = ProcessPoolExecutor(max_workers=workers) if hash_passwords else None
+    imported = 0
+
+    def prepare(chunk, first_number):
+        rows = [to_row(record, first_number + i) for i, record in enumerate(chunk)]
+        hashes = pool.map(_hash_password, [row[password_index] for row in rows], chunksize=32) if pool else None
+        return rows, hashes
+
+    try:
+        chunks = _chunks(itertools.chain([first], records), chunk_size)
+        pending = prepare(next(chunks), 1)
+        while pending:
+            rows, hashes = pending
+            upcoming = next(chunks, None)
+            pending = prepare(upcoming, imported + len(rows) + 1) if upcoming else None
+
+            if hashes is not None:
+                for row, hashed in zip(rows, hashes):
+                    row[password_index] = hashed
+            groups = router.route(rows)
+            for shard, shard_rows in groups.items():
+                cursor = connect(shard).cursor()
+                try:
+                    write_chunk(cursor, entity['table'], columns, shard_rows)
+                finally:
+                    cursor.close()
+            for shard in groups:
+                connections[shard].commit()
+            imported += len(rows)
+            progress.advance(len(rows))
+    except (Error, ValueError) as e:
+        for conn in connections.values():
+            try:
+                conn.rollback()
+            except Error:
+                pass
+        progress.finish()
+        print(f"❌ Import stopped after {imported:,} rows (next chunk rolled back): {e}")
+        return imported
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        for conn in connections.values():
+            conn.close()
+
+    elapsed = progress.finish()
+    print(f"✅ Imported {imported:,} {entity_name} in {elapsed:.1f}s.")
+    return imported
+
+# --- Export ---
+
+def _export_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _export_query(entity, columns):
+    """Keyset-paginated SELECT of columns; with several shards the row's owning Gym_ID is selected last."""
+    key = entity['key']
+    select = ', '.join(f"t.{column}" for column in columns)
+    join = ''
+    if shard_router.enabled:
+        parent = entity.get('parent')
+        if parent:
+            join = f" LEFT JOIN {parent[0]} p ON p.{parent[1]} = t.{parent[1]}"
+            select += ', p.Gym_ID'
+        else:
+            select += ', t.Gym_ID'
+    return f"""
+        SELECT {select} FROM {entity['table']} t{join}
+        WHERE t.{key} > %s
+        ORDER BY t.{key}
+        LIMIT %s
+    """
+
+def export_table(entity_name, path, file_format=None, chunk_size=5000, include_password_hashes=False,
+                 include_archive=True):
+    """Export a table in primary-key order, reading chunk_size rows per query (keyset pagination).
+
+    With several shards, each shard is exported in turn, keeping only the
+    rows of gyms it owns (a gym being moved has a copy on both). For
+    archived tables, rows in the cold archive follow the live rows (by
+    member and month) unless include_archive is False.
+    """
+    entity = ENTITIES[entity_name]
+    file_format = detect_format(path, file_format)
+    columns = [entity['key']] + [
+        column for column in entity['columns']
+        if column != 'Password' or include_password_hashes
+    ]
+
+    archived = include_archive and entity['table'] in ARCHIVED_TABLES
+    if shard_router.enabled and not shard_router.load():
+        print("❌ Shard directory could not be read from the default shard.")
+        return 0
+
+    connections = {}
+    for shard in db.SHARDS:
+        conn = get_db_connection(shard=shard)
+        if not conn:
+            for opened in connections.values():
+                opened.close()
+            return 0
+        connections[shard] = conn
+
+    query = _export_query(entity, columns)
+    exported = 0
+    try:
+        total = 0
+        member_ids = set()
+        for conn in connections.values():
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM {entity['table']}")
+                total += cursor.fetchone()[0]
+                if archived:
+                    # Segments of members deleted before their archive was removed are left out
+                    cursor.execute("SELECT M_ID FROM Member")
+                    member_ids.update(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        if archived:
+            total += cold_archive.count(entity['table'])
+        progress = Progress(f"Exporting {entity_name}", total)
+
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = None
+            if file_format == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(columns)
+
+            def write_rows(rows):
+                for row in rows:
+                    values = [_export_value(value) for value in row]
+                    if writer:
+                        writer.writerow(['' if value is None else value for value in values])
+                    else:
+                        f.write(json.dumps(dict(zip(columns, values))) + '\n')
+
+            for shard, conn in connections.items():
+                cursor = conn.cursor()
+                try:
+                    last_key = 0
+                    while True:
+                        cursor.execute(query, (last_key, chunk_size))
+                        rows = cursor.fetchall()
+                        if not rows:
+                            break
+                        last_key = rows[-1][0]
+                        if shard_router.enabled:
+                            rows = [row[:-1] for row in rows if shard_router.shard_for_gym(row[-1]) == shard]
+                        write_rows(rows)
+                        exported += len(rows)
+                        progress.advance(len(rows))
+                finally:
+                    cursor.close()
+
+            if archived:
+                rows = cold_archive.export_rows(entity['table'], columns, member_ids)
+                for chunk in _chunks(rows, chunk_size):
+                    write_rows(chunk)
+                    exported += len(chunk)
+                    progress.advance(len(chunk))
+    except Error as e:
+        print(f"\n❌ Export failed after {exported:,} rows: {e}")
+        return exported
+    finally:
+        for conn in connections.values():
+            conn.close()
+
+    elapsed = progress.finish()
+    print(f"✅ Exported {exported:,} {entity_name} to {path} in {elapsed:.1f}s.")
+    return exported
+
+def main():
+    parser = argparse.ArgumentParser(description='GymFit bulk import/export')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Import rows from a CSV or NDJSON file')
+    import_parser.add_argument('entity', choices=sorted(ENTITIES))
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['csv', 'ndjson'], help='default: from the file extension')
+    import_parser.add_argument('--chunk-size', type=int, default=1000, help='rows per transaction')
+    import_parser.add_argument('--method', choices=['insert', 'load-data'], default='insert',
+                               help='multi-row INSERT, or LOAD DATA LOCAL INFILE (needs local_infile=ON on the server)')
+    import_parser.add_argument('--workers', type=int, default=None, help='password hashing processes (default: CPU count)')
+    import_parser.add_argument('--prehashed', action='store_true', help='Password values are already hashed')
+    import_parser.add_argument('--keep-ids', action='store_true', help='import the primary key column as well')
+
+    export_parser = subparsers.add_parser('export', help='Export a table to a CSV or NDJSON file')
+    export_parser.add_argument('entity', choices=sorted(ENTITIES))
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=['csv', 'ndjson'], help='default: from the file extension')
+    export_parser.add_argument('--chunk-size', type=int, default=5000, help='rows per query')
+    export_parser.add_argument('--include-password-hashes', action='store_true')
+    export_parser.add_argument('--skip-archive', action='store_true',
+                               help='leave out workouts and health metrics moved to the cold archive')
+
+    args = parser.parse_args()
+    if args.command == 'import':
+        import_file(args.entity, args.path, args.format, args.chunk_size, args.method,
+                    args.workers, args.prehashed, args.keep_ids)
+    else:
+        export_table(args.entity, args.path, args.format, args.chunk_size, args.include_password_hashes,
+                     not args.skip_archive)
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
+import hashlib
+
 import mysql.connector
 from mysql.connector import Error
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
+from reference_data import reference_data
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -13,6 +17,44 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'GymFitDB')
 }
 
+BROADCAST_TYPES = ('announcement', 'renewal', 'progress', 'system')
+
+# Personal rows carry a TextHash into NotificationText (rows written by SQL
+# triggers and procedures still carry their own Message). Broadcasts match the
+# member's gym and tier and count as read up to BroadcastRead.ReadThroughID.
+MEMBER_NOTIFICATIONS_QUERY = """
+    (SELECT n.Notif_ID, NULL AS Broadcast_ID, n.M_ID, COALESCE(n.Message, t.Message) AS Message,
+            n.Type, n.IsRead, n.CreatedAt
+     FROM Notifications n
+     LEFT JOIN NotificationText t ON t.TextHash = n.TextHash
+     WHERE n.M_ID = %s
+     ORDER BY n.CreatedAt DESC
+     LIMIT %s)
+    UNION ALL
+    (SELECT NULL, b.Broadcast_ID, m.M_ID, b.Message,
+            b.Type, COALESCE(b.Broadcast_ID <= r.ReadThroughID, FALSE), b.CreatedAt
+     FROM Member m
+     JOIN Broadcast b
+       ON (b.Gym_ID IS NULL OR b.Gym_ID = m.Gym_ID)
+      AND (b.MembershipType_ID IS NULL OR b.MembershipType_ID = m.MembershipType_ID)
+      AND b.CreatedAt >= m.JoinDate
+     LEFT JOIN BroadcastRead r ON r.M_ID = m.M_ID
+     WHERE m.M_ID = %s
+     ORDER BY b.CreatedAt DESC
+     LIMIT %s)
+    ORDER BY CreatedAt DESC
+    LIMIT %s
+"""
+
+LATEST_BROADCAST_QUERY = """
+    SELECT MAX(b.Broadcast_ID)
+    FROM Member m
+    JOIN Broadcast b
+      ON (b.Gym_ID IS NULL OR b.Gym_ID = m.Gym_ID)
+     AND (b.MembershipType_ID IS NULL OR b.MembershipType_ID = m.MembershipType_ID)
+    WHERE m.M_ID = %s
+"""
+
 def get_db_connection():
     """Create and return a new database connection."""
     try:
@@ -22,9 +64,14 @@ def get_db_connection():
         print(f"Error connecting to MySQL: {e}")
         return None
 
-def check_membership_renewals():
-    """Check for upcoming membership renewals and create notifications."""
-    conn = get_db_connection()
+def check_membership_renewals(conn=None):
+    """Check for upcoming membership renewals and create notifications.
+
+    Uses the caller's connection when one is given and leaves it open.
+    """
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_db_connection()
     if not conn:
         print("Failed to connect to database")
         return
@@ -34,39 +81,41 @@ def check_membership_renewals():
     try:
         # Find members whose membership ends in the next 7 days
         cursor.execute("""
-            SELECT m.M_ID, m.Name, m.MembershipEndDate, mt.Name as MembershipType
+            SELECT m.M_ID, m.Name, m.MembershipEndDate, m.MembershipType_ID
             FROM Member m
-            JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
             WHERE m.IsActive = TRUE
             AND m.MembershipEndDate IS NOT NULL
             AND m.MembershipEndDate BETWEEN CURDATE() AND DATE_ADD(CURDATE(), INTERVAL 7 DAY)
         """)
         
-        expiring_members = cursor.fetchall()
+        expiring_members = reference_data.resolve(cursor.fetchall(), 'membership_types', 'MembershipType_ID', {'Name': 'MembershipType'})
         
-        notifications_created = 0
-        for member in expiring_members:
-            days_left = (member['MembershipEndDate'] - datetime.now().date()).days
-            
-            # Check if notification already exists for this member
-            cursor.execute("""
-                SELECT Notif_ID FROM Notifications
-                WHERE M_ID = %s 
+        # Members already reminded this week, in one query
+        notified = set()
+        if expiring_members:
+            member_ids = [member['M_ID'] for member in expiring_members]
+            cursor.execute(f"""
+                SELECT DISTINCT M_ID FROM Notifications
+                WHERE M_ID IN ({', '.join(['%s'] * len(member_ids))})
                 AND Type = 'renewal'
                 AND CreatedAt >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-            """, (member['M_ID'],))
-            
-            existing = cursor.fetchone()
-            
-            if not existing:
-                message = f"Your {member['MembershipType']} membership expires in {days_left} day(s) on {member['MembershipEndDate'].strftime('%B %d, %Y')}. Please renew to continue enjoying our services."
-                
-                cursor.execute("""
-                    INSERT INTO Notifications (M_ID, Message, Type, IsRead)
-                    VALUES (%s, %s, 'renewal', FALSE)
-                """, (member['M_ID'], message))
-                
-                notifications_created += 1
+            """, member_ids)
+            notified = {row['M_ID'] for row in cursor.fetchall()}
+        
+        # Members expiring the same day on the same tier share one stored text
+        notifications = []
+        for member in expiring_members:
+            if member['M_ID'] in notified:
+                continue
+            days_left = (member['MembershipEndDate'] - datetime.now().date()).days
+            message = f"Your {member['MembershipType']} membership expires in {days_left} day(s) on {member['MembershipEndDate'].strftime('%B %d, %Y')}. Please renew to continue enjoying our services."
+            notifications.append((member['M_ID'], message, 'renewal'))
+        
+        insert_cursor = conn.cursor()
+        try:
+            notifications_created = add_notifications(insert_cursor, notifications)
+        finally:
+            insert_cursor.close()
         
         conn.commit()
         print(f"Membership renewal check completed. {notifications_created} notification(s) created.")
@@ -76,59 +125,111 @@ def check_membership_renewals():
         conn.rollback()
     finally:
         cursor.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
-def create_session_reminder(member_id, session_id, session_details, session_date, session_time):
-    """Create a reminder notification for an upcoming session."""
-    conn = get_db_connection()
-    if not conn:
-        return False
-    
+def session_reminder_message(session_details, session_date, session_time):
+    return f"Reminder: You have a session '{session_details}' scheduled for {session_date} at {session_time}."
+
+def text_hash(message):
+    return hashlib.sha1(message.encode('utf-8')).digest()
+
+def add_notifications(cursor, notifications):
+    """Insert (member_id, message, type) notifications in the cursor's transaction.
+
+    Each distinct text is stored once in NotificationText; the per-member row
+    only references it. Members deleted in the meantime are skipped. Returns
+    how many were inserted.
+    """
+    if not notifications:
+        return 0
+    member_ids = sorted({member_id for member_id, _, _ in notifications})
+    cursor.execute(
+        f"SELECT M_ID FROM Member WHERE M_ID IN ({', '.join(['%s'] * len(member_ids))})",
+        member_ids
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    texts = {}
+    rows = []
+    for member_id, message, notif_type in notifications:
+        if member_id not in existing:
+            continue
+        key = text_hash(message)
+        texts[key] = message
+        rows.append((member_id, key, notif_type))
+    if rows:
+        # executemany sends each of these as one multi-row INSERT
+        cursor.executemany("""
+            INSERT INTO NotificationText (TextHash, Message)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE TextHash = TextHash
+        """, list(texts.items()))
+        cursor.executemany("""
+            INSERT INTO Notifications (M_ID, TextHash, Type, IsRead)
+            VALUES (%s, %s, %s, FALSE)
+        """, rows)
+    return len(rows)
+
+def member_notifications(cursor, member_id, limit=10):
+    """Latest personal and broadcast notifications of a member, newest first.
+
+    Each side of the UNION is limited before merging, so the cost does not
+    grow with the member's history or the number of broadcasts.
+    """
+    cursor.execute(MEMBER_NOTIFICATIONS_QUERY, (member_id, limit, member_id, limit, limit))
+    notifications = cursor.fetchall()
+    for notification in notifications:
+        notification['IsRead'] = bool(notification['IsRead'])
+    return notifications
+
+def mark_notifications_read(conn, member_id):
+    """Mark every personal and broadcast notification of a member read; the caller commits."""
     cursor = conn.cursor()
-    
     try:
-        message = f"Reminder: You have a session '{session_details}' scheduled for {session_date} at {session_time}."
-        
-        cursor.execute("""
-            INSERT INTO Notifications (M_ID, Message, Type, IsRead)
-            VALUES (%s, %s, 'session_reminder', FALSE)
-        """, (member_id, message))
-        
-        conn.commit()
-        return True
-        
-    except Error as e:
-        print(f"Error creating session reminder: {e}")
-        conn.rollback()
-        return False
+        cursor.execute("UPDATE Notifications SET IsRead = TRUE WHERE M_ID = %s AND IsRead = FALSE", (member_id,))
+        cursor.execute(LATEST_BROADCAST_QUERY, (member_id,))
+        latest = cursor.fetchone()[0]
+        if latest is not None:
+            # One marker row per member, however many broadcasts it covers
+            cursor.execute("""
+                INSERT INTO BroadcastRead (M_ID, ReadThroughID) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE ReadThroughID = GREATEST(ReadThroughID, VALUES(ReadThroughID))
+            """, (member_id, latest))
     finally:
         cursor.close()
-        conn.close()
 
-def create_progress_notification(member_id, message):
-    """Create a progress milestone notification."""
-    conn = get_db_connection()
-    if not conn:
-        return False
-    
+def broadcast(conn, message, notif_type='announcement', gym_id=None, membership_type_id=None):
+    """Store one notification for every member of a gym and/or tier; the caller commits.
+
+    A single row, whatever the audience size. Members who join later do not
+    see it. Returns the Broadcast_ID.
+    """
     cursor = conn.cursor()
-    
     try:
         cursor.execute("""
-            INSERT INTO Notifications (M_ID, Message, Type, IsRead)
-            VALUES (%s, %s, 'progress', FALSE)
-        """, (member_id, message))
-        
-        conn.commit()
-        return True
-        
-    except Error as e:
-        print(f"Error creating progress notification: {e}")
-        conn.rollback()
-        return False
+            INSERT INTO Broadcast (Gym_ID, MembershipType_ID, Message, Type)
+            VALUES (%s, %s, %s, %s)
+        """, (gym_id, membership_type_id, message, notif_type))
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+
+def create_session_reminder(conn, member_id, session_id, session_details, session_date, session_time):
+    """Add a reminder notification for an upcoming session; the caller commits."""
+    cursor = conn.cursor()
+    try:
+        message = session_reminder_message(session_details, session_date, session_time)
+        return add_notifications(cursor, [(member_id, message, 'session_reminder')]) > 0
+    finally:
+        cursor.close()
+
+def create_progress_notification(conn, member_id, message):
+    """Add a progress milestone notification; the caller commits."""
+    cursor = conn.cursor()
+    try:
+        return add_notifications(cursor, [(member_id, message, 'progress')]) > 0
     finally:
         cursor.close()
-        conn.close()
 
 if __name__ == "__main__":
     # Test the function
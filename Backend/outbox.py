@@ -0,0 +1,369 @@
+import json
+import threading
+import time
+from collections import Counter
+
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+import db
+from cold_archive import cold_archive
+from leaderboard import leaderboards
+from member_analytics import member_analytics
+from notifications import add_notifications, session_reminder_message
+from reference_data import reference_data
+from session_index import session_index
+from streaks import member_streaks
+
+load_dotenv()
+
+# How often each process polls for events when nothing wakes it
+POLL_MS = float(os.getenv('OUTBOX_POLL_MS', '100'))
+
+# Events sequenced or applied per transaction
+BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+
+# Sequenced events are kept this long so lagging processes can catch up
+RETENTION_HOURS = float(os.getenv('OUTBOX_RETENTION_HOURS', '24'))
+PURGE_INTERVAL_SECONDS = 60
+PURGE_BATCH_SIZE = 10000
+UNREACHABLE_RETRY_SECONDS = 5
+
+# Event types
+WORKOUT_LOGGED = 'workout_logged'
+SESSION_BOOKED = 'session_booked'
+SESSION_CANCELLED = 'session_cancelled'
+MEMBER_ADDED = 'member_added'
+MEMBER_DELETED = 'member_deleted'
+TRAINER_ADDED = 'trainer_added'
+TRAINER_DELETED = 'trainer_deleted'
+
+EMIT_SQL = "INSERT INTO Outbox (Type, M_ID, Payload) VALUES (%s, %s, %s)"
+
+CLAIM_QUERY = "SELECT LastSeq FROM OutboxState WHERE ID = 1 FOR UPDATE SKIP LOCKED"
+
+PENDING_QUERY = """
+    SELECT Event_ID, Type, M_ID, Payload
+    FROM Outbox
+    WHERE Seq IS NULL
+    ORDER BY Event_ID
+    LIMIT %s
+"""
+
+TAIL_QUERY = """
+    SELECT Seq, Type, M_ID, Payload
+    FROM Outbox
+    WHERE Seq > %s
+    ORDER BY Seq
+    LIMIT %s
+"""
+
+POSITION_QUERY = "SELECT LastSeq FROM OutboxState WHERE ID = 1"
+
+WORKOUT_COUNTS_QUERY = """
+    SELECT M_ID, COUNT(*), COALESCE(SUM(Exercise <> 'Session Booking'), 0)
+    FROM WorkoutLog
+    WHERE M_ID IN ({})
+    GROUP BY M_ID
+"""
+
+SESSION_DETAILS_QUERY = "SELECT S_ID, Details, SessionDate, SessionTime FROM Session WHERE S_ID IN ({})"
+
+# Notifications the TrackWorkoutProgress and LogMemberActivity triggers used to insert
+MILESTONES = {
+    10: 'Congratulations! You have completed 10 workouts. Keep up the great work!',
+    25: 'Amazing! 25 workouts completed. You are making excellent progress!',
+    50: 'Incredible milestone! 50 workouts completed. You are a fitness champion!',
+    100: 'Legendary achievement! 100 workouts completed. Outstanding dedication!'
+}
+WELCOME_MESSAGE = 'Welcome to GymFit! You have logged your first workout. Great start!'
+
+def event_params(event_type, member_id=None, **payload):
+    """Parameters of EMIT_SQL, for callers running it on another driver (asgi_app)."""
+    return (event_type, member_id, json.dumps(payload, separators=(',', ':'), default=str) if payload else None)
+
+def emit(conn, event_type, member_id=None, **payload):
+    """Append an event in the caller's transaction; it is published when the caller commits."""
+    db.execute(conn, EMIT_SQL, event_params(event_type, member_id, **payload))
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+class Event:
+    __slots__ = ('id', 'type', 'member_id', 'payload')
+
+    def __init__(self, event_id, event_type, member_id, payload):
+        self.id = event_id
+        self.type = event_type
+        self.member_id = member_id
+        self.payload = json.loads(payload) if payload else {}
+
+class OutboxConsumer:
+    """Side effects of writes, applied in batches after the write commits.
+
+    Write paths insert a compact event into the Outbox table in their own
+    transaction and return. A background thread in every process then:
+
+    - sequences: one process at a time per shard (the OutboxState row is
+      locked with SKIP LOCKED) takes the committed, unsequenced events,
+      numbers them after OutboxState.LastSeq and applies the database side
+      effects (notifications) in the same transaction, so each happens
+      exactly once;
+    - tails: every process reads the events sequenced since its last
+      position and refreshes its in-memory caches (member analytics,
+      leaderboards, session index, reference data).
+
+    Event_IDs can commit out of order, Seq cannot, so tailing by Seq never
+    skips an event. Cache handlers re-read state instead of applying
+    deltas, so replaying an event is harmless.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._positions = {}  # shard -> last Seq applied to this process's caches
+        self._last_purge = {}  # shard -> monotonic time of its last purge
+        self.sequenced = 0
+        self.applied = 0
+        self.batches = 0
+        self.notifications = 0
+        self.errors = 0
+        self.last_batch_ms = 0.0
+
+    def start(self):
+        """Start the consumer thread; the tail starts at the current position of each shard."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='outbox', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Process new events now instead of at the next poll (call after committing one)."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            busy = False
+            reachable = False
+            for shard in db.SHARDS:
+                conn = db.get_connection(shard)
+                if not conn:
+                    continue
+                reachable = True
+                try:
+                    busy = self._sequence(conn) or busy
+                    busy = self._tail(conn, shard) or busy
+                    self._purge(conn, shard)
+                except Error as e:
+                    print(f"Error consuming outbox events: {e}")
+                    with self._lock:
+                        self.errors += 1
+                    conn.rollback()
+                finally:
+                    conn.close()
+            if not reachable:
+                self._stop.wait(UNREACHABLE_RETRY_SECONDS)
+            elif not busy:
+                self._wake.wait(POLL_MS / 1000)
+                self._wake.clear()
+
+    # --- Sequencing & durable side effects ---
+
+    def _sequence(self, conn):
+        """Sequence one batch and apply its notifications. Returns True if the batch was full."""
+        started = time.perf_counter()
+        claim = db.query_one(conn, CLAIM_QUERY, dictionary=False)
+        if claim is None:
+            # Another process is sequencing this shard
+            conn.rollback()
+            return False
+        rows = db.query_all(conn, PENDING_QUERY, (BATCH_SIZE,), dictionary=False)
+        if not rows:
+            conn.rollback()
+            return False
+
+        last_seq = claim[0]
+        events = [Event(*row) for row in rows]
+        ids = [event.id for event in events]
+        cursor = conn.cursor()
+        try:
+            # Seq follows Event_ID order within the batch
+            cursor.execute(
+                f"UPDATE Outbox SET Seq = %s + FIELD(Event_ID, {_placeholders(ids)}) WHERE Event_ID IN ({_placeholders(ids)})",
+                (last_seq, *ids, *ids)
+            )
+            notified = self._notify(cursor, events)
+            cursor.execute("UPDATE OutboxState SET LastSeq = %s WHERE ID = 1", (last_seq + len(events),))
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self.sequenced += len(events)
+            self.notifications += notified
+            self.last_batch_ms = (time.perf_counter() - started) * 1000
+        return len(events) == BATCH_SIZE
+
+    def _notify(self, cursor, events):
+        """Insert the notifications a batch of events calls for. Returns how many."""
+        notifications = []
+
+        # Milestones from the member's workout count after the batch, as the
+        # per-row triggers did (archived workouts included)
+        rows_added = Counter()
+        workouts_added = Counter()
+        for event in events:
+            if event.type in (WORKOUT_LOGGED, SESSION_BOOKED):
+                rows_added[event.member_id] += 1
+            if event.type == WORKOUT_LOGGED:
+                workouts_added[event.member_id] += 1
+        if rows_added:
+            members = list(rows_added)
+            cursor.execute(WORKOUT_COUNTS_QUERY.format(_placeholders(members)), members)
+            for member_id, total, workouts in cursor.fetchall():
+                archived = cold_archive.rows('WorkoutLog', member_id)
+                total += archived
+                workouts = int(workouts) + archived
+                if total - rows_added[member_id] <= 0 < total:
+                    notifications.append((member_id, WELCOME_MESSAGE, 'system'))
+                before = workouts - workouts_added[member_id]
+                notifications.extend(
+                    (member_id, message, 'progress')
+                    for count, message in MILESTONES.items() if before < count <= workouts
+                )
+
+        # Reminders for new bookings, and for members booked from a waitlist
+        bookings = [(event.member_id, event.payload['session'], False)
+                    for event in events if event.type == SESSION_BOOKED]
+        bookings.extend((event.payload['promoted'], event.payload['session'], True)
+                        for event in events if event.type == SESSION_CANCELLED and event.payload.get('promoted'))
+        if bookings:
+            session_ids = sorted({session_id for _, session_id, _ in bookings})
+            cursor.execute(SESSION_DETAILS_QUERY.format(_placeholders(session_ids)), session_ids)
+            sessions = {row[0]: row[1:] for row in cursor.fetchall()}
+            for member_id, session_id, promoted in bookings:
+                if session_id not in sessions:
+                    continue
+                details, session_date, session_time = sessions[session_id]
+                if promoted:
+                    message = (f"A spot opened up in '{details}' on {session_date.strftime('%B %d, %Y')}. "
+                               "You have been booked from the waitlist.")
+                else:
+                    message = session_reminder_message(details, session_date, session_time)
+                notifications.append((member_id, message, 'session_reminder'))
+
+        return add_notifications(cursor, notifications)
+
+    # --- Tailing & in-memory caches ---
+
+    def _tail(self, conn, shard):
+        """Apply one batch of sequenced events to this process's caches. Returns True if full."""
+        position = self._positions.get(shard)
+        if position is None:
+            row = db.query_one(conn, POSITION_QUERY, dictionary=False)
+            conn.rollback()
+            self._positions[shard] = row[0] if row else 0
+            return False
+
+        rows = db.query_all(conn, TAIL_QUERY, (position, BATCH_SIZE), dictionary=False)
+        conn.rollback()
+        if not rows:
+            return False
+
+        # Tailed events carry their Seq as the ID
+        events = [Event(*row) for row in rows]
+        self._refresh_caches(conn, events)
+        self._positions[shard] = events[-1].id
+        with self._lock:
+            self.applied += len(events)
+            self.batches += 1
+        return len(events) == BATCH_SIZE
+
+    def _refresh_caches(self, conn, events):
+        members = set()
+        leaderboard_members = set()
+        sessions = set()
+        gyms_changed = False
+        trainers_changed = False
+
+        for event in events:
+            if event.type == WORKOUT_LOGGED:
+                members.add(event.member_id)
+                leaderboard_members.add(event.member_id)
+                member_streaks.record(event.member_id, event.payload.get('date'))
+            elif event.type == SESSION_BOOKED:
+                members.add(event.member_id)
+                sessions.add(event.payload['session'])
+            elif event.type == SESSION_CANCELLED:
+                members.add(event.member_id)
+                sessions.add(event.payload['session'])
+                if event.payload.get('promoted'):
+                    members.add(event.payload['promoted'])
+            elif event.type == MEMBER_ADDED:
+                gyms_changed = True
+            elif event.type == MEMBER_DELETED:
+                members.add(event.member_id)
+                leaderboards.remove_member(event.member_id)
+                member_streaks.forget(event.member_id)
+                cold_archive.remove_member(event.member_id)
+                gyms_changed = True
+            elif event.type in (TRAINER_ADDED, TRAINER_DELETED):
+                trainers_changed = True
+
+        for member_id in members:
+            member_analytics.invalidate(member_id)
+        if gyms_changed:
+            member_analytics.invalidate_gyms()
+        if trainers_changed:
+            reference_data.invalidate()
+        if leaderboard_members:
+            leaderboards.refresh_members(conn, leaderboard_members)
+        if sessions:
+            session_index.refresh_sessions(conn, sessions)
+
+    def _purge(self, conn, shard):
+        now = time.monotonic()
+        last = self._last_purge.get(shard)
+        if last is not None and now - last < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge[shard] = now
+        cursor = conn.cursor()
+        try:
+            # Batches keep each transaction short; loop until the backlog is gone
+            while True:
+                cursor.execute("""
+                    DELETE FROM Outbox
+                    WHERE Seq IS NOT NULL AND CreatedAt < NOW() - INTERVAL %s MINUTE
+                    LIMIT %s
+                """, (int(RETENTION_HOURS * 60), PURGE_BATCH_SIZE))
+                deleted = cursor.rowcount
+                conn.commit()
+                if deleted < PURGE_BATCH_SIZE or self._stop.is_set():
+                    break
+        finally:
+            cursor.close()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'positions': dict(self._positions),
+                'eventsSequenced': self.sequenced,
+                'eventsApplied': self.applied,
+                'cacheBatches': self.batches,
+                'avgEventsPerBatch': round(self.applied / self.batches, 1) if self.batches else None,
+                'notificationsCreated': self.notifications,
+                'lastSequenceBatchMs': round(self.last_batch_ms, 2),
+                'errors': self.errors
+            }
+
+outbox_consumer = OutboxConsumer()
@@ -0,0 +1,321 @@
+import cProfile
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Profiling is off until an admin turns it on (POST /api/admin/profiling);
+# these are the defaults it is turned on with
+SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.05'))
+MAX_PER_SECOND = float(os.getenv('PROFILE_MAX_PER_SECOND', '2'))
+
+# Stack sampling interval in 'sample' mode
+SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+
+# Distinct stacks kept per route; rarer ones are counted under '[other]'
+MAX_STACKS = int(os.getenv('PROFILE_MAX_STACKS', '2000'))
+
+# Frames recorded per allocation in 'memory' mode
+TRACEMALLOC_FRAMES = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', '8'))
+
+# sample:   wall-clock stack samples of the request thread, as folded stacks
+# cprofile: deterministic per-function timings (pstats)
+# memory:   tracemalloc diff around the request, grouped by allocating line
+MODES = ('sample', 'cprofile', 'memory')
+
+# Frames of the profiler itself and of tracemalloc, left out of memory diffs
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+)
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+def _fold(frame):
+    """Folded stack of a frame, outermost first, in flamegraph.pl/speedscope format."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class _Run:
+    """One profiled request."""
+    __slots__ = ('route', 'thread_id', 'started', 'profile', 'snapshot', 'stacks')
+
+    def __init__(self, route):
+        self.route = route
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.profile = None
+        self.snapshot = None
+        self.stacks = Counter()
+
+class _RouteProfile:
+    __slots__ = ('requests', 'total_ms', 'stacks', 'stats', 'allocations', 'peak_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.stacks = Counter()
+        self.stats = None
+        self.allocations = Counter()  # 'file:line' -> bytes allocated and still held at the end
+        self.peak_bytes = 0
+
+class RouteProfiler:
+    """Admin-toggled, sampled profiling of Flask routes in this process.
+
+    While enabled, a request is profiled with probability sample_rate, at
+    most max_per_second times a second and one request at a time, so the
+    overhead stays bounded under real load. Results are aggregated per route
+    ("GET /api/dashboard/member/<int:member_id>"); calls into
+    recommendations.py, ai_chatbot.py and the rest appear under the route
+    that made them.
+
+    Settings and results are per process: with several workers, each one
+    has to be switched on (and read) separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._active = None
+        self._sampler = None
+        self._sampling = threading.Event()
+        self.enabled = False
+        self.mode = 'sample'
+        self.sample_rate = SAMPLE_RATE
+        self.max_per_second = MAX_PER_SECOND
+        self.endpoints = None  # only these view functions when set
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        self.profiled = 0
+        self.skipped_busy = 0
+        self.skipped_rate_cap = 0
+        self.samples = 0
+
+    # --- Control ---
+
+    def configure(self, enabled=None, mode=None, sample_rate=None, max_per_second=None, endpoints=None):
+        """Change settings; unspecified ones keep their value. Raises ValueError on bad input."""
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"Mode must be one of: {', '.join(MODES)}.")
+        if sample_rate is not None and not 0 < float(sample_rate) <= 1:
+            raise ValueError('sample_rate must be greater than 0 and at most 1.')
+        if max_per_second is not None and float(max_per_second) <= 0:
+            raise ValueError('max_per_second must be greater than 0.')
+        if endpoints is not None and not isinstance(endpoints, list):
+            raise ValueError('endpoints must be a list of endpoint names.')
+
+        with self._lock:
+            if mode is not None and mode != self.mode:
+                # Results of different modes are not comparable
+                self._routes.clear()
+                self.mode = mode
+            if sample_rate is not None:
+                self.sample_rate = float(sample_rate)
+            if max_per_second is not None:
+                self.max_per_second = float(max_per_second)
+            if endpoints is not None:
+                self.endpoints = set(endpoints) or None
+            if enabled and not self.enabled:
+                self._tokens = max(1.0, self.max_per_second)
+                self._refilled = time.monotonic()
+            if enabled is not None:
+                self.enabled = bool(enabled)
+
+            # tracemalloc slows every allocation in the process, so it only
+            # runs while memory mode is on
+            tracing = self.enabled and self.mode == 'memory'
+            if tracing and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            elif not tracing and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+            if self.enabled and self.mode == 'sample':
+                self._sampling.set()
+                if self._sampler is None:
+                    self._sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+                    self._sampler.start()
+            else:
+                self._sampling.clear()
+
+    def reset(self):
+        """Drop collected results and counters; settings are kept."""
+        with self._lock:
+            self._routes.clear()
+            self.profiled = self.skipped_busy = self.skipped_rate_cap = self.samples = 0
+
+    # --- Request hooks ---
+
+    def start(self, route, endpoint):
+        """Begin profiling the current request if it is sampled. Returns a handle for stop()."""
+        if not self.enabled or (self.endpoints and endpoint not in self.endpoints):
+            return None
+        if random.random() >= self.sample_rate:
+            return None
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(max(1.0, self.max_per_second),
+                               self._tokens + (now - self._refilled) * self.max_per_second)
+            self._refilled = now
+            if self._active is not None:
+                self.skipped_busy += 1
+                return None
+            if self._tokens < 1:
+                self.skipped_rate_cap += 1
+                return None
+            self._tokens -= 1
+            run = _Run(route)
+            self._active = run
+            mode = self.mode
+
+        if mode == 'cprofile':
+            run.profile = cProfile.Profile()
+            run.profile.enable()
+        elif mode == 'memory' and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            run.snapshot = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+        return run
+
+    def stop(self, run):
+        """Finish a run started by start() and fold it into its route's results."""
+        if run.profile is not None:
+            run.profile.disable()
+        elapsed_ms = (time.perf_counter() - run.started) * 1000
+
+        stats = pstats.Stats(run.profile) if run.profile is not None else None
+        allocations = None
+        peak = 0
+        if run.snapshot is not None and tracemalloc.is_tracing():
+            after = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+            peak = tracemalloc.get_traced_memory()[1]
+            allocations = Counter()
+            for diff in after.compare_to(run.snapshot, 'lineno'):
+                if diff.size_diff > 0:
+                    frame = diff.traceback[0]
+                    allocations[f"{os.path.basename(frame.filename)}:{frame.lineno}"] += diff.size_diff
+
+        with self._lock:
+            if self._active is run:
+                self._active = None
+            profile = self._routes.get(run.route)
+            if profile is None:
+                profile = self._routes[run.route] = _RouteProfile()
+            profile.requests += 1
+            profile.total_ms += elapsed_ms
+            for stack, count in run.stacks.items():
+                if stack in profile.stacks or len(profile.stacks) < MAX_STACKS:
+                    profile.stacks[stack] += count
+                else:
+                    profile.stacks['[other]'] += count
+            if stats is not None:
+                if profile.stats is None:
+                    profile.stats = stats
+                else:
+                    profile.stats.add(stats)
+            if allocations:
+                profile.allocations.update(allocations)
+            profile.peak_bytes = max(profile.peak_bytes, peak)
+            self.profiled += 1
+
+    def _sample_loop(self):
+        interval = SAMPLE_INTERVAL_MS / 1000
+        while self._sampling.wait():
+            time.sleep(interval)
+            with self._lock:
+                run = self._active
+                if run is None or self.mode != 'sample':
+                    continue
+                frame = sys._current_frames().get(run.thread_id)
+                if frame is not None:
+                    run.stacks[_fold(frame)] += 1
+                    self.samples += 1
+
+    # --- Results ---
+
+    def report(self, route=None, limit=20):
+        """Per-route results: top functions, hottest stacks or largest allocations."""
+        with self._lock:
+            routes = {name: p for name, p in self._routes.items() if route is None or name == route}
+            result = {}
+            for name, profile in routes.items():
+                entry = {
+                    'requests': profile.requests,
+                    'avgMs': round(profile.total_ms / profile.requests, 2)
+                }
+                if profile.stacks:
+                    total = sum(profile.stacks.values())
+                    entry['samples'] = total
+                    entry['topStacks'] = [
+                        {'stack': stack.split(';')[-3:], 'share': round(count / total, 4)}
+                        for stack, count in profile.stacks.most_common(limit)
+                    ]
+                if profile.stats is not None:
+                    entry['topFunctions'] = self._top_functions(profile.stats, profile.requests, limit)
+                if profile.allocations:
+                    entry['peakTracedBytes'] = profile.peak_bytes
+                    entry['topAllocations'] = [
+                        {'line': line, 'bytesPerRequest': size // profile.requests}
+                        for line, size in profile.allocations.most_common(limit)
+                    ]
+                result[name] = entry
+        return result
+
+    @staticmethod
+    def _top_functions(stats, requests, limit):
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'ownMsPerRequest': round(own * 1000 / requests, 3),
+            'cumulativeMsPerRequest': round(cumulative * 1000 / requests, 3)
+        } for (filename, line, name), (_, calls, own, cumulative, _) in rows]
+
+    def folded(self, route=None):
+        """Sampled stacks as 'frame;frame;frame count' lines, one root frame per route."""
+        with self._lock:
+            lines = [
+                f"{name};{stack} {count}"
+                for name, profile in self._routes.items() if route is None or name == route
+                for stack, count in profile.stacks.items()
+            ]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def pstats_dump(self, route):
+        """A route's cProfile results in the format pstats.Stats, snakeviz and flameprof load."""
+        with self._lock:
+            profile = self._routes.get(route)
+            if profile is None or profile.stats is None:
+                return None
+            return marshal.dumps(profile.stats.stats)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'mode': self.mode,
+                'sampleRate': self.sample_rate,
+                'maxPerSecond': self.max_per_second,
+                'endpoints': sorted(self.endpoints) if self.endpoints else None,
+                'profiledRequests': self.profiled,
+                'skippedBusy': self.skipped_busy,
+                'skippedRateCap': self.skipped_rate_cap,
+                'stackSamples': self.samples,
+                'tracemalloc': tracemalloc.is_tracing(),
+                'routes': sorted(self._routes)
+            }
+
+route_profiler = RouteProfiler()
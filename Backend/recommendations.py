@@ -3,6 +3,8 @@ from mysql.connector import Error
 import os
 from dotenv import load_dotenv
 
+from streaks import member_streaks
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -21,9 +23,14 @@ def get_db_connection():
         print(f"Error connecting to MySQL: {e}")
         return None
 
-def generate_workout_recommendations(member_id):
-    """Generate personalized workout recommendations using rule-based logic"""
-    conn = get_db_connection()
+def generate_workout_recommendations(member_id, conn=None):
+    """Generate personalized workout recommendations using rule-based logic
+
+    Uses the caller's connection when one is given and leaves it open.
+    """
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_db_connection()
     if not conn:
         return []
     cursor = conn.cursor(dictionary=True)
@@ -39,6 +46,9 @@ def generate_workout_recommendations(member_id):
         """, (member_id,))
         workout_patterns = cursor.fetchall()
 
+        # Workout days and streak, from the in-memory streak engine
+        streaks = member_streaks.summary(conn, member_id)
+
         # Get current health metrics
         cursor.execute("""
             SELECT Weight, Height, SleepHours, Steps
@@ -48,14 +58,6 @@ def generate_workout_recommendations(member_id):
         """, (member_id,))
         health_data = cursor.fetchone()
 
-        # Get total workouts in last 7 days
-        cursor.execute("""
-            SELECT COUNT(*) as weekly_workouts
-            FROM WorkoutLog
-            WHERE M_ID = %s AND Date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-        """, (member_id,))
-        weekly_data = cursor.fetchone()
-
         recommendations = []
 
         # Rule 1: Step count recommendation
@@ -86,8 +88,8 @@ def generate_workout_recommendations(member_id):
                 })
 
         # Rule 3: Workout frequency recommendation
-        if weekly_data:
-            weekly_workouts = weekly_data.get('weekly_workouts', 0)
+        if streaks:
+            weekly_workouts = streaks['activeDaysLast7']
             if weekly_workouts < 3:
                 recommendations.append({
                     'type': 'general',
@@ -125,6 +127,15 @@ def generate_workout_recommendations(member_id):
                     'duration': 40
                 })
 
+        # Rule 6: Keep an ongoing streak alive
+        if streaks and streaks['currentStreak'] >= 3 and not streaks['workedOutToday']:
+            recommendations.append({
+                'type': 'general',
+                'message': f"You're on a {streaks['currentStreak']}-day workout streak. A short session today keeps it going!",
+                'exercise': 'Quick Full-Body Circuit',
+                'duration': 20
+            })
+
         # If no recommendations, provide a general one
         if not recommendations:
             recommendations.append({
@@ -147,4 +158,5 @@ def generate_workout_recommendations(member_id):
         }]
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        if owns_connection:
+            conn.close()
\ No newline at end of file
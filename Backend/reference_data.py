@@ -0,0 +1,224 @@
+import sys
+import threading
+import time
+
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+import db
+from shard_router import shard_router
+
+load_dotenv()
+
+# How often the ReferenceDataVersion counter is polled for changes made by
+# other processes or directly in MySQL
+CHECK_SECONDS = float(os.getenv('REFERENCE_CACHE_CHECK_SECONDS', '5'))
+
+VERSION_QUERY = "SELECT Version FROM ReferenceDataVersion WHERE ID = 1"
+GYMS_QUERY = "SELECT Gym_ID, Location, Capacity FROM Gym"
+MEMBERSHIP_TYPES_QUERY = "SELECT Type_ID, Name, Duration, Price, Gym_ID FROM MembershipType"
+TRAINERS_QUERY = "SELECT T_ID, Name, Email, Specialization, Gym_ID FROM Trainer"
+
+def _deep_size(obj, seen=None):
+    """Approximate memory held by nested dicts/lists of scalars, in bytes."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
+class _Snapshot:
+    __slots__ = ('versions', 'gyms', 'membership_types', 'trainers')
+
+    def __init__(self, versions, gyms, membership_types, trainers):
+        self.versions = versions  # {shard: ReferenceDataVersion}
+        self.gyms = gyms
+        self.membership_types = membership_types
+        self.trainers = trainers
+
+class ReferenceCache:
+    """In-process copy of the Gym, MembershipType and Trainer tables.
+
+    The three tables are small and rarely written, so hot queries select
+    only the foreign keys and names are resolved here instead of by joins.
+    A snapshot is loaded at startup and swapped whole on reload; readers
+    never lock. A background thread polls ReferenceDataVersion (bumped by
+    triggers on every change) and reloads when it moves; admin writes in
+    this process call invalidate() to reload right away.
+
+    With several shards, Gym and MembershipType are the same everywhere and
+    trainers are merged from all of them; each shard's version is tracked.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._poller = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.version_checks = 0
+        self.last_load_ms = 0.0
+        self.footprint_bytes = 0
+
+    def _read(self, conn):
+        """Read one shard's version and tables in one consistent snapshot."""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction(consistent_snapshot=True, readonly=True)
+            cursor.execute(VERSION_QUERY)
+            row = cursor.fetchone()
+            version = row['Version'] if row else 0
+            cursor.execute(GYMS_QUERY)
+            gyms = {row['Gym_ID']: row for row in cursor.fetchall()}
+            cursor.execute(MEMBERSHIP_TYPES_QUERY)
+            membership_types = {row['Type_ID']: row for row in cursor.fetchall()}
+            cursor.execute(TRAINERS_QUERY)
+            trainers = {row['T_ID']: row for row in cursor.fetchall()}
+            conn.commit()
+            return version, gyms, membership_types, trainers
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def load(self):
+        """Read all three tables and the version from every shard.
+
+        Returns False if MySQL is unreachable; the previous snapshot, if any,
+        stays in place.
+        """
+        started = time.perf_counter()
+        try:
+            results = shard_router.fan_out(self._read)
+        except Error as e:
+            print(f"Error loading reference data: {e}")
+            return False
+
+        versions, gyms, membership_types, trainers = {}, {}, {}, {}
+        for shard, (version, shard_gyms, shard_types, shard_trainers) in results.items():
+            versions[shard] = version
+            gyms.update(shard_gyms)
+            membership_types.update(shard_types)
+            trainers.update(shard_trainers)
+
+        self._snapshot = _Snapshot(versions, gyms, membership_types, trainers)
+        self.last_load_ms = (time.perf_counter() - started) * 1000
+        self.footprint_bytes = _deep_size((gyms, membership_types, trainers))
+        self.reloads += 1
+        return True
+
+    def start(self):
+        """Warm the cache and start polling for changes. Returns False if the warm-up failed."""
+        loaded = self.load()
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, name='reference-data', daemon=True)
+            self._poller.start()
+        return loaded
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self):
+        while not self._stop.wait(CHECK_SECONDS):
+            self.refresh()
+
+    def refresh(self):
+        """Reload if the version in MySQL differs from the cached one."""
+        with self._reload_lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                self.load()
+                return
+            try:
+                rows = shard_router.fan_out(lambda conn: db.query_one(conn, VERSION_QUERY, dictionary=False))
+            except Error as e:
+                print(f"Error checking reference data version: {e}")
+                return
+            self.version_checks += 1
+            if any(row and row[0] != snapshot.versions.get(shard) for shard, row in rows.items()):
+                self.load()
+
+    def invalidate(self):
+        """Reload now; called after this process commits a reference-table write."""
+        with self._reload_lock:
+            self.load()
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Warm-up failed (MySQL was down); try once more on demand
+            with self._reload_lock:
+                if self._snapshot is None:
+                    self.load()
+            snapshot = self._snapshot
+        return snapshot
+
+    def gym(self, gym_id):
+        snapshot = self._current()
+        return snapshot.gyms.get(gym_id) if snapshot else None
+
+    def membership_type(self, type_id):
+        snapshot = self._current()
+        return snapshot.membership_types.get(type_id) if snapshot else None
+
+    def trainer(self, trainer_id):
+        snapshot = self._current()
+        return snapshot.trainers.get(trainer_id) if snapshot else None
+
+    def gyms(self):
+        snapshot = self._current()
+        return snapshot.gyms if snapshot else {}
+
+    def membership_types(self):
+        snapshot = self._current()
+        return snapshot.membership_types if snapshot else {}
+
+    def trainers(self):
+        snapshot = self._current()
+        return snapshot.trainers if snapshot else {}
+
+    def resolve(self, rows, table, key_column, fields):
+        """Copy referenced columns onto rows in place, like a LEFT JOIN.
+
+        table is 'gyms', 'membership_types' or 'trainers'; fields maps a
+        column of the referenced row to the key set on each row, e.g.
+        {'Location': 'GymLocation'}.
+        """
+        snapshot = self._current()
+        referenced = getattr(snapshot, table) if snapshot else {}
+        for row in rows:
+            ref = referenced.get(row[key_column])
+            for source, target in fields.items():
+                row[target] = ref[source] if ref else None
+        return rows
+
+    def resolve_member(self, row):
+        """Add MembershipType and GymLocation to a Member row selected with its foreign keys."""
+        if row:
+            self.resolve([row], 'membership_types', 'MembershipType_ID', {'Name': 'MembershipType'})
+            self.resolve([row], 'gyms', 'Gym_ID', {'Location': 'GymLocation'})
+        return row
+
+    def metrics(self):
+        snapshot = self._snapshot
+        return {
+            'loaded': snapshot is not None,
+            'version': snapshot.versions.get(db.DEFAULT_SHARD) if snapshot else None,
+            'shardVersions': snapshot.versions if snapshot else {},
+            'gyms': len(snapshot.gyms) if snapshot else 0,
+            'membershipTypes': len(snapshot.membership_types) if snapshot else 0,
+            'trainers': len(snapshot.trainers) if snapshot else 0,
+            'reloads': self.reloads,
+            'versionChecks': self.version_checks,
+            'lastLoadMs': round(self.last_load_ms, 2),
+            'footprintBytes': self.footprint_bytes
+        }
+
+reference_data = ReferenceCache()
@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+from datetime import date
+
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+from shard_router import shard_router
+
+load_dotenv()
+
+# Full reload interval; picks up sessions created or booked by other processes
+FULL_RELOAD_SECONDS = int(os.getenv('SESSION_INDEX_RELOAD_SECONDS', '60'))
+
+SESSION_QUERY = """
+    SELECT s.S_ID, s.Details, s.SessionDate, s.SessionTime, s.Duration, s.T_ID,
+           s.MaxParticipants, s.BookedCount, s.Status,
+           t.Name AS TrainerName, t.Specialization, t.Gym_ID
+    FROM Session s
+    JOIN Trainer t ON s.T_ID = t.T_ID
+    WHERE s.SessionDate >= CURDATE()
+"""
+
+def _fetch(conn, sql, params=()):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def _to_record(row):
+    """Convert a Session row into the JSON-ready dict served by the API."""
+    record = dict(row)
+    session_time = record['SessionTime']
+    if session_time is not None:
+        # TIME columns arrive as timedelta; zero-pad so the string sorts correctly
+        seconds = int(session_time.total_seconds())
+        record['SessionTime'] = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    record['participantCount'] = record['BookedCount']
+    return record
+
+class SessionIndex:
+    """In-process index of upcoming sessions.
+
+    Sessions are kept in a dict by S_ID with a date-ordered key list and
+    trainer/specialization buckets, so browse queries never touch MySQL.
+    Booked and cancelled sessions are re-read when the outbox reports them,
+    in every process; a periodic full reload and the day rollover pick up
+    everything else. Sessions are read from every shard, each from the
+    shard owning its trainer's gym.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._sessions = {}
+        self._order = []  # sorted (SessionDate, SessionTime, S_ID)
+        self._by_trainer = {}
+        self._by_specialization = {}
+        self._loaded_at = 0.0
+        self._loaded_for = None
+
+    def _sort_key(self, record):
+        return (record['SessionDate'], record['SessionTime'] or '', record['S_ID'])
+
+    def _insert(self, record):
+        self._sessions[record['S_ID']] = record
+        bisect.insort(self._order, self._sort_key(record))
+        self._by_trainer.setdefault(record['T_ID'], set()).add(record['S_ID'])
+        spec = (record['Specialization'] or '').lower()
+        self._by_specialization.setdefault(spec, set()).add(record['S_ID'])
+
+    def _remove(self, session_id):
+        record = self._sessions.pop(session_id, None)
+        if not record:
+            return
+        key = self._sort_key(record)
+        pos = bisect.bisect_left(self._order, key)
+        if pos < len(self._order) and self._order[pos] == key:
+            del self._order[pos]
+        self._by_trainer.get(record['T_ID'], set()).discard(session_id)
+        self._by_specialization.get((record['Specialization'] or '').lower(), set()).discard(session_id)
+
+    def load(self):
+        """Reload every upcoming session from the database."""
+        try:
+            rows = shard_router.owned(shard_router.fan_out(lambda conn: _fetch(conn, SESSION_QUERY)))
+        except Error as e:
+            print(f"Error loading session index: {e}")
+            return False
+
+        with self._lock:
+            self._sessions = {}
+            self._order = []
+            self._by_trainer = {}
+            self._by_specialization = {}
+            for row in rows:
+                self._insert(_to_record(row))
+            self._loaded_at = time.monotonic()
+            self._loaded_for = date.today()
+        return True
+
+    def refresh_sessions(self, conn, session_ids):
+        """Re-read sessions on one shard's connection (after bookings or cancellations)."""
+        session_ids = sorted(session_ids)
+        try:
+            rows = _fetch(conn, SESSION_QUERY + f" AND s.S_ID IN ({', '.join(['%s'] * len(session_ids))})", session_ids)
+        except Error as e:
+            print(f"Error refreshing sessions: {e}")
+            return
+
+        with self._lock:
+            for session_id in session_ids:
+                self._remove(session_id)
+            for row in rows:
+                self._insert(_to_record(row))
+
+    @property
+    def is_loaded(self):
+        return self._loaded_for is not None
+
+    def _ensure_fresh(self):
+        if self._loaded_for == date.today() and time.monotonic() - self._loaded_at <= FULL_RELOAD_SECONDS:
+            return
+        # One request reloads; concurrent callers keep serving the current data
+        blocking = self._loaded_for is None
+        if self._reload_lock.acquire(blocking=blocking):
+            try:
+                self.load()
+            finally:
+                self._reload_lock.release()
+
+    def query(self, date_from=None, date_to=None, trainer_id=None, specialization=None,
+              min_spots=1, limit=50, offset=0, shard=None):
+        """Filter upcoming sessions in date order. Returns (page, total_matches).
+
+        shard limits the results to gyms on that database shard, the only
+        sessions a member there can book.
+        """
+        self._ensure_fresh()
+        today = date.today()
+        start = max(date_from, today) if date_from else today
+
+        with self._lock:
+            candidates = None
+            if trainer_id is not None:
+                candidates = self._by_trainer.get(trainer_id, set())
+            if specialization:
+                spec_ids = self._by_specialization.get(specialization.lower(), set())
+                candidates = spec_ids if candidates is None else candidates & spec_ids
+
+            matches = []
+            pos = bisect.bisect_left(self._order, (start,))
+            for session_date, _, session_id in self._order[pos:]:
+                if date_to and session_date > date_to:
+                    break
+                if candidates is not None and session_id not in candidates:
+                    continue
+                record = self._sessions[session_id]
+                if record['MaxParticipants'] - record['BookedCount'] < min_spots:
+                    continue
+                if shard is not None and shard_router.shard_for_gym(record['Gym_ID']) != shard:
+                    continue
+                matches.append(record)
+
+            page = [dict(record) for record in matches[offset:offset + limit]]
+        return page, len(matches)
+
+session_index = SessionIndex()
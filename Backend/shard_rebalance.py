@@ -0,0 +1,381 @@
+"""
+Move one gym's rows to another shard while the application keeps running.
+
+Steps:
+  preflight  - the target shard differs from the gym's current one, Gym,
+               MembershipType and NotificationText rows exist on the target
+               (copied if missing), and nothing links the gym's rows to
+               another gym (bookings, waitlist entries or TrainerClient rows
+               across gyms, emails already taken on the target)
+  copy       - online, in keyset-ordered chunks, parents before children;
+               rows are upserted so an interrupted move can simply be re-run
+  freeze     - GymShard.Status = 'frozen': every process refuses writes for
+               the gym within SHARD_DIRECTORY_CHECK_SECONDS
+  final sync - rows deleted on the source since the copy are deleted on the
+               target, then everything is copied once more
+  flip       - GymShard points at the target and the gym is active again
+  cleanup    - the gym's rows are deleted from the source and GymStats is
+               reconciled on both shards
+
+Copies run with @gymfit_shard_copy set, which the Member, Trainer, Session,
+WorkoutLog and HealthMetrics triggers honour by doing nothing: booked counts,
+notifications and TrainerClient rows are copied as they are.
+
+Row IDs must be unique across shards, or the copy aborts on the first
+collision. Give every shard the same auto_increment_increment and its own
+auto_increment_offset (see README.md, "Running with several shards").
+
+Usage:
+    python Backend/shard_rebalance.py --gym-id 3 --to east --chunk-size 1000
+"""
+import argparse
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+import db
+from gym_stats import reconcile_gym_stats
+from shard_router import CHECK_SECONDS, shard_router
+
+MEMBER_SCOPE = "M_ID IN (SELECT M_ID FROM Member WHERE Gym_ID = %s)"
+TRAINER_SCOPE = "T_ID IN (SELECT T_ID FROM Trainer WHERE Gym_ID = %s)"
+
+# (table, primary key columns, rows belonging to the gym) in copy order;
+# deletes run in reverse
+TABLES = [
+    ('Trainer', ('T_ID',), "Gym_ID = %s"),
+    ('Member', ('M_ID',), "Gym_ID = %s"),
+    ('Session', ('S_ID',), TRAINER_SCOPE),
+    ('TrainerClient', ('T_ID', 'M_ID'), TRAINER_SCOPE),
+    ('WorkoutLog', ('L_ID',), MEMBER_SCOPE),
+    ('HealthMetrics', ('Metric_ID',), MEMBER_SCOPE),
+    ('Notifications', ('Notif_ID',), MEMBER_SCOPE),
+    ('Broadcast', ('Broadcast_ID',), "Gym_ID = %s"),
+    ('SessionWaitlist', ('W_ID',), MEMBER_SCOPE),
+    ('ChatMessage', ('Msg_ID',), MEMBER_SCOPE),
+    ('ChatSummary', ('M_ID',), MEMBER_SCOPE)
+]
+
+# BroadcastRead is not copied as is: its ReadThroughID watermark counts in
+# the source shard's Broadcast IDs. Each moved member's marker is rebased
+# onto the target's broadcasts by the time of the last one they read, and
+# falls before the first visible broadcast sent after it, so a move can show
+# a broadcast as unread again but never hides an unread one. Markers go with
+# their Member rows when those are deleted.
+READ_MARKERS_QUERY = """
+    SELECT r.M_ID, b.CreatedAt
+    FROM BroadcastRead r
+    JOIN Member m ON m.M_ID = r.M_ID
+    JOIN Broadcast b ON b.Broadcast_ID = r.ReadThroughID
+    WHERE m.Gym_ID = %s
+"""
+
+REBASE_READ_MARKER = """
+    INSERT INTO BroadcastRead (M_ID, ReadThroughID)
+    SELECT m.M_ID, COALESCE(MIN(IF(b.CreatedAt > %s, b.Broadcast_ID, NULL)) - 1, MAX(b.Broadcast_ID))
+    FROM Member m
+    JOIN Broadcast b
+      ON (b.Gym_ID IS NULL OR b.Gym_ID = m.Gym_ID)
+     AND (b.MembershipType_ID IS NULL OR b.MembershipType_ID = m.MembershipType_ID)
+    WHERE m.M_ID = %s
+    GROUP BY m.M_ID
+    ON DUPLICATE KEY UPDATE ReadThroughID = VALUES(ReadThroughID)
+"""
+
+# Copied to the target before anything references them: Gym and MembershipType
+# are loaded on every shard, NotificationText rows are keyed by content
+REFERENCE_TABLES = ['Gym', 'MembershipType', 'NotificationText']
+
+# Rows tying the gym to another gym; they would dangle after the move
+CROSS_GYM_CHECKS = {
+    'bookings across gyms': """
+        SELECT COUNT(*)
+        FROM WorkoutLog wl
+        JOIN Member m ON wl.M_ID = m.M_ID
+        JOIN Session s ON wl.S_ID = s.S_ID
+        JOIN Trainer t ON s.T_ID = t.T_ID
+        WHERE (m.Gym_ID <=> %s) <> (t.Gym_ID <=> %s)
+    """,
+    'waitlist entries across gyms': """
+        SELECT COUNT(*)
+        FROM SessionWaitlist w
+        JOIN Member m ON w.M_ID = m.M_ID
+        JOIN Session s ON w.S_ID = s.S_ID
+        JOIN Trainer t ON s.T_ID = t.T_ID
+        WHERE (m.Gym_ID <=> %s) <> (t.Gym_ID <=> %s)
+    """,
+    'trainer-client rows across gyms': """
+        SELECT COUNT(*)
+        FROM TrainerClient tc
+        JOIN Member m ON tc.M_ID = m.M_ID
+        JOIN Trainer t ON tc.T_ID = t.T_ID
+        WHERE (m.Gym_ID <=> %s) <> (t.Gym_ID <=> %s)
+    """
+}
+
+# Written columns only: generated ones such as WorkoutLog.BookingKey are recomputed
+COLUMNS_QUERY = """
+    SELECT COLUMN_NAME
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND GENERATION_EXPRESSION = ''
+    ORDER BY ORDINAL_POSITION
+"""
+
+class RebalanceError(Exception):
+    pass
+
+def connect(shard):
+    """Direct (unpooled) connection with the trigger guard set.
+
+    Pooled connections keep their session state, so the guard must never
+    be set on one.
+    """
+    conn = mysql.connector.connect(use_pure=db.USE_PURE, **db.SHARDS[shard])
+    cursor = conn.cursor()
+    cursor.execute("SET @gymfit_shard_copy = 1")
+    cursor.close()
+    return conn
+
+def fetch(conn, sql, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def row_placeholders(width, count):
+    one = '(' + ', '.join(['%s'] * width) + ')'
+    return ', '.join([one] * count)
+
+def columns(conn, table):
+    return [row[0] for row in fetch(conn, COLUMNS_QUERY, (table,))]
+
+def copy_reference_tables(source, target):
+    for table in REFERENCE_TABLES:
+        names = columns(source, table)
+        rows = fetch(source, f"SELECT {', '.join(names)} FROM {table}")
+        if not rows:
+            continue
+        cursor = target.cursor()
+        try:
+            cursor.executemany(
+                f"INSERT IGNORE INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})",
+                rows
+            )
+            if cursor.rowcount:
+                print(f"  {table}: added {cursor.rowcount} missing row(s) on the target")
+        finally:
+            cursor.close()
+    target.commit()
+
+def preflight(source, target, gym_id):
+    if not fetch(source, "SELECT 1 FROM Gym WHERE Gym_ID = %s", (gym_id,)):
+        raise RebalanceError(f"Gym {gym_id} does not exist on the source shard")
+
+    problems = []
+    for label, sql in CROSS_GYM_CHECKS.items():
+        count = fetch(source, sql, (gym_id, gym_id))[0][0]
+        if count:
+            problems.append(f"{count} {label}")
+
+    for table, key in (('Member', 'M_ID'), ('Trainer', 'T_ID')):
+        emails = [row[0] for row in fetch(source, f"SELECT Email FROM {table} WHERE Gym_ID = %s", (gym_id,))]
+        for start in range(0, len(emails), 1000):
+            chunk = emails[start:start + 1000]
+            taken = fetch(
+                target,
+                f"SELECT {key}, Email FROM {table} WHERE Email IN ({', '.join(['%s'] * len(chunk))}) AND NOT (Gym_ID <=> %s)",
+                (*chunk, gym_id)
+            )
+            problems.extend(f"{table} email {email} belongs to {key} {row_id} on the target" for row_id, email in taken)
+
+    if problems:
+        raise RebalanceError("Gym cannot be moved as it is:\n  " + "\n  ".join(problems))
+
+    copy_reference_tables(source, target)
+
+def primary_keys(conn, table, key, scope, gym_id):
+    return set(fetch(conn, f"SELECT {', '.join(key)} FROM {table} WHERE {scope}", (gym_id,)))
+
+def delete_keys(conn, table, key, keys, chunk_size):
+    keys = sorted(keys)
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            cursor.execute(
+                f"DELETE FROM {table} WHERE ({', '.join(key)}) IN ({row_placeholders(len(key), len(chunk))})",
+                [value for row in chunk for value in row]
+            )
+            conn.commit()
+    finally:
+        cursor.close()
+
+def copy_table(source, target, table, key, scope, gym_id, chunk_size):
+    """Upsert the gym's rows of one table into the target in keyset chunks. Returns rows copied."""
+    names = columns(source, table)
+    key_positions = [names.index(column) for column in key]
+    updates = [column for column in names if column not in key] or [key[0]]
+    upsert = (
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+        f"ON DUPLICATE KEY UPDATE {', '.join(f'{column} = VALUES({column})' for column in updates)}"
+    )
+    select = f"SELECT {', '.join(names)} FROM {table} WHERE {scope}"
+    after = f" AND ({', '.join(key)}) > ({', '.join(['%s'] * len(key))})"
+    order = f" ORDER BY {', '.join(key)} LIMIT %s"
+
+    copied = 0
+    last = None
+    cursor = target.cursor()
+    try:
+        while True:
+            if last is None:
+                rows = fetch(source, select + order, (gym_id, chunk_size))
+            else:
+                rows = fetch(source, select + after + order, (gym_id, *last, chunk_size))
+            if not rows:
+                return copied
+            keys = [tuple(row[i] for i in key_positions) for row in rows]
+
+            # A row with the same key that is not the gym's means IDs overlap between shards
+            clashes = fetch(
+                target,
+                f"SELECT {', '.join(key)} FROM {table} "
+                f"WHERE ({', '.join(key)}) IN ({row_placeholders(len(key), len(keys))}) AND NOT ({scope})",
+                (*(value for row in keys for value in row), gym_id)
+            )
+            if clashes:
+                raise RebalanceError(
+                    f"{table} rows {clashes[:5]} already exist on the target for another gym; "
+                    "check auto_increment_offset on each shard"
+                )
+
+            cursor.executemany(upsert, rows)
+            target.commit()
+            copied += len(rows)
+            last = keys[-1]
+    finally:
+        cursor.close()
+
+def rebase_read_markers(source, target, gym_id, chunk_size):
+    """Carry the gym's broadcast read markers over to the target's Broadcast IDs."""
+    markers = [(read_at, member_id) for member_id, read_at in fetch(source, READ_MARKERS_QUERY, (gym_id,))]
+    cursor = target.cursor()
+    try:
+        for start in range(0, len(markers), chunk_size):
+            cursor.executemany(REBASE_READ_MARKER, markers[start:start + chunk_size])
+            target.commit()
+    finally:
+        cursor.close()
+    print(f"  BroadcastRead: {len(markers)} marker(s) rebased")
+
+def sync(source, target, gym_id, chunk_size):
+    """Make the target's copy of the gym match the source."""
+    for table, key, scope in reversed(TABLES):
+        stale = primary_keys(target, table, key, scope, gym_id) - primary_keys(source, table, key, scope, gym_id)
+        if stale:
+            delete_keys(target, table, key, stale, chunk_size)
+            print(f"  {table}: removed {len(stale)} row(s) deleted on the source")
+    for table, key, scope in TABLES:
+        started = time.perf_counter()
+        copied = copy_table(source, target, table, key, scope, gym_id, chunk_size)
+        print(f"  {table}: {copied} row(s) in {time.perf_counter() - started:.1f}s")
+    rebase_read_markers(source, target, gym_id, chunk_size)
+
+def delete_gym(conn, gym_id, chunk_size):
+    cursor = conn.cursor()
+    try:
+        for table, _, scope in reversed(TABLES):
+            deleted = 0
+            while True:
+                cursor.execute(f"DELETE FROM {table} WHERE {scope} LIMIT %s", (gym_id, chunk_size))
+                conn.commit()
+                if not cursor.rowcount:
+                    break
+                deleted += cursor.rowcount
+            print(f"  {table}: deleted {deleted} row(s)")
+    finally:
+        cursor.close()
+
+def set_directory(gym_id, shard, status):
+    """Upsert the gym's GymShard row on the default shard."""
+    conn = mysql.connector.connect(use_pure=db.USE_PURE, **db.SHARDS[db.DEFAULT_SHARD])
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO GymShard (Gym_ID, Shard, Status)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE Shard = VALUES(Shard), Status = VALUES(Status)
+        """, (gym_id, shard, status))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+def wait_for_directory(seconds):
+    print(f"Waiting {seconds:.0f}s for every process to re-read the shard directory...")
+    time.sleep(seconds)
+
+def rebalance(gym_id, target_shard, chunk_size, grace, check_only=False):
+    if target_shard not in db.SHARDS:
+        raise RebalanceError(f"Unknown shard {target_shard!r}; configured: {', '.join(db.SHARDS)}")
+    if not shard_router.load():
+        raise RebalanceError("Could not read the shard directory")
+    source_shard = shard_router.shard_for_gym(gym_id)
+    if source_shard == target_shard:
+        raise RebalanceError(f"Gym {gym_id} is already on shard {target_shard}")
+    if shard_router.is_frozen(gym_id):
+        print(f"Gym {gym_id} is frozen; resuming an interrupted move.")
+
+    source = connect(source_shard)
+    target = connect(target_shard)
+    try:
+        print(f"Moving gym {gym_id} from {source_shard} to {target_shard}")
+        print("Preflight...")
+        preflight(source, target, gym_id)
+        if check_only:
+            print("Preflight passed.")
+            return
+
+        print("Copying (online)...")
+        sync(source, target, gym_id, chunk_size)
+
+        set_directory(gym_id, source_shard, 'frozen')
+        wait_for_directory(CHECK_SECONDS + grace)
+
+        print("Final sync (writes frozen)...")
+        sync(source, target, gym_id, chunk_size)
+
+        set_directory(gym_id, target_shard, 'active')
+        wait_for_directory(CHECK_SECONDS + grace)
+
+        print(f"Deleting gym {gym_id} from {source_shard}...")
+        delete_gym(source, gym_id, chunk_size)
+
+        print("Reconciling GymStats...")
+        reconcile_gym_stats(source)
+        reconcile_gym_stats(target)
+        print(f"Gym {gym_id} now lives on {target_shard}.")
+    finally:
+        source.close()
+        target.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Move a gym to another database shard')
+    parser.add_argument('--gym-id', type=int, required=True)
+    parser.add_argument('--to', dest='target', required=True, help='target shard name from DB_SHARDS')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--grace', type=float, default=2.0,
+                        help='extra seconds to wait after each directory change for in-flight requests')
+    parser.add_argument('--check', action='store_true', help='run the preflight checks only')
+    args = parser.parse_args()
+
+    try:
+        rebalance(args.gym_id, args.target, args.chunk_size, args.grace, check_only=args.check)
+    except (RebalanceError, Error) as e:
+        raise SystemExit(f"Rebalance failed: {e}")
+
+if __name__ == '__main__':
+    main()
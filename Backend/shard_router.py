@@ -0,0 +1,189 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mysql.connector import Error
+import os
+from dotenv import load_dotenv
+
+import db
+
+load_dotenv()
+
+# How often the GymShard directory is re-read; a gym being moved is frozen
+# for writes within this long in every process
+CHECK_SECONDS = float(os.getenv('SHARD_DIRECTORY_CHECK_SECONDS', '5'))
+
+# Threads running one unit of work per shard for fan-out reads
+FAN_OUT_WORKERS = int(os.getenv('SHARD_FAN_OUT_WORKERS', '8'))
+
+DIRECTORY_QUERY = "SELECT Gym_ID, Shard, Status FROM GymShard"
+
+LOCATE_USER_QUERY = "SELECT User_ID FROM UserCredentials WHERE Email = %s AND Role = %s"
+
+# Home gym of a logged-in user, stored in the session for routing
+USER_GYM_QUERIES = {
+    'member': "SELECT Gym_ID FROM Member WHERE M_ID = %s",
+    'trainer': "SELECT Gym_ID FROM Trainer WHERE T_ID = %s"
+}
+
+class ShardRouter:
+    """Maps Gym_ID to the MySQL instance (shard) holding that gym's rows.
+
+    A gym's trainers, members, sessions and everything hanging off them
+    live on one shard, so per-member and per-trainer requests are served
+    entirely by the shard of the gym stored in the session. Gym and
+    MembershipType are loaded on every shard; Admin and the GymShard
+    directory live on the default shard, which also owns every gym the
+    directory does not list.
+
+    The directory is cached and re-read every CHECK_SECONDS. A gym marked
+    'frozen' (while shard_rebalance.py moves it) stays readable, but writes
+    are refused until the move completes. With a single shard configured
+    nothing is read and every gym routes to it.
+    """
+
+    def __init__(self):
+        self._gyms = {}  # Gym_ID -> (shard, status)
+        self._reload_lock = threading.Lock()
+        self._poller = None
+        self._stop = threading.Event()
+        self._executor = None
+        self.reloads = 0
+        self.fan_outs = 0
+        self.last_fan_out_ms = 0.0
+
+    @property
+    def enabled(self):
+        return len(db.SHARDS) > 1
+
+    @property
+    def shards(self):
+        return list(db.SHARDS)
+
+    def load(self):
+        """Read the GymShard directory from the default shard. Returns False if unreachable."""
+        conn = db.get_connection(db.DEFAULT_SHARD)
+        if not conn:
+            return False
+        try:
+            rows = db.query_all(conn, DIRECTORY_QUERY, dictionary=False)
+        except Error as e:
+            print(f"Error loading shard directory: {e}")
+            return False
+        finally:
+            conn.close()
+
+        gyms = {}
+        for gym_id, shard, status in rows:
+            if shard not in db.SHARDS:
+                print(f"Shard directory places gym {gym_id} on unknown shard {shard!r}; using {db.DEFAULT_SHARD}")
+                shard = db.DEFAULT_SHARD
+            gyms[gym_id] = (shard, status)
+        self._gyms = gyms
+        self.reloads += 1
+        return True
+
+    def start(self):
+        """Load the directory and keep it fresh. Returns False if the first load failed."""
+        if not self.enabled:
+            return True
+        self._executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix='shard-fan-out')
+        loaded = self.load()
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, name='shard-directory', daemon=True)
+            self._poller.start()
+        return loaded
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self):
+        while not self._stop.wait(CHECK_SECONDS):
+            with self._reload_lock:
+                self.load()
+
+    def shard_for_gym(self, gym_id):
+        """Shard holding a gym's rows; the default shard for None or unlisted gyms."""
+        entry = self._gyms.get(gym_id)
+        return entry[0] if entry else db.DEFAULT_SHARD
+
+    def is_frozen(self, gym_id):
+        """True while the gym is being moved between shards (reads only)."""
+        entry = self._gyms.get(gym_id)
+        return bool(entry) and entry[1] == 'frozen'
+
+    def gym_ids(self, shard):
+        """Gyms the directory places on a shard (the default shard also owns unlisted gyms)."""
+        return [gym_id for gym_id, (name, _) in self._gyms.items() if name == shard]
+
+    def fan_out(self, fn):
+        """Run fn(conn) on a pooled connection to every shard, in parallel.
+
+        Returns {shard: result} in configuration order. Raises Error if a
+        shard is unreachable, so callers fail the way a lost connection does.
+        """
+        started = time.perf_counter()
+
+        def run(shard):
+            conn = db.get_connection(shard)
+            if not conn:
+                raise Error(msg=f"Shard {shard} is unreachable")
+            try:
+                return fn(conn)
+            finally:
+                conn.close()
+
+        if self._executor is None:
+            results = {shard: run(shard) for shard in db.SHARDS}
+        else:
+            futures = {shard: self._executor.submit(run, shard) for shard in db.SHARDS}
+            results = {shard: future.result() for shard, future in futures.items()}
+        self.fan_outs += 1
+        self.last_fan_out_ms = (time.perf_counter() - started) * 1000
+        return results
+
+    def owned(self, results, key='Gym_ID'):
+        """Merge fan_out rows, keeping each row only from the shard that owns its gym.
+
+        While a gym is being moved its rows exist on both shards; this keeps
+        merged listings and totals from counting them twice.
+        """
+        return [row for shard, rows in results.items() for row in rows if self.shard_for_gym(row[key]) == shard]
+
+    def locate_user(self, email, role):
+        """Shard whose credentials table holds email for role, or None if no shard does."""
+        if not self.enabled or role == 'admin':
+            return db.DEFAULT_SHARD
+        found = self.fan_out(lambda conn: db.query_one(conn, LOCATE_USER_QUERY, (email, role), dictionary=False))
+        return next((shard for shard, row in found.items() if row), None)
+
+    def user_gym(self, conn, role, user_id):
+        """Home Gym_ID of a member or trainer (None for admins)."""
+        query = USER_GYM_QUERIES.get(role)
+        if query is None:
+            return None
+        row = db.query_one(conn, query, (user_id,), dictionary=False)
+        return row[0] if row else None
+
+    def metrics(self):
+        gyms = dict(self._gyms)
+        return {
+            'enabled': self.enabled,
+            'defaultShard': db.DEFAULT_SHARD,
+            'shards': {
+                shard: {
+                    'host': config['host'],
+                    'port': config.get('port', 3306),
+                    'database': config['database'],
+                    'gyms': sorted(gym_id for gym_id, (name, _) in gyms.items() if name == shard)
+                }
+                for shard, config in db.SHARDS.items()
+            },
+            'frozenGyms': sorted(gym_id for gym_id, (_, status) in gyms.items() if status == 'frozen'),
+            'directoryReloads': self.reloads,
+            'fanOuts': self.fan_outs,
+            'lastFanOutMs': round(self.last_fan_out_ms, 2)
+        }
+
+shard_router = ShardRouter()
@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import os
+from dotenv import load_dotenv
+
+from cold_archive import cold_archive
+
+load_dotenv()
+
+# Days of history kept as a bitmap per member; consistency and weekly figures
+# look back at most this far (53 weeks by default)
+WINDOW_DAYS = max(int(os.getenv('STREAK_WINDOW_DAYS', '371')), 64)
+
+# Workout days a week counted as meeting the weekly goal
+WEEKLY_GOAL_DAYS = int(os.getenv('STREAK_WEEKLY_GOAL_DAYS', '3'))
+
+# Members kept in memory; the least recently used are dropped beyond this
+MAX_MEMBERS = int(os.getenv('STREAK_MAX_MEMBERS', '100000'))
+
+# Windows of CalculateWorkoutConsistency and of the weekly goal history
+MONTH_DAYS = 30
+GOAL_HISTORY_WEEKS = 4
+
+_WINDOW_MASK = (1 << WINDOW_DAYS) - 1
+
+# Bookings are logged in WorkoutLog too but are not workouts
+MEMBER_DAYS_QUERY = """
+    SELECT DISTINCT Date
+    FROM WorkoutLog
+    WHERE M_ID = %s AND Exercise != 'Session Booking' AND Date IS NOT NULL
+"""
+
+def _ordinal(day):
+    return date.fromisoformat(str(day)[:10]).toordinal()
+
+def _trailing_ones(bits):
+    return (~bits & (bits + 1)).bit_length() - 1
+
+class _MemberDays:
+    """One member's workout days: a bitmap of the last WINDOW_DAYS days plus streak counters.
+
+    Bit i is set when the member worked out on day `end - i`. run and
+    longest cover the member's whole history, archive included.
+    """
+    __slots__ = ('bits', 'end', 'run', 'longest')
+
+    def __init__(self, days):
+        self.bits = 0
+        self.end = days[-1] if days else None
+        self.run = 0
+        self.longest = 0
+        previous = None
+        for day in days:
+            self.run = self.run + 1 if previous == day - 1 else 1
+            self.longest = max(self.longest, self.run)
+            previous = day
+            if self.end - day < WINDOW_DAYS:
+                self.bits |= 1 << (self.end - day)
+
+    def add(self, day):
+        """Mark a workout day. Returns False when the counters can no longer be kept exact."""
+        if self.end is None or day > self.end:
+            # The usual case, a workout today: shift the bitmap and extend the run
+            if self.end is None:
+                self.bits = 1
+                self.run = 1
+            else:
+                self.run = self.run + 1 if day == self.end + 1 else 1
+                self.bits = ((self.bits << (day - self.end)) | 1) & _WINDOW_MASK
+            self.end = day
+            self.longest = max(self.longest, self.run)
+            return True
+
+        offset = self.end - day
+        if offset >= WINDOW_DAYS:
+            return False
+        if self.bits >> offset & 1:
+            return True
+
+        # A backdated workout: it may join two runs, or the current one
+        self.bits |= 1 << offset
+        older = _trailing_ones(self.bits >> offset)
+        if offset + older >= WINDOW_DAYS:
+            # The joined run reaches past the bitmap
+            return False
+        newer = 0
+        while newer < offset and self.bits >> (offset - newer - 1) & 1:
+            newer += 1
+        length = older + newer
+        if newer == offset:
+            self.run = length
+        self.longest = max(self.longest, length)
+        return True
+
+    def count(self, first, last):
+        """Workout days between two day ordinals, inclusive."""
+        if self.end is None:
+            return 0
+        lo = max(self.end - last, 0)
+        hi = min(self.end - first, WINDOW_DAYS - 1)
+        if lo > hi:
+            return 0
+        return bin((self.bits >> lo) & ((1 << (hi - lo + 1)) - 1)).count('1')
+
+class StreakEngine:
+    """Per-member workout streaks and consistency, kept up to date incrementally.
+
+    A member's workout days are read once (live rows and the cold archive)
+    into a bitmap of the last WINDOW_DAYS days with current and longest
+    streak counters. After that, each workout the outbox reports sets one
+    bit and bumps the counters, and every figure on the dashboard and in the
+    recommendation rules is a shift and popcount over the bitmap, never a
+    WorkoutLog scan. Backdated workouts beyond the bitmap drop the member's
+    state so it is read again on next use.
+
+    State is per process; every process applies the outbox events itself.
+    """
+
+    def __init__(self, max_members=MAX_MEMBERS):
+        self._lock = threading.Lock()
+        self._members = OrderedDict()
+        self._loading = {}  # M_ID -> [loaders, days reported while loading]
+        self.max_members = max_members
+        self.loads = 0
+        self.hits = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.load_ms = 0.0
+
+    def _load_days(self, conn, member_id):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(MEMBER_DAYS_QUERY, (member_id,))
+            days = {row[0].toordinal() for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+        days.update(cold_archive.workout_days(member_id))
+        return sorted(days)
+
+    def _state(self, conn, member_id):
+        with self._lock:
+            state = self._members.get(member_id)
+            if state is not None:
+                self._members.move_to_end(member_id)
+                self.hits += 1
+                return state
+            loading = self._loading.setdefault(member_id, [0, []])
+            loading[0] += 1
+
+        started = time.perf_counter()
+        try:
+            days = self._load_days(conn, member_id)
+        except Exception:
+            with self._lock:
+                self._release(member_id, loading)
+            raise
+
+        with self._lock:
+            self._release(member_id, loading)
+            self.loads += 1
+            self.load_ms += (time.perf_counter() - started) * 1000
+            state = self._members.get(member_id)
+            if state is not None:
+                return state
+            state = _MemberDays(days)
+            # Workouts reported while the query ran may or may not be in its result
+            if all(state.add(day) for day in loading[1]):
+                self._members[member_id] = state
+                while len(self._members) > self.max_members:
+                    self._members.popitem(last=False)
+            return state
+
+    def _release(self, member_id, loading):
+        loading[0] -= 1
+        if not loading[0]:
+            self._loading.pop(member_id, None)
+
+    def record(self, member_id, day):
+        """Apply a logged workout (WORKOUT_LOGGED event) to a member's state, if loaded."""
+        try:
+            day = _ordinal(day)
+        except (TypeError, ValueError):
+            # Events without a date (older writers): read the member again
+            self.forget(member_id)
+            return
+        with self._lock:
+            self.recorded += 1
+            state = self._members.get(member_id)
+            if state is not None:
+                if not state.add(day):
+                    del self._members[member_id]
+                    self.dropped += 1
+            elif member_id in self._loading:
+                self._loading[member_id][1].append(day)
+
+    def forget(self, member_id):
+        """Drop a member's state (member deleted, or it can no longer be kept exact)."""
+        with self._lock:
+            if self._members.pop(member_id, None) is not None:
+                self.dropped += 1
+
+    def summary(self, conn, member_id, today=None):
+        """Streak, weekly goal and consistency figures for the member dashboard and recommendations."""
+        state = self._state(conn, member_id)
+        today = (today or date.today()).toordinal()
+        week_start = today - date.fromordinal(today).weekday()
+
+        with self._lock:
+            alive = state.end is not None and today - state.end <= 1
+            this_week = state.count(week_start, today)
+            goal_weeks = sum(
+                state.count(week_start - 7 * week, week_start - 7 * week + 6) >= WEEKLY_GOAL_DAYS
+                for week in range(1, GOAL_HISTORY_WEEKS + 1)
+            )
+            return {
+                # Alive while the member worked out today or yesterday
+                'currentStreak': state.run if alive else 0,
+                'longestStreak': state.longest,
+                'lastWorkoutDate': date.fromordinal(state.end).isoformat() if state.end else None,
+                'workedOutToday': state.end == today,
+                'activeDaysLast7': state.count(today - 6, today),
+                'weeklyGoal': WEEKLY_GOAL_DAYS,
+                'activeDaysThisWeek': this_week,
+                'weeklyGoalMet': this_week >= WEEKLY_GOAL_DAYS,
+                'weeklyGoalCompletion': round(goal_weeks * 100 / GOAL_HISTORY_WEEKS),
+                # CalculateWorkoutConsistency(M_ID, 30), counting workouts only
+                'consistencyPercent': round(state.count(today - MONTH_DAYS, today) * 100 / MONTH_DAYS, 2)
+            }
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'members': len(self._members),
+                'maxMembers': self.max_members,
+                'windowDays': WINDOW_DAYS,
+                'weeklyGoalDays': WEEKLY_GOAL_DAYS,
+                'loads': self.loads,
+                'hits': self.hits,
+                'workoutsRecorded': self.recorded,
+                'statesDropped': self.dropped,
+                'avgLoadMs': round(self.load_ms / self.loads, 3) if self.loads else None
+            }
+
+member_streaks = StreakEngine()
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_router import answer_question, classify_question
+
+def test_goal_question_goes_to_the_coach():
+    route = classify_question('I want to lose 5 kg, what is my plan?')
+    assert not route.local
+    assert route.reason == 'coaching'
+
+def test_plan_end_is_a_membership_lookup():
+    route = classify_question('When does my plan end?')
+    assert route.local
+    assert route.topics == ('membership',)
+
+@pytest.mark.parametrize('question', [
+    'How many steps did I walk last month?',
+    'How many workouts did I do in 2024?',
+    'What was my weight 3 months ago?',
+    'How many sessions did I attend last month?',
+    'How many workouts did I do on Mondays?',
+    'How many steps did I walk in the past two weeks?'
+])
+def test_periods_outside_the_stats_are_escalated(question):
+    route = classify_question(question)
+    assert not route.local
+    assert route.reason == 'period'
+
+def test_thirty_day_window_stays_local():
+    route = classify_question('How many workouts did I do in the last 30 days?')
+    assert route.local
+    assert route.topics == ('workouts',)
+
+def test_weight_lookup_stays_local():
+    route = classify_question('What is my current weight?')
+    assert route.local
+    assert route.topics == ('weight',)
+
+def test_streak_is_answered_from_the_streak_engine():
+    route = classify_question('What is my current workout streak?')
+    assert route.local
+    assert route.topics == ('streak',)
+    streaks = {'currentStreak': 4, 'longestStreak': 9}
+    response = answer_question(route, {}, {'consistencyPercent': 50.0}, streaks=streaks)
+    assert '4-day workout streak' in response
+    assert '9 days' in response
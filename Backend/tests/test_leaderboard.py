@@ -0,0 +1,36 @@
+import bisect
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard
+
+def test_ties_share_a_rank():
+    board = Leaderboard()
+    for member_id, score in ((1, 300.0), (2, 500.0), (3, 300.0), (4, 100.0)):
+        board.update(member_id, score)
+    assert board.rank(2) == 1
+    assert board.rank(1) == board.rank(3) == 2
+    assert board.rank(4) == 4
+    assert board.top(3) == [(1, 2, 500.0), (2, 1, 300.0), (2, 3, 300.0)]
+
+def test_matches_a_sorted_list_under_random_updates():
+    rng = random.Random(7)
+    board = Leaderboard()
+    scores = {}
+    for _ in range(2000):
+        member_id = rng.randint(1, 100)
+        if rng.random() < 0.8:
+            scores[member_id] = float(rng.randint(0, 30))
+            board.update(member_id, scores[member_id])
+        else:
+            scores.pop(member_id, None)
+            board.remove(member_id)
+
+    expected = sorted((-score, member_id) for member_id, score in scores.items())
+    assert len(board.entries) == len(expected)
+    assert [member_id for _, member_id, _ in board.top(len(expected))] == [member_id for _, member_id in expected]
+    for member_id, score in scores.items():
+        assert board.rank(member_id) == bisect.bisect_left(expected, (-score,)) + 1
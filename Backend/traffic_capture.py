@@ -0,0 +1,209 @@
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlsplit
+
+from dotenv import load_dotenv
+from werkzeug.exceptions import HTTPException
+
+load_dotenv()
+
+# Capture is on when a directory is set; each process writes its own file there
+CAPTURE_DIR = os.getenv('TRAFFIC_CAPTURE_DIR', '')
+
+# Fraction of requests recorded
+SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', '1'))
+
+# Key for user and entity pseudonyms. Give every process the same one to keep
+# pseudonyms consistent across their files; random (per process) by default.
+SALT = os.getenv('TRAFFIC_CAPTURE_SALT', '') or os.urandom(16).hex()
+
+# Records waiting for the writer; beyond this they are dropped, never waited on
+QUEUE_SIZE = 10000
+
+FORMAT_VERSION = 1
+
+# Values kept verbatim; every other string is reduced to its length
+PLAIN_KEYS = {'format', 'points', 'limit', 'offset', 'metric', 'specialization', 'min_spots',
+              'join_waitlist', 'role', 'type', 'mode', 'exercise', 'progress', 'route'}
+
+# Never recorded, not even their length
+DROPPED_KEYS = {'password', 'email', 'phone', 'name'}
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+def _is_id_key(key):
+    return key == 'id' or key.endswith('_id') or key.endswith('_to_delete')
+
+class TrafficCapture:
+    """Opt-in, anonymized record of the request mix served by this process.
+
+    One JSON array per line, after a header object:
+
+        [t_ms, method, route, role, user, args, query, body, status, duration_ms]
+
+    route is the URL rule ("/api/member/<int:member_id>/progress"), user a
+    pseudonym of the logged-in user. In args, query and body:
+    - IDs become {"id": "self"} when they are the caller's own and a keyed
+      pseudonym {"id": "3fa2c1d0"} otherwise;
+    - dates become {"d": days from the request};
+    - free-text strings become {"s": length};
+    - credentials and contact details are left out.
+
+    Batched GETs are recorded once, under /api/batch, with their
+    sub-requests anonymized the same way. Benchmarks/traffic_replay.py
+    replays the files. Records go through a bounded queue to a writer
+    thread, so a slow disk drops records instead of slowing requests.
+    """
+
+    def __init__(self, directory=CAPTURE_DIR, sample_rate=SAMPLE_RATE):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.enabled = bool(directory)
+        self.path = None
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = None
+        self._started = time.time()
+        self._counter = 0
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"capture-{int(self._started)}-{os.getpid()}.ndjson")
+        self._thread = threading.Thread(target=self._write_loop, name='traffic-capture', daemon=True)
+        self._thread.start()
+
+    def sampled(self):
+        """Deterministic 1-in-N sampling, so a capture's mix does not depend on chance."""
+        if not self.enabled:
+            return False
+        if self.sample_rate >= 1:
+            return True
+        with self._lock:
+            self._counter += 1
+            return int(self._counter * self.sample_rate) != int((self._counter - 1) * self.sample_rate)
+
+    # --- Anonymization ---
+
+    def _pseudonym(self, kind, value):
+        digest = hmac.new(SALT.encode(), f"{kind}:{value}".encode(), hashlib.sha256)
+        return digest.hexdigest()[:8]
+
+    def _scrub(self, key, value, user_id, today):
+        if value is None or isinstance(value, bool):
+            return value
+        if _is_id_key(key):
+            if str(value) == str(user_id):
+                return {'id': 'self'}
+            return {'id': self._pseudonym(key, value)}
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, dict):
+            return {k: self._scrub(k, v, user_id, today) for k, v in value.items() if k not in DROPPED_KEYS}
+        if isinstance(value, list):
+            return [self._scrub(key, item, user_id, today) for item in value]
+        value = str(value)
+        if DATE_PATTERN.match(value):
+            try:
+                return {'d': (date.fromisoformat(value) - today).days}
+            except ValueError:
+                return {'s': len(value)}
+        if key in PLAIN_KEYS and len(value) <= 40:
+            return value
+        return {'s': len(value)}
+
+    def _fields(self, mapping, user_id, today):
+        return {key: self._scrub(key, value, user_id, today)
+                for key, value in mapping.items() if key not in DROPPED_KEYS}
+
+    def _batch_body(self, body, url_map, user_id, today):
+        """Sub-requests of a batch as [route, args, query], matched against the app's rules."""
+        adapter = url_map.bind('localhost')
+        subrequests = []
+        for sub in (body or {}).get('requests') or []:
+            parts = urlsplit(sub.get('path', '')) if isinstance(sub, dict) else None
+            if parts is None:
+                continue
+            try:
+                rule, args = adapter.match(parts.path, method='GET', return_rule=True)
+            except HTTPException:
+                continue
+            subrequests.append([
+                rule.rule,
+                self._fields(args, user_id, today),
+                self._fields(dict(parse_qsl(parts.query)), user_id, today)
+            ])
+        return {'requests': subrequests}
+
+    # --- Recording ---
+
+    def record(self, request, session, status, duration):
+        """Queue one request; called after the response is built."""
+        if request.url_rule is None:
+            return
+        user_id = session.get('user_id')
+        today = datetime.now().date()
+        body = request.get_json(silent=True) if request.is_json else None
+        if request.url_rule.rule == '/api/batch':
+            body = self._batch_body(body, request.url_rule.map, user_id, today)
+        elif isinstance(body, dict):
+            body = self._fields(body, user_id, today)
+        else:
+            body = None
+
+        line = [
+            round((time.time() - self._started) * 1000),
+            request.method,
+            request.url_rule.rule,
+            session.get('user_role'),
+            self._pseudonym('user', user_id) if user_id is not None else None,
+            self._fields(request.view_args or {}, user_id, today),
+            self._fields(request.args.to_dict(), user_id, today),
+            body,
+            status,
+            round(duration * 1000, 2)
+        ]
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _write_loop(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'version': FORMAT_VERSION, 'started': self._started, 'pid': os.getpid()}) + '\n')
+            f.flush()
+            while True:
+                lines = [self._queue.get()]
+                while True:
+                    try:
+                        lines.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                f.write(''.join(json.dumps(line, separators=(',', ':')) + '\n' for line in lines))
+                f.flush()
+                with self._lock:
+                    self.recorded += len(lines)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'path': self.path,
+                'sampleRate': self.sample_rate,
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'queued': self._queue.qsize()
+            }
+
+traffic_capture = TrafficCapture()
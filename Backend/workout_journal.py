@@ -0,0 +1,316 @@
+import atexit
+import json
+import socket
+import threading
+import time
+from datetime import date
+
+from mysql.connector import Error, errorcode
+import os
+from dotenv import load_dotenv
+
+import db
+from notifications import add_notifications
+
+load_dotenv()
+
+# Write-behind mode is opt-in. Each process needs its own journal file and
+# source name, since sequence IDs are only unique per journal.
+WRITE_BEHIND_ENABLED = os.getenv('WORKOUT_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+# Holds acknowledged but unflushed workouts, so it lives under GYMFIT_DATA_DIR
+# (data/ at the project root, gitignored) where a checkout cannot touch it
+DATA_DIR = os.getenv('GYMFIT_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+JOURNAL_PATH = os.getenv('WORKOUT_JOURNAL_PATH', os.path.join(DATA_DIR, 'workout_journal.log'))
+JOURNAL_SOURCE = os.getenv('WORKOUT_JOURNAL_SOURCE', socket.gethostname())[:64]
+FLUSH_INTERVAL_MS = int(os.getenv('WORKOUT_FLUSH_INTERVAL_MS', '5'))
+FLUSH_MAX_ROWS = int(os.getenv('WORKOUT_FLUSH_MAX_ROWS', '200'))
+RETRY_SECONDS = 1.0
+
+INSERT_SQL = """
+    INSERT INTO WorkoutLog (M_ID, Exercise, Date, Duration, CaloriesBurnt, Distance, Progress,
+                            JournalSource, JournalSeq)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def validate_workout(workout_date, duration, calories=None, distance=None):
+    """Apply the ValidateWorkoutData trigger rules before a workout is journaled.
+
+    Returns an error message, or None if the workout is valid. Checking up
+    front keeps most rejections synchronous in write-behind mode.
+    """
+    try:
+        duration = float(duration) if duration is not None else None
+        calories = float(calories) if calories is not None else None
+        distance = float(distance) if distance is not None else None
+    except (TypeError, ValueError):
+        return 'Duration, calories and distance must be numbers'
+    try:
+        workout_date = date.fromisoformat(str(workout_date)[:10])
+    except ValueError:
+        return 'Invalid workout date'
+
+    if duration is not None and not 5 <= duration <= 300:
+        return 'Workout duration must be between 5 and 300 minutes'
+    if calories is not None and not 0 <= calories <= 2000:
+        return 'Calories burnt must be between 0 and 2000'
+    if distance is not None and not 0 <= distance <= 50:
+        return 'Distance must be between 0 and 50 km'
+    if workout_date > date.today():
+        return 'Workout date cannot be in the future'
+    return None
+
+class WorkoutJournal:
+    """Append-only local journal with group-committed batch flushes to WorkoutLog.
+
+    append() writes the workout to the journal and fsyncs it (one fsync
+    covers every entry written while the previous one was in progress),
+    then returns its sequence ID. A flusher thread inserts pending entries
+    in sequence order with multi-row INSERTs, every FLUSH_INTERVAL_MS or
+    FLUSH_MAX_ROWS rows, one commit per batch. Rows carry (JournalSource,
+    JournalSeq), so replay after a crash skips entries already in MySQL.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, source=JOURNAL_SOURCE):
+        self.path = path
+        self.source = source
+        self.on_applied = None  # callback(conn, entries) inside each batch's transaction, before commit
+        self._append_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._file = None
+        self._thread = None
+        self._stopping = False
+        self._pending = []
+        self._next_seq = 1
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._flushed_seq = 0
+        self.batches = 0
+        self.rows_flushed = 0
+        self.rows_rejected = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- Recovery ---
+
+    def _read_journal(self):
+        entries = []
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Torn final line from a crash mid-write; it was never acknowledged
+                        break
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _db_max_seq(self):
+        conn = db.get_connection()
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(JournalSeq), 0) FROM WorkoutLog WHERE JournalSource = %s", (self.source,))
+            return cursor.fetchone()[0]
+        except Error as e:
+            print(f"Error reading workout journal position: {e}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def start(self):
+        """Replay unflushed journal entries and start the flusher. Returns False if MySQL is unavailable."""
+        db_max = self._db_max_seq()
+        if db_max is None:
+            return False
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        entries = self._read_journal()
+        replay = [entry for entry in entries if entry['seq'] > db_max]
+        last_seq = max([db_max] + [entry['seq'] for entry in entries])
+
+        # Rewrite the journal with only the entries still to be flushed
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for entry in replay:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, 'a')
+        self._pending = replay
+        self._next_seq = last_seq + 1
+        self._written_seq = self._synced_seq = last_seq
+        self._flushed_seq = db_max
+        if replay:
+            print(f"Replaying {len(replay)} journaled workout(s) from {self.path}")
+
+        self._thread = threading.Thread(target=self._run, name='workout-journal', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return True
+
+    # --- Accepting workouts ---
+
+    def append(self, member_id, data):
+        """Journal a workout durably and return its sequence ID."""
+        with self._append_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            entry = {
+                'seq': seq,
+                'member_id': member_id,
+                'exercise': data['exercise'],
+                'date': data['date'],
+                'duration': data['duration'],
+                'calories': data.get('calories'),
+                'distance': data.get('distance'),
+                'progress': data.get('progress')
+            }
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            self._written_seq = seq
+            with self._cond:
+                self._pending.append(entry)
+                # Wake the flusher when a batch starts or fills up
+                if len(self._pending) == 1 or len(self._pending) >= FLUSH_MAX_ROWS:
+                    self._cond.notify()
+
+        self._sync(seq)
+        return seq
+
+    def _sync(self, seq):
+        """fsync the journal up to seq; concurrent callers share one fsync."""
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            with self._append_lock:
+                target = self._written_seq
+            os.fsync(self._file.fileno())
+            self._synced_seq = target
+
+    # --- Flushing ---
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if len(self._pending) < FLUSH_MAX_ROWS and not self._stopping:
+                    # Let the batch fill for a few milliseconds
+                    self._cond.wait(FLUSH_INTERVAL_MS / 1000.0)
+                batch = self._pending[:FLUSH_MAX_ROWS]
+
+            if not self._flush(batch):
+                if self._stopping:
+                    return
+                time.sleep(RETRY_SECONDS)
+                continue
+
+            with self._cond:
+                del self._pending[:len(batch)]
+                self._flushed_seq = batch[-1]['seq']
+            self._compact()
+
+    def _row(self, entry):
+        return (
+            entry['member_id'], entry['exercise'], entry['date'], entry['duration'],
+            entry['calories'], entry['distance'], entry['progress'],
+            self.source, entry['seq']
+        )
+
+    def _flush(self, batch):
+        """Insert one batch in a single transaction. Returns False to retry later."""
+        conn = db.get_connection()
+        if not conn:
+            return False
+        cursor = conn.cursor()
+        try:
+            rejected = []
+            try:
+                # executemany rewrites this into one multi-row INSERT
+                cursor.executemany(INSERT_SQL, [self._row(entry) for entry in batch])
+                applied = batch
+            except Error as e:
+                if e.errno is not None and e.errno >= 2000:
+                    raise
+                # A row failed validation or was already applied before a crash;
+                # retry row by row so the rest of the batch still lands
+                conn.rollback()
+                applied = []
+                for entry in batch:
+                    try:
+                        cursor.execute(INSERT_SQL, self._row(entry))
+                        applied.append(entry)
+                    except Error as row_error:
+                        if row_error.errno is not None and row_error.errno >= 2000:
+                            raise
+                        if row_error.errno != errorcode.ER_DUP_ENTRY:
+                            rejected.append((entry, row_error.msg))
+
+            # Members deleted since their workout was accepted are skipped
+            add_notifications(cursor, [
+                (entry['member_id'], f"Your {entry['exercise']} workout on {entry['date']} could not be saved: {reason}", 'system')
+                for entry, reason in rejected
+            ])
+            if self.on_applied and applied:
+                self.on_applied(conn, applied)
+            conn.commit()
+
+            self.batches += 1
+            self.rows_flushed += len(applied)
+            self.rows_rejected += len(rejected)
+            return True
+        except Error as e:
+            print(f"Error flushing workout journal: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _compact(self):
+        """Truncate the journal once every written entry is in MySQL."""
+        with self._sync_lock, self._append_lock:
+            with self._cond:
+                if self._flushed_seq != self._written_seq:
+                    return
+            self._file.seek(0)
+            self._file.truncate()
+            os.fsync(self._file.fileno())
+
+    def stop(self):
+        """Flush what is pending and stop the flusher thread."""
+        if not self.running:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+
+    def metrics(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            'enabled': self.running,
+            'source': self.source,
+            'pending': pending,
+            'writtenSeq': self._written_seq,
+            'flushedSeq': self._flushed_seq,
+            'batches': self.batches,
+            'rowsFlushed': self.rows_flushed,
+            'rowsRejected': self.rows_rejected,
+            'avgBatchRows': round(self.rows_flushed / self.batches, 1) if self.batches else 0.0
+        }
+
+workout_journal = WorkoutJournal()
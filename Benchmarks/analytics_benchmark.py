@@ -0,0 +1,162 @@
+"""
+Member analytics benchmark: per-row SQL functions vs one grouped pass.
+
+Seeds --members benchmark members in one gym, each with --days of workouts
+and health metrics, then times three ways of getting every member's BMI,
+30-day calories, consistency, average duration, weight change, average
+steps and days until expiry:
+  per-row  - SELECT CalculateMemberBMI(M_ID), GetTotalCaloriesBurned(M_ID, 30), ...
+             FROM Member (the documented usage of functions_code.sql)
+  grouped  - MemberAnalytics grouped pass with an empty cache
+  cached   - the same call once the day's results are cached
+
+The single-member case (the member analytics endpoint) is timed the same
+way. The grouped results are checked against the functions before timing.
+The benchmark members are removed afterwards.
+
+Usage:
+    python Benchmarks/analytics_benchmark.py --members 500 --days 90 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import mysql.connector
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+EMAIL_DOMAIN = 'analytics-bench.local'
+
+PER_ROW_SQL = """
+    SELECT M_ID,
+           CalculateMemberBMI(M_ID) AS BMI,
+           GetTotalCaloriesBurned(M_ID, 30) AS Calories,
+           CalculateWorkoutConsistency(M_ID, 30) AS Consistency,
+           GetAvgWorkoutDuration(M_ID, 30) AS AvgDuration,
+           CalculateWeightChange(M_ID, 30) AS WeightChange,
+           GetAvgDailySteps(M_ID, 7) AS AvgSteps,
+           CheckMembershipExpiry(M_ID) AS DaysUntilExpiry
+    FROM Member
+    WHERE {scope}
+    ORDER BY M_ID
+"""
+
+# (function result column, MemberAnalytics key)
+COMPARED = (
+    ('BMI', 'bmi'), ('Calories', 'caloriesLast30Days'), ('Consistency', 'consistencyPercent'),
+    ('AvgDuration', 'avgWorkoutDuration'), ('WeightChange', 'weightChange30Days'),
+    ('AvgSteps', 'avgDailySteps'), ('DaysUntilExpiry', 'daysUntilExpiry')
+)
+
+def seed(conn, gym_id, members, days):
+    """Insert benchmark members with workout and health history. Returns their IDs."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Member WHERE Email LIKE %s", (f'%@{EMAIL_DOMAIN}',))
+    cursor.executemany("""
+        INSERT INTO Member (Name, Email, Password, Age, JoinDate, MembershipType_ID, Gym_ID)
+        VALUES (%s, %s, 'x', 30, DATE_SUB(CURDATE(), INTERVAL %s DAY), %s, %s)
+    """, [(f'Analytics Bench {i}', f'bench{i}@{EMAIL_DOMAIN}', 30 + i % 300, 1 + i % 3, gym_id)
+          for i in range(members)])
+    cursor.execute("SELECT M_ID FROM Member WHERE Email LIKE %s ORDER BY M_ID", (f'%@{EMAIL_DOMAIN}',))
+    member_ids = [row[0] for row in cursor.fetchall()]
+    for member_id in member_ids:
+        # Roughly two workouts in three days, a weigh-in most days
+        cursor.executemany("""
+            INSERT INTO WorkoutLog (M_ID, Exercise, Date, Duration, CaloriesBurnt, Distance, Progress)
+            VALUES (%s, 'Running', DATE_SUB(CURDATE(), INTERVAL %s DAY), %s, %s, 5.0, 'Completed')
+        """, [(member_id, day, 30 + (member_id + day) % 40, 200 + (member_id * day) % 300)
+              for day in range(days) if (member_id + day) % 3])
+        cursor.executemany("""
+            INSERT INTO HealthMetrics (M_ID, Weight, Height, SleepHours, WaterLiters, Steps, Date)
+            VALUES (%s, %s, %s, 7, 2.5, %s, DATE_SUB(CURDATE(), INTERVAL %s DAY))
+        """, [(member_id, 70 + member_id % 20 + day * 0.02, 160 + member_id % 30, 6000 + (member_id * day) % 5000, day)
+              for day in range(days) if (member_id + day) % 4])
+    conn.commit()
+    cursor.close()
+    return member_ids
+
+def teardown(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Member WHERE Email LIKE %s", (f'%@{EMAIL_DOMAIN}',))
+    conn.commit()
+    cursor.close()
+
+def per_row(conn, scope, params):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(PER_ROW_SQL.format(scope=scope), params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def check(rows, analytics):
+    """Count values that differ between the functions and the grouped pass."""
+    mismatches = 0
+    for row in rows:
+        result = analytics.get(row['M_ID'])
+        for column, key in COMPARED:
+            expected = float(row[column]) if row[column] is not None else None
+            actual = result[key] if result else None
+            if expected != actual and (expected is None or actual is None or abs(expected - actual) > 0.01):
+                mismatches += 1
+    return mismatches
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-row SQL functions vs grouped member analytics')
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--gym-id', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from member_analytics import MemberAnalytics
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        member_ids = seed(conn, args.gym_id, args.members, args.days)
+        gym_scope = ('Gym_ID = %s', (args.gym_id,))
+        member_scope = ('M_ID = %s', (member_ids[0],))
+
+        gym_rows = per_row(conn, *gym_scope)
+        analytics = {row['memberId']: row for row in MemberAnalytics().get_gym(conn, args.gym_id)}
+        print(f"gym {args.gym_id}: {len(gym_rows)} members, {check(gym_rows, analytics)} mismatched values")
+
+        cache = MemberAnalytics()
+        cache.get_gym(conn, args.gym_id)
+        for name, scope, grouped, cached in (
+            (f'gym ({len(gym_rows)} members)', gym_scope,
+             lambda: MemberAnalytics().get_gym(conn, args.gym_id),
+             lambda: cache.get_gym(conn, args.gym_id)),
+            ('single member', member_scope,
+             lambda: MemberAnalytics().get_member(conn, member_ids[0]),
+             lambda: cache.get_member(conn, member_ids[0]))
+        ):
+            per_row_ms = timed(lambda: per_row(conn, *scope), args.repeat)
+            grouped_ms = timed(grouped, args.repeat)
+            cached_ms = timed(cached, args.repeat)
+            print(f"{name}:")
+            print(f"  per-row functions : {per_row_ms:10.2f} ms")
+            print(f"  grouped pass      : {grouped_ms:10.2f} ms  ({per_row_ms / grouped_ms:.1f}x)")
+            print(f"  cached            : {cached_ms:10.3f} ms  ({per_row_ms / cached_ms:.0f}x)")
+    finally:
+        teardown(conn)
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Serving-path benchmark: threaded Flask vs the asyncio (ASGI) app.
+
+Starts each server in its own process (Flask's threaded server running
+app.py, uvicorn running asgi_app.py), logs in a Gold benchmark member and
+drives the member dashboard, progress, session browse and chat endpoints
+with many concurrent clients. OpenAI is replaced by a local stub that
+answers after --llm-latency-ms, so chat measures how each path copes with
+a slow upstream rather than real model latency.
+
+Admission limits are raised for the run so both paths are measured on
+serving capacity; pass --keep-admission to benchmark with the configured
+limits (shed requests show up as 429/503 in the status counts).
+
+Usage:
+    python Benchmarks/async_benchmark.py --concurrency 50,200,500 --seconds 15 --llm-latency-ms 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mysql.connector
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+BENCH_EMAIL = 'async@async-bench.local'
+BENCH_PASSWORD = 'async-bench-password'
+GOLD_TYPE_ID = 1
+
+def setup():
+    """Create a Gold benchmark member with some history. Returns its M_ID."""
+    from werkzeug.security import generate_password_hash
+    import auth
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Member WHERE Email = %s", (BENCH_EMAIL,))
+    cursor.execute("""
+        INSERT INTO Member (Name, Email, Password, Age, JoinDate, MembershipType_ID, Gym_ID)
+        VALUES ('Async Bench', %s, %s, 30, DATE_SUB(CURDATE(), INTERVAL 90 DAY), %s, 1)
+    """, (BENCH_EMAIL, generate_password_hash(BENCH_PASSWORD, auth.PASSWORD_HASH_METHOD), GOLD_TYPE_ID))
+    member_id = cursor.lastrowid
+    cursor.executemany("""
+        INSERT INTO WorkoutLog (M_ID, Exercise, Date, Duration, CaloriesBurnt, Distance, Progress)
+        VALUES (%s, 'Running', DATE_SUB(CURDATE(), INTERVAL %s DAY), 40, 350, 5.0, 'Completed')
+    """, [(member_id, day) for day in range(60)])
+    cursor.executemany("""
+        INSERT INTO HealthMetrics (M_ID, Weight, Height, SleepHours, WaterLiters, Steps, Date)
+        VALUES (%s, %s, 175, 7, 2.5, 9000, DATE_SUB(CURDATE(), INTERVAL %s DAY))
+    """, [(member_id, 80 - day * 0.05, day) for day in range(60)])
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return member_id
+
+def teardown():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Member WHERE Email = %s", (BENCH_EMAIL,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+# --- OpenAI stub ---
+
+def start_llm_stub(latency_ms):
+    """Serve /v1/chat/completions with a canned answer after a fixed delay."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency_ms / 1000.0)
+            body = json.dumps({
+                'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': 'gpt-4o-mini',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': 'Keep up the good work!'}}],
+                'usage': {'prompt_tokens': 500, 'completion_tokens': 6, 'total_tokens': 506}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- Servers ---
+
+def serve(mode, port):
+    if mode == 'flask':
+        from werkzeug.serving import run_simple
+        from app import app
+        run_simple('127.0.0.1', port, app, threaded=True)
+    else:
+        import uvicorn
+        import asgi_app
+        uvicorn.run(asgi_app.app, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+def start_server(mode, port, env):
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+def login(port):
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{port}/api/login',
+        data=json.dumps({'email': BENCH_EMAIL, 'password': BENCH_PASSWORD, 'role': 'member'}).encode(),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.headers['Set-Cookie'].split(';', 1)[0]
+
+# --- Load generator ---
+
+async def fetch(port, method, path, cookie, body=None):
+    """One HTTP/1.1 request on a fresh connection; returns the status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nCookie: {cookie}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                  f"Connection: close\r\n\r\n").encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+async def drive(port, cookie, requests, concurrency, seconds):
+    latencies = {name: [] for name, _, _, _ in requests}
+    statuses = {}
+    deadline = time.perf_counter() + seconds
+
+    async def client(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            name, method, path, body = requests[i % len(requests)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, method, path, cookie, body)
+            except (OSError, IndexError, ValueError):
+                status = 'error'
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+def run(args):
+    member_id = setup()
+    stub = start_llm_stub(args.llm_latency_ms)
+    env = dict(os.environ,
+               OPENAI_BASE_URL=f'http://127.0.0.1:{stub.server_address[1]}/v1',
+               OPENAI_API_KEY='bench')
+    if not args.keep_admission:
+        for name in ('AUTH', 'BOOKING', 'DASHBOARD', 'CHAT', 'ADMIN'):
+            env[f'ADMISSION_{name}'] = '100000,100000,60000'
+
+    endpoints = {
+        'dashboard': ('GET', f'/api/dashboard/member/{member_id}', None),
+        'progress': ('GET', f'/api/member/{member_id}/progress?format=columnar&points=200', None),
+        'sessions': ('GET', '/api/sessions/available?limit=20', None),
+        'chat': ('POST', f'/api/member/{member_id}/chat', {'question': 'How am I doing this month?'})
+    }
+    requests = [(name,) + endpoints[name] for name in args.endpoints.split(',')]
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    try:
+        for mode in args.servers.split(','):
+            port = free_port()
+            server = start_server(mode, port, env)
+            try:
+                cookie = login(port)
+                for concurrency in levels:
+                    latencies, statuses, elapsed = asyncio.run(drive(port, cookie, requests, concurrency, args.seconds))
+                    ok = sum(len(values) for values in latencies.values())
+                    print(f"[{mode}] concurrency={concurrency} seconds={args.seconds}")
+                    print(f"  responses by status : {dict(sorted(statuses.items(), key=str))}")
+                    print(f"  successful req/sec  : {ok / elapsed:.1f}")
+                    for name, values in latencies.items():
+                        print(f"  {name:<10} p50 {percentile(values, 0.5) * 1000:8.1f} ms  "
+                              f"p99 {percentile(values, 0.99) * 1000:8.1f} ms  ({len(values)} ok)")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stub.shutdown()
+        teardown()
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded Flask vs asyncio serving benchmark')
+    parser.add_argument('--concurrency', default='50,200,500', help='comma-separated client counts')
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--endpoints', default='dashboard,progress,sessions,chat')
+    parser.add_argument('--servers', default='flask,asgi')
+    parser.add_argument('--llm-latency-ms', type=int, default=800)
+    parser.add_argument('--keep-admission', action='store_true')
+    parser.add_argument('--serve', choices=['flask', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Concurrency benchmark for the session booking path.
+
+Creates a throwaway session and benchmark members, then lets N simultaneous
+clients (one thread and one connection each) try to book the same session.
+Compares the atomic single-statement reservation in Backend/booking.py with
+the previous read-count / check-duplicate / insert sequence.
+
+MySQL must accept one connection per client, e.g. for 1,000 clients:
+    SET GLOBAL max_connections = 1100;
+
+Usage:
+    python Benchmarks/booking_benchmark.py --clients 1000 --capacity 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+import booking  # noqa: E402
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+BENCH_EMAIL_DOMAIN = '@booking-bench.local'
+
+def setup(clients, capacity, trainer_id):
+    """Create benchmark members and a fresh session. Returns (session_id, member_ids)."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO Member (Name, Email, Password, Age, JoinDate, MembershipType_ID, Gym_ID)
+        VALUES (%s, %s, 'bench', 30, CURDATE(), 1, 1)
+    """, [(f'Bench Member {i}', f'bench{i}{BENCH_EMAIL_DOMAIN}') for i in range(clients)])
+    cursor.execute("""
+        INSERT INTO Session (Details, SessionDate, SessionTime, Duration, T_ID, MaxParticipants)
+        VALUES ('Booking Benchmark', %s, '06:00:00', 60, %s, %s)
+    """, (date.today() + timedelta(days=1), trainer_id, capacity))
+    session_id = cursor.lastrowid
+    cursor.execute("SELECT M_ID FROM Member WHERE Email LIKE %s ORDER BY M_ID", (f'%{BENCH_EMAIL_DOMAIN}',))
+    member_ids = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return session_id, member_ids
+
+def teardown(session_id):
+    """Remove the benchmark session and members (bookings cascade)."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Session WHERE S_ID = %s", (session_id,))
+    cursor.execute("DELETE FROM Member WHERE Email LIKE %s", (f'%{BENCH_EMAIL_DOMAIN}',))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def book_atomic(conn, cursor, member_id, session_id):
+    outcome, _ = booking.reserve_seat(conn, member_id, session_id)
+    return outcome == booking.BOOKED
+
+def book_legacy(conn, cursor, member_id, session_id):
+    """The pre-engine booking sequence: three statements, no locking."""
+    cursor.execute("""
+        SELECT Details, SessionDate, Duration, MaxParticipants,
+               (SELECT COUNT(*) FROM WorkoutLog WHERE S_ID = %s AND Exercise = 'Session Booking') as currentParticipants
+        FROM Session WHERE S_ID = %s
+    """, (session_id, session_id))
+    _, session_date, duration, max_participants, current = cursor.fetchone()
+    if current >= max_participants:
+        return False
+    cursor.execute("SELECT L_ID FROM WorkoutLog WHERE M_ID = %s AND S_ID = %s AND Exercise = 'Session Booking'", (member_id, session_id))
+    if cursor.fetchone():
+        return False
+    try:
+        cursor.execute("""
+            INSERT INTO WorkoutLog (M_ID, S_ID, Exercise, Date, Duration, Progress)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (member_id, session_id, 'Session Booking', session_date, duration, 'Booked'))
+    except Error:
+        return False
+    return True
+
+def run(mode, clients, capacity, trainer_id):
+    session_id, member_ids = setup(clients, capacity, trainer_id)
+    book = book_atomic if mode == 'atomic' else book_legacy
+
+    connections = [mysql.connector.connect(**DB_CONFIG) for _ in member_ids]
+    barrier = threading.Barrier(len(member_ids) + 1)
+    latencies = [None] * len(member_ids)
+    successes = [False] * len(member_ids)
+
+    def client(index):
+        conn = connections[index]
+        cursor = conn.cursor()
+        barrier.wait()
+        started = time.perf_counter()
+        try:
+            successes[index] = book(conn, cursor, member_ids[index], session_id)
+            conn.commit()
+        except Error:
+            conn.rollback()
+        latencies[index] = time.perf_counter() - started
+        cursor.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(member_ids))]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    for conn in connections:
+        conn.close()
+
+    check = mysql.connector.connect(**DB_CONFIG)
+    cursor = check.cursor()
+    cursor.execute("SELECT COUNT(*) FROM WorkoutLog WHERE S_ID = %s AND Exercise = 'Session Booking'", (session_id,))
+    booked_rows = cursor.fetchone()[0]
+    cursor.close()
+    check.close()
+    teardown(session_id)
+
+    booked = sum(successes)
+    ordered = sorted(latencies)
+    print(f"[{mode}] clients={clients} capacity={capacity}")
+    print(f"  successful bookings : {booked} ({booked_rows} rows, overbooked={booked_rows > capacity})")
+    print(f"  wall time           : {elapsed:.3f} s")
+    print(f"  bookings/sec        : {booked / elapsed:.1f}")
+    print(f"  latency p50 / p99   : {ordered[len(ordered) // 2] * 1000:.1f} ms / {ordered[int(len(ordered) * 0.99) - 1] * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Session booking concurrency benchmark')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--capacity', type=int, default=200)
+    parser.add_argument('--trainer-id', type=int, default=1)
+    parser.add_argument('--mode', choices=['atomic', 'legacy', 'both'], default='both')
+    args = parser.parse_args()
+
+    modes = ['legacy', 'atomic'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        run(mode, args.clients, args.capacity, args.trainer_id)
+
+if __name__ == '__main__':
+    main()
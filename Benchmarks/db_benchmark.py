@@ -0,0 +1,135 @@
+"""
+Micro-benchmark for the database access path.
+
+Compares, per driver (pure Python / C extension):
+  legacy   - new connection per request, text protocol, dictionary cursor
+             (the previous get_db_connection() path)
+  pooled   - pooled connection, text protocol, dictionary cursor
+  prepared - pooled connection, cached server-side prepared statements
+             (Backend/db.py)
+
+A "request" is the five member-dashboard queries. Row throughput is
+measured separately with one large WorkoutLog read; import a bigger data
+set first (Backend/mysql_operations.py) for meaningful rows/sec numbers.
+
+Usage:
+    python Benchmarks/db_benchmark.py --requests 2000 --member-id 1 --rows 20000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import mysql.connector
+from mysql.connector import HAVE_CEXT
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+
+load_dotenv()
+
+ROWS_QUERY = """
+    SELECT L_ID, M_ID, Exercise, Date, Duration, CaloriesBurnt, Distance
+    FROM WorkoutLog
+    ORDER BY L_ID
+    LIMIT %s
+"""
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run_single(requests, member_id, rows):
+    import db
+    import app as gymfit_app
+
+    queries = [
+        gymfit_app.MEMBER_INFO_QUERY, gymfit_app.TODAY_STATS_QUERY, gymfit_app.TODAY_HEALTH_QUERY,
+        gymfit_app.RECENT_WORKOUTS_QUERY, gymfit_app.UPCOMING_SESSIONS_QUERY
+    ]
+
+    def legacy_request():
+        conn = mysql.connector.connect(use_pure=db.USE_PURE, **db.DB_CONFIG)
+        cursor = conn.cursor(dictionary=True)
+        for query in queries:
+            cursor.execute(query, (member_id,))
+            cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+    def pooled_request():
+        conn = db.get_connection()
+        cursor = conn.cursor(dictionary=True)
+        for query in queries:
+            cursor.execute(query, (member_id,))
+            cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+    def prepared_request():
+        conn = db.get_connection()
+        for query in queries:
+            db.query_all(conn, query, (member_id,))
+        conn.close()
+
+    driver = 'pure Python' if db.USE_PURE else 'C extension'
+    print(f"[{driver}] {requests} requests x {len(queries)} queries, member {member_id}")
+    for name, request in (('legacy', legacy_request), ('pooled', pooled_request), ('prepared', prepared_request)):
+        request()  # warm up: pool creation, statement preparation
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            request()
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        per_query_us = elapsed / (requests * len(queries)) * 1e6
+        print(f"  {name:<9} {requests / elapsed:8.1f} req/s  {per_query_us:8.1f} us/query  "
+              f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms  p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+    conn = db.get_connection()
+    for name, fetch in (
+        ('text dict', lambda: _text_rows(conn, rows)),
+        ('prepared tuple', lambda: db.query_all(conn, ROWS_QUERY, (rows,), dictionary=False)),
+        ('prepared dict', lambda: db.query_all(conn, ROWS_QUERY, (rows,)))
+    ):
+        fetch()
+        started = time.perf_counter()
+        fetched = len(fetch())
+        elapsed = time.perf_counter() - started
+        print(f"  rows: {name:<15} {fetched} rows  {fetched / elapsed:10.0f} rows/s")
+    conn.close()
+
+def _text_rows(conn, rows):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(ROWS_QUERY, (rows,))
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Database access path micro-benchmark')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--member-id', type=int, default=1)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--driver', choices=['pure', 'cext', 'both'], default='both')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.requests, args.member_id, args.rows)
+        return
+
+    drivers = ['pure', 'cext'] if args.driver == 'both' else [args.driver]
+    if 'cext' in drivers and not HAVE_CEXT:
+        print("C extension not available; benchmarking the pure Python driver only.")
+        drivers = ['pure']
+    for driver in drivers:
+        env = dict(os.environ, DB_USE_PURE='true' if driver == 'pure' else 'false')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--single',
+                        '--requests', str(args.requests), '--member-id', str(args.member_id),
+                        '--rows', str(args.rows)], env=env, check=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Login throughput benchmark.
+
+Runs a login storm against the Flask app in-process (one test client per
+thread) while a probe client keeps loading the member dashboard, and
+reports logins/sec together with the dashboard latency seen during the
+storm. Each KDF pool size runs in its own process because the pool is
+configured at import time; 0 verifies passwords inline on the request
+thread, as login() did before the bounded pool.
+
+Usage:
+    python Benchmarks/login_benchmark.py --threads 64 --seconds 20 --kdf-workers 0,4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import mysql.connector
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+BENCH_EMAIL = 'login@login-bench.local'
+BENCH_PASSWORD = 'login-bench-password'
+
+def setup():
+    """Create the benchmark member. Returns its M_ID."""
+    from werkzeug.security import generate_password_hash
+    import auth
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Member WHERE Email = %s", (BENCH_EMAIL,))
+    cursor.execute("""
+        INSERT INTO Member (Name, Email, Password, Age, JoinDate, MembershipType_ID, Gym_ID)
+        VALUES ('Login Bench', %s, %s, 30, CURDATE(), 1, 1)
+    """, (BENCH_EMAIL, generate_password_hash(BENCH_PASSWORD, auth.PASSWORD_HASH_METHOD)))
+    member_id = cursor.lastrowid
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return member_id
+
+def teardown():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Member WHERE Email = %s", (BENCH_EMAIL,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run_single(threads, seconds):
+    """Run one storm in this process with the KDF pool taken from the environment."""
+    import auth
+    from app import app
+
+    member_id = setup()
+    credentials = {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD, 'role': 'member'}
+    stop = threading.Event()
+    statuses = {}
+    status_lock = threading.Lock()
+    probe_latencies = []
+
+    def storm():
+        client = app.test_client()
+        while not stop.is_set():
+            status = client.post('/api/login', json=credentials).status_code
+            with status_lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    def probe():
+        client = app.test_client()
+        client.post('/api/login', json=credentials)
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get(f'/api/dashboard/member/{member_id}')
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    workers = [threading.Thread(target=storm) for _ in range(threads)]
+    workers.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    teardown()
+
+    ok = statuses.get(200, 0)
+    print(f"[kdf_workers={auth.KDF_WORKERS}] threads={threads} seconds={seconds}")
+    print(f"  responses by status   : {dict(sorted(statuses.items()))}")
+    print(f"  successful logins/sec : {ok / elapsed:.1f}")
+    print(f"  dashboard p50 / p99   : {percentile(probe_latencies, 0.5) * 1000:.1f} ms / {percentile(probe_latencies, 0.99) * 1000:.1f} ms ({len(probe_latencies)} probes)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput benchmark')
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--kdf-workers', default='0,4',
+                        help='comma-separated AUTH_KDF_WORKERS values to compare')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.threads, args.seconds)
+        return
+
+    for workers in args.kdf_workers.split(','):
+        env = dict(os.environ, AUTH_KDF_WORKERS=workers.strip())
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--single',
+                        '--threads', str(args.threads), '--seconds', str(args.seconds)],
+                       env=env, check=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Reference-data cache benchmark.
+
+Reports what the Gym / MembershipType / Trainer cache costs and saves:
+  startup  - time to load the three tables (ReferenceCache.load) and the
+             memory it holds (tracemalloc and the cache's own estimate)
+  member   - member info + upcoming sessions as the dashboard ran them
+             before (joins) and now (foreign keys + in-memory resolution)
+  members  - the admin member list, joined vs resolved, to show the effect
+             on a larger result set
+
+Usage:
+    python Benchmarks/reference_cache_benchmark.py --requests 2000 --member-id 1
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+
+load_dotenv()
+
+# The joined forms the hot queries used before the cache
+JOINED_MEMBER_INFO = """
+    SELECT m.M_ID, m.Name, m.Email, m.Age, m.JoinDate, mt.Name AS MembershipType, g.Location AS GymLocation
+    FROM Member m
+    LEFT JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+    LEFT JOIN Gym g ON m.Gym_ID = g.Gym_ID
+    WHERE m.M_ID = %s
+"""
+
+JOINED_UPCOMING_SESSIONS = """
+    SELECT s.S_ID, s.Details, s.SessionDate, s.SessionTime, t.Name AS TrainerName, wl.L_ID as BookingID
+    FROM WorkoutLog wl
+    JOIN Session s ON wl.S_ID = s.S_ID
+    JOIN Trainer t ON s.T_ID = t.T_ID
+    WHERE wl.M_ID = %s AND s.SessionDate >= CURDATE() AND wl.Exercise = 'Session Booking'
+    ORDER BY s.SessionDate, s.SessionTime
+    LIMIT 5
+"""
+
+JOINED_MEMBER_LIST = """
+    SELECT m.M_ID, m.Name, m.Email, m.JoinDate, mt.Name as MembershipType, g.Location as GymLocation
+    FROM Member m
+    LEFT JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+    LEFT JOIN Gym g ON m.Gym_ID = g.Gym_ID
+    ORDER BY m.JoinDate DESC
+"""
+
+PLAIN_MEMBER_LIST = """
+    SELECT M_ID, Name, Email, JoinDate, MembershipType_ID, Gym_ID
+    FROM Member
+    ORDER BY JoinDate DESC
+"""
+
+def timed(fn, requests):
+    fn()
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - started) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Reference-data cache benchmark')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--member-id', type=int, default=1)
+    parser.add_argument('--list-requests', type=int, default=100)
+    args = parser.parse_args()
+
+    import db
+    import app as gymfit_app
+    from reference_data import ReferenceCache, reference_data
+
+    # Startup cost and footprint of a fresh cache
+    cache = ReferenceCache()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    if not cache.load():
+        sys.exit("MySQL unreachable")
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    traced = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    load_ms = sum(timed(cache.load, 1) for _ in range(5)) / 5 / 1000
+    metrics = cache.metrics()
+    print(f"startup: {metrics['gyms']} gyms, {metrics['membershipTypes']} membership types, {metrics['trainers']} trainers")
+    print(f"  load time      : {load_ms:.2f} ms")
+    print(f"  memory         : {traced / 1024:.1f} KiB traced, {metrics['footprintBytes'] / 1024:.1f} KiB estimated")
+
+    conn = db.get_connection()
+    member_id = (args.member_id,)
+
+    def joined_member():
+        db.query_one(conn, JOINED_MEMBER_INFO, member_id)
+        db.query_all(conn, JOINED_UPCOMING_SESSIONS, member_id)
+
+    def resolved_member():
+        reference_data.resolve_member(db.query_one(conn, gymfit_app.MEMBER_INFO_QUERY, member_id))
+        sessions = db.query_all(conn, gymfit_app.UPCOMING_SESSIONS_QUERY, member_id)
+        reference_data.resolve(sessions, 'trainers', 'T_ID', {'Name': 'TrainerName'})
+
+    def joined_list():
+        db.query_all(conn, JOINED_MEMBER_LIST)
+
+    def resolved_list():
+        rows = db.query_all(conn, PLAIN_MEMBER_LIST)
+        reference_data.resolve(rows, 'membership_types', 'MembershipType_ID', {'Name': 'MembershipType'})
+        reference_data.resolve(rows, 'gyms', 'Gym_ID', {'Location': 'GymLocation'})
+
+    rows = len(db.query_all(conn, PLAIN_MEMBER_LIST))
+    for name, joined, resolved, requests in (
+        (f'member (id {args.member_id})', joined_member, resolved_member, args.requests),
+        (f'members ({rows} rows)', joined_list, resolved_list, args.list_requests)
+    ):
+        joined_us = timed(joined, requests)
+        resolved_us = timed(resolved, requests)
+        print(f"{name}:")
+        print(f"  joins          : {joined_us:10.1f} us/request")
+        print(f"  cache          : {resolved_us:10.1f} us/request  ({joined_us / resolved_us:.2f}x)")
+    conn.close()
+
+if __name__ == '__main__':
+    main()
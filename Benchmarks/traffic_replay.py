@@ -0,0 +1,459 @@
+"""
+Replay captured production traffic against test builds and compare latency.
+
+Reads files written by Backend/traffic_capture.py (TRAFFIC_CAPTURE_DIR) and
+re-issues the same request mix, in the same order and at the same relative
+times (or --speed times faster), against each backend build in turn. Every
+build starts from the same state: replay accounts are recreated before each
+run, and OpenAI is replaced by a local stub that answers after
+--llm-latency-ms.
+
+Captured pseudonyms are mapped onto a pool of replay accounts per role
+(Gold members, trainers, admins); "self" IDs become the account's own ID,
+other session, gym and membership IDs are picked from the test database.
+Free text is regenerated with the captured length. Admin writes that add or
+delete accounts, broadcasts and profiler settings are not replayed; cancels
+refer to captured bookings and come back as 404s.
+
+The report lists p50/p95/p99 per route for the captured run and each build,
+and the change of every build against the first one.
+
+Usage:
+    # Two builds of the backend, e.g. a checkout of the previous release
+    python Benchmarks/traffic_replay.py captures/*.ndjson --backends Backend,/tmp/gymfit-prev/Backend --speed 5
+
+    # An instance that is already running (against the same database)
+    python Benchmarks/traffic_replay.py captures/*.ndjson --target 127.0.0.1:5000 --speed 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from async_benchmark import BACKEND_DIR, free_port, percentile, start_llm_stub
+from werkzeug.security import generate_password_hash
+
+# Backend is on sys.path once async_benchmark is imported
+import auth  # noqa: E402
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'GymFitDB')
+}
+
+REPLAY_DOMAIN = '@traffic-replay.local'
+REPLAY_PASSWORD = 'traffic-replay-password'
+GOLD_TYPE_ID = 1
+REPLAY_GYM_ID = 1
+
+# (method, route) never replayed
+SKIPPED = {
+    ('POST', '/api/admin/member'),
+    ('POST', '/api/admin/trainer'),
+    ('DELETE', '/api/admin/member/<int:member_id>'),
+    ('DELETE', '/api/admin/trainer/<int:trainer_id_to_delete>'),
+    ('POST', '/api/admin/broadcast'),
+    ('POST', '/api/admin/profiling'),
+    ('DELETE', '/api/admin/profiling')
+}
+
+QUESTIONS = [
+    'How am I doing?',
+    'How many calories did I burn this week?',
+    'What should I focus on in my next workout to keep improving?',
+    'Can you suggest a weekly plan that balances cardio, strength and recovery for my current level?'
+]
+
+SERVE_CODE = {
+    'flask': "from werkzeug.serving import run_simple; from app import app; "
+             "run_simple('127.0.0.1', {port}, app, threaded=True)",
+    'asgi': "import uvicorn, asgi_app; "
+            "uvicorn.run(asgi_app.app, host='127.0.0.1', port={port}, log_level='warning', backlog=4096)"
+}
+
+RULE_ARGUMENT = re.compile(r'<(?:[^:<>]+:)?([^<>]+)>')
+
+# --- Capture files ---
+
+class Record:
+    __slots__ = ('at', 'method', 'route', 'role', 'user', 'args', 'query', 'body', 'status', 'duration_ms')
+
+    def __init__(self, at, line):
+        self.at = at
+        (_, self.method, self.route, self.role, self.user,
+         self.args, self.query, self.body, self.status, self.duration_ms) = line
+
+def load(paths, seconds=None):
+    """Records of every capture file on one timeline, starting at 0 seconds."""
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != 1:
+                raise SystemExit(f"{path}: unsupported capture format {header.get('version')}")
+            for line in f:
+                if line.strip():
+                    fields = json.loads(line)
+                    records.append(Record(header['started'] + fields[0] / 1000, fields))
+    if not records:
+        raise SystemExit('No captured requests found.')
+    records.sort(key=lambda record: record.at)
+    first = records[0].at
+    for record in records:
+        record.at -= first
+    if seconds:
+        records = [record for record in records if record.at <= seconds]
+    return records
+
+# --- Replay accounts ---
+
+def setup(counts):
+    """Recreate the replay accounts. Returns the test database's IDs by kind."""
+    password = generate_password_hash(REPLAY_PASSWORD, auth.PASSWORD_HASH_METHOD)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    teardown(cursor)
+    ids = {'member': [], 'trainer': [], 'admin': []}
+    for i in range(counts['member']):
+        cursor.execute("""
+            INSERT INTO Member (Name, Email, Password, Age, JoinDate, MembershipType_ID, Gym_ID)
+            VALUES (%s, %s, %s, 30, DATE_SUB(CURDATE(), INTERVAL 90 DAY), %s, %s)
+        """, (f'Replay Member {i}', f'member-{i}{REPLAY_DOMAIN}', password, GOLD_TYPE_ID, REPLAY_GYM_ID))
+        member_id = cursor.lastrowid
+        ids['member'].append(member_id)
+        cursor.executemany("""
+            INSERT INTO WorkoutLog (M_ID, Exercise, Date, Duration, CaloriesBurnt, Distance, Progress)
+            VALUES (%s, 'Running', DATE_SUB(CURDATE(), INTERVAL %s DAY), 40, 350, 5.0, 'Completed')
+        """, [(member_id, day) for day in range(1, 31)])
+        cursor.executemany("""
+            INSERT INTO HealthMetrics (M_ID, Weight, Height, SleepHours, WaterLiters, Steps, Date)
+            VALUES (%s, %s, 175, 7, 2.5, 9000, DATE_SUB(CURDATE(), INTERVAL %s DAY))
+        """, [(member_id, 80 - day * 0.05, day) for day in range(1, 31)])
+    for i in range(counts['trainer']):
+        cursor.execute("""
+            INSERT INTO Trainer (Name, Email, Password, Specialization, Gym_ID)
+            VALUES (%s, %s, %s, 'Strength Training', %s)
+        """, (f'Replay Trainer {i}', f'trainer-{i}{REPLAY_DOMAIN}', password, REPLAY_GYM_ID))
+        ids['trainer'].append(cursor.lastrowid)
+    for i in range(counts['admin']):
+        cursor.execute("INSERT INTO Admin (Name, Email, Password) VALUES (%s, %s, %s)",
+                       (f'Replay Admin {i}', f'admin-{i}{REPLAY_DOMAIN}', password))
+        ids['admin'].append(cursor.lastrowid)
+
+    # Roomy future sessions, so replayed bookings find seats
+    trainer_id = ids['trainer'][0] if ids['trainer'] else None
+    if trainer_id is None:
+        cursor.execute("SELECT T_ID FROM Trainer WHERE Gym_ID = %s LIMIT 1", (REPLAY_GYM_ID,))
+        row = cursor.fetchone()
+        trainer_id = row[0] if row else None
+    if trainer_id is not None:
+        cursor.executemany("""
+            INSERT INTO Session (Details, SessionDate, SessionTime, Duration, T_ID, MaxParticipants)
+            VALUES (%s, %s, '18:00:00', 60, %s, 100000)
+        """, [(f'Replay Session {day}', date.today() + timedelta(days=day), trainer_id) for day in range(1, 15)])
+    conn.commit()
+
+    cursor.execute("SELECT S_ID FROM Session WHERE SessionDate >= CURDATE() AND Status = 'scheduled'")
+    ids['session'] = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT Gym_ID FROM Gym")
+    ids['gym'] = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT Type_ID FROM MembershipType")
+    ids['membership_type'] = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return ids
+
+def teardown(cursor=None):
+    owns_connection = cursor is None
+    if owns_connection:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+    pattern = f'%{REPLAY_DOMAIN}'
+    cursor.execute("DELETE FROM Session WHERE Details LIKE 'Replay Session %'")
+    cursor.execute("DELETE FROM Member WHERE Email LIKE %s", (pattern,))
+    cursor.execute("DELETE FROM Trainer WHERE Email LIKE %s", (pattern,))
+    cursor.execute("DELETE FROM Admin WHERE Email LIKE %s", (pattern,))
+    if owns_connection:
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+def account_counts(records, pool_size):
+    users = {}
+    for record in records:
+        if record.user is not None and record.role in ('member', 'trainer', 'admin'):
+            users.setdefault(record.role, set()).add(record.user)
+    return {role: min(len(users.get(role, ())), pool_size) for role in ('member', 'trainer', 'admin')}
+
+# --- Rebuilding requests ---
+
+class Mapper:
+    """Turns anonymized records back into requests against the replay accounts."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self._accounts = {}
+        self._assigned = {}
+
+    def account(self, role, user):
+        """(index, ID) of the replay account standing in for a captured user, or None.
+
+        Users take accounts in order of first appearance, so every build
+        replays the same user on the same account.
+        """
+        pool = self.ids.get(role) or []
+        if user is None or not pool:
+            return None
+        key = (role, user)
+        if key not in self._accounts:
+            self._accounts[key] = self._assigned.get(role, 0) % len(pool)
+            self._assigned[role] = self._assigned.get(role, 0) + 1
+        index = self._accounts[key]
+        return index, pool[index]
+
+    def _pick(self, kind, token):
+        pool = self.ids.get(kind) or []
+        return pool[int(token, 16) % len(pool)] if pool else 0
+
+    def _id(self, key, token, own_id):
+        if token == 'self':
+            return own_id
+        # membership_type before member: both are prefixes of membership_type_id
+        for kind in ('session', 'membership_type', 'member', 'trainer', 'admin', 'gym'):
+            if key.startswith(kind):
+                return self._pick(kind, token)
+        return 0
+
+    def fill(self, key, value, own_id):
+        if isinstance(value, list):
+            return [self.fill(key, item, own_id) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if set(value) == {'id'}:
+            return self._id(key, value['id'], own_id)
+        if set(value) == {'d'}:
+            return (date.today() + timedelta(days=value['d'])).isoformat()
+        if set(value) == {'s'}:
+            if key == 'question':
+                return min(QUESTIONS, key=lambda question: abs(len(question) - value['s']))
+            return 'x' * min(value['s'], 1000)
+        return {k: self.fill(k, v, own_id) for k, v in value.items()}
+
+    def path(self, route, args, query, own_id):
+        args = self.fill('', args, own_id)
+        path = RULE_ARGUMENT.sub(lambda m: str(args.get(m.group(1), 0)), route)
+        query = self.fill('', query, own_id)
+        return f"{path}?{urlencode(query)}" if query else path
+
+    def request(self, record):
+        """(method, path, body, account) for a record, or None when it is not replayed."""
+        if (record.method, record.route) in SKIPPED:
+            return None
+        account = self.account(record.role, record.user)
+        own_id = account[1] if account else 0
+        if record.route == '/api/login':
+            if account is None:
+                return None
+            body = {'email': f'{record.role}-{account[0]}{REPLAY_DOMAIN}', 'password': REPLAY_PASSWORD,
+                    'role': record.role}
+            return record.method, record.route, body, None
+        if record.route == '/api/batch':
+            body = {'requests': [
+                {'id': str(i), 'path': self.path(route, args, query, own_id)}
+                for i, (route, args, query) in enumerate((record.body or {}).get('requests', []))
+            ]}
+        else:
+            body = self.fill('', record.body, own_id) if record.body is not None else None
+        path = self.path(record.route, record.args, record.query, own_id)
+        return record.method, path, body, (record.role, account[0]) if account else None
+
+# --- HTTP ---
+
+def login(host, port, role, index):
+    request = urllib.request.Request(
+        f'http://{host}:{port}/api/login',
+        data=json.dumps({'email': f'{role}-{index}{REPLAY_DOMAIN}', 'password': REPLAY_PASSWORD,
+                         'role': role}).encode(),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.headers['Set-Cookie'].split(';', 1)[0]
+
+async def fetch(host, port, method, path, cookie, body=None):
+    """One HTTP/1.1 request on a fresh connection; returns the status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\nCookie: {cookie}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                  f"Connection: close\r\n\r\n").encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+async def replay(host, port, plan, cookies, speed, max_in_flight):
+    """Issue the plan on schedule. Returns {route: [(status, seconds)]} and the late-start count."""
+    results = {}
+    slots = asyncio.Semaphore(max_in_flight)
+    late = 0
+    started = time.perf_counter()
+
+    async def send(route, method, path, body, account):
+        async with slots:
+            request_started = time.perf_counter()
+            try:
+                status = await fetch(host, port, method, path, cookies.get(account, ''), body)
+            except (OSError, IndexError, ValueError):
+                status = 'error'
+            results.setdefault(route, []).append((status, time.perf_counter() - request_started))
+
+    tasks = []
+    for at, route, (method, path, body, account) in plan:
+        if speed:
+            delay = at / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.05:
+                late += 1
+        tasks.append(asyncio.create_task(send(route, method, path, body, account)))
+    await asyncio.gather(*tasks)
+    return results, late
+
+# --- Builds ---
+
+def start_server(backend_dir, server, port, env):
+    process = subprocess.Popen([sys.executable, '-c', SERVE_CODE[server].format(port=port)],
+                               cwd=backend_dir, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server in {backend_dir} did not start on port {port}")
+
+def run_build(records, counts, host, port, args):
+    ids = setup(counts)
+    mapper = Mapper(ids)
+    plan = []
+    skipped = 0
+    for record in records:
+        request = mapper.request(record)
+        if request is None:
+            skipped += 1
+        else:
+            plan.append((record.at, f"{record.method} {record.route}", request))
+    cookies = {(role, index): login(host, port, role, index)
+               for role in ('member', 'trainer', 'admin') for index in range(counts[role])}
+    results, late = asyncio.run(replay(host, port, plan, cookies, args.speed, args.max_in_flight))
+    return results, skipped, late
+
+def summarize(samples):
+    latencies = [seconds for status, seconds in samples if status != 'error']
+    statuses = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'count': len(samples),
+        'p50': percentile(latencies, 0.5) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'statuses': statuses
+    }
+
+def report(runs):
+    """Print per-route percentiles for every run and changes against the first build."""
+    names = list(runs)
+    routes = sorted({route for summary in runs.values() for route in summary})
+    baseline = names[1] if len(names) > 2 else None
+    for route in routes:
+        print(route)
+        for name in names:
+            summary = runs[name].get(route)
+            if summary is None:
+                continue
+            line = (f"  {name:<28} n={summary['count']:<6} p50 {summary['p50']:8.1f} ms  "
+                    f"p95 {summary['p95']:8.1f} ms  p99 {summary['p99']:8.1f} ms")
+            reference = runs[baseline].get(route) if baseline and name not in ('captured', baseline) else None
+            if reference and reference['p50'] and reference['p99']:
+                line += (f"  ({(summary['p50'] / reference['p50'] - 1) * 100:+.0f}% p50, "
+                         f"{(summary['p99'] / reference['p99'] - 1) * 100:+.0f}% p99)")
+            errors = sum(count for status, count in summary['statuses'].items() if not status.startswith(('2', '3')))
+            if errors:
+                line += f"  non-2xx {errors}"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay captured traffic against backend builds')
+    parser.add_argument('captures', nargs='+', help='capture files from TRAFFIC_CAPTURE_DIR')
+    parser.add_argument('--backends', default=BACKEND_DIR, help='comma-separated Backend directories to compare')
+    parser.add_argument('--target', help='host:port of a running instance instead of starting --backends')
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed; 0 sends as fast as possible')
+    parser.add_argument('--seconds', type=float, help='replay only the first SECONDS of the capture')
+    parser.add_argument('--accounts', type=int, default=50, help='replay accounts per role')
+    parser.add_argument('--max-in-flight', type=int, default=500)
+    parser.add_argument('--llm-latency-ms', type=int, default=800)
+    parser.add_argument('--save', help='write the summaries as JSON to this file')
+    args = parser.parse_args()
+
+    records = load(args.captures, args.seconds)
+    counts = account_counts(records, args.accounts)
+    print(f"{len(records)} requests over {records[-1].at:.1f} s; replay accounts {counts}")
+
+    runs = {'captured': {}}
+    for record in records:
+        runs['captured'].setdefault(f"{record.method} {record.route}", []).append(
+            (record.status, record.duration_ms / 1000))
+    runs['captured'] = {route: summarize(samples) for route, samples in runs['captured'].items()}
+
+    stub = start_llm_stub(args.llm_latency_ms)
+    env = dict(os.environ,
+               OPENAI_BASE_URL=f'http://127.0.0.1:{stub.server_address[1]}/v1',
+               OPENAI_API_KEY='replay',
+               TRAFFIC_CAPTURE_DIR='')
+    try:
+        if args.target:
+            host, port = args.target.rsplit(':', 1)
+            results, skipped, late = run_build(records, counts, host, int(port), args)
+            runs[args.target] = {route: summarize(samples) for route, samples in results.items()}
+            print(f"[{args.target}] skipped {skipped}, started late {late}")
+        else:
+            for backend_dir in args.backends.split(','):
+                port = free_port()
+                server = start_server(os.path.abspath(backend_dir), args.server, port, env)
+                try:
+                    results, skipped, late = run_build(records, counts, '127.0.0.1', port, args)
+                finally:
+                    server.terminate()
+                    server.wait()
+                runs[backend_dir] = {route: summarize(samples) for route, samples in results.items()}
+                print(f"[{backend_dir}] skipped {skipped}, started late {late}")
+    finally:
+        stub.shutdown()
+        teardown()
+
+    report(runs)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(runs, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -103,6 +103,7 @@ CREATE TABLE Session (
     Duration INT COMMENT 'Duration in minutes',
     T_ID INT,
     MaxParticipants INT DEFAULT 10,
+    BookedCount INT NOT NULL DEFAULT 0 COMMENT 'Reserved seats, maintained by booking triggers',
     Status ENUM('scheduled', 'completed', 'cancelled') DEFAULT 'scheduled',
     FOREIGN KEY (T_ID) 
         REFERENCES Trainer(T_ID) 
@@ -124,6 +125,12 @@ CREATE TABLE WorkoutLog (
     CaloriesBurnt DECIMAL(6,2),
     Distance DECIMAL(6,2) COMMENT 'Distance in km',
     Progress VARCHAR(255),
+    BookingKey INT AS (IF(Exercise = 'Session Booking', S_ID, NULL)) VIRTUAL
+        COMMENT 'Session ID for booking rows only; enforces one booking per member',
+    JournalSource VARCHAR(64) COMMENT 'Write-behind journal that accepted the row, if any',
+    JournalSeq BIGINT COMMENT 'Sequence ID assigned by that journal',
+    UNIQUE KEY uq_workoutlog_booking (M_ID, BookingKey),
+    UNIQUE KEY uq_workoutlog_journal (JournalSource, JournalSeq),
     FOREIGN KEY (M_ID) 
         REFERENCES Member(M_ID) 
         ON DELETE CASCADE 
@@ -155,14 +162,19 @@ CREATE TABLE HealthMetrics (
 
 -- ----------------------------------------------------------------------------
 -- Table 9: Notifications
+-- Rows written by the application leave Message NULL and reference a shared
+-- NotificationText row through TextHash (SHA-1 of the text); rows written by
+-- triggers and procedures carry their own Message.
 -- ----------------------------------------------------------------------------
 CREATE TABLE Notifications (
     Notif_ID INT PRIMARY KEY AUTO_INCREMENT,
     M_ID INT,
     Message TEXT,
+    TextHash BINARY(20) NULL,
     Type ENUM('renewal', 'session_reminder', 'progress', 'system'),
     IsRead BOOLEAN DEFAULT FALSE,
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_notifications_member (M_ID, CreatedAt),
     FOREIGN KEY (M_ID) 
         REFERENCES Member(M_ID) 
         ON DELETE CASCADE 
@@ -170,6 +182,246 @@ CREATE TABLE Notifications (
     COMMENT 'Automated notifications and alerts'
 );
 
+-- ----------------------------------------------------------------------------
+-- Table 10: GymStats
+-- Materialized per-gym counters maintained by triggers (see triggers_code.sql)
+-- and periodically verified by ReconcileGymStats (see procedures_code.sql)
+-- ----------------------------------------------------------------------------
+CREATE TABLE GymStats (
+    Gym_ID INT PRIMARY KEY,
+    TotalMembers INT NOT NULL DEFAULT 0,
+    ActiveMembers INT NOT NULL DEFAULT 0,
+    TotalTrainers INT NOT NULL DEFAULT 0,
+    UpcomingSessions INT NOT NULL DEFAULT 0,
+    TotalRevenue DECIMAL(12,2) NOT NULL DEFAULT 0 COMMENT 'Sum of membership prices of all members',
+    ActiveRevenue DECIMAL(12,2) NOT NULL DEFAULT 0 COMMENT 'Sum of membership prices of active members',
+    LastReconciled TIMESTAMP NULL,
+    FOREIGN KEY (Gym_ID)
+        REFERENCES Gym(Gym_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Materialized gym-level counters for admin statistics'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 11: TrainerClient
+-- Maintained trainer-member relationships derived from session WorkoutLog rows
+-- (see triggers_code.sql), so trainer views avoid joining the whole WorkoutLog
+-- ----------------------------------------------------------------------------
+CREATE TABLE TrainerClient (
+    T_ID INT NOT NULL,
+    M_ID INT NOT NULL,
+    FirstSession DATE,
+    LastSession DATE,
+    SessionCount INT NOT NULL DEFAULT 0,
+    LastWorkout DATE COMMENT 'Latest WorkoutLog date of the member',
+    PRIMARY KEY (T_ID, M_ID),
+    INDEX idx_trainerclient_member (M_ID),
+    FOREIGN KEY (T_ID)
+        REFERENCES Trainer(T_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    FOREIGN KEY (M_ID)
+        REFERENCES Member(M_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Trainer-client relationship index for trainer dashboards'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 12: SessionWaitlist
+-- FIFO waitlist for full sessions; promoted on cancellation
+-- ----------------------------------------------------------------------------
+CREATE TABLE SessionWaitlist (
+    W_ID INT PRIMARY KEY AUTO_INCREMENT,
+    S_ID INT NOT NULL,
+    M_ID INT NOT NULL,
+    JoinedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_waitlist_member (S_ID, M_ID),
+    INDEX idx_waitlist_order (S_ID, W_ID),
+    FOREIGN KEY (S_ID)
+        REFERENCES Session(S_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    FOREIGN KEY (M_ID)
+        REFERENCES Member(M_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Waitlisted members for full sessions in arrival order'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 13: ReferenceDataVersion
+-- Single-row change counter for Gym, MembershipType and Trainer, bumped by
+-- triggers (see triggers_code.sql). Application processes poll it to know
+-- when their in-memory reference cache is stale.
+-- ----------------------------------------------------------------------------
+CREATE TABLE ReferenceDataVersion (
+    ID TINYINT PRIMARY KEY DEFAULT 1,
+    Version BIGINT NOT NULL DEFAULT 0,
+    CHECK (ID = 1),
+    COMMENT 'Change counter for cached reference tables'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 14: ChatMessage
+-- Persisted AI coach conversation, one row per turn. Token columns hold the
+-- estimate used for the prompt budget and, on assistant turns, the usage
+-- reported by the model (PromptTokens/CachedTokens are NULL for answers
+-- served locally).
+-- ----------------------------------------------------------------------------
+CREATE TABLE ChatMessage (
+    Msg_ID BIGINT PRIMARY KEY AUTO_INCREMENT,
+    M_ID INT NOT NULL,
+    Role ENUM('user', 'assistant') NOT NULL,
+    Content TEXT NOT NULL,
+    Tokens INT NOT NULL,
+    PromptTokens INT,
+    CachedTokens INT,
+    CompletionTokens INT,
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_chatmessage_member (M_ID, Msg_ID),
+    FOREIGN KEY (M_ID)
+        REFERENCES Member(M_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'AI coach conversation history'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 15: ChatSummary
+-- Rolling summary of each member's older chat turns. Messages up to
+-- SummarizedThrough are represented by Summary and no longer sent verbatim.
+-- ----------------------------------------------------------------------------
+CREATE TABLE ChatSummary (
+    M_ID INT PRIMARY KEY,
+    Summary TEXT NOT NULL,
+    Tokens INT NOT NULL,
+    SummarizedThrough BIGINT NOT NULL,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (M_ID)
+        REFERENCES Member(M_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Rolling summary of older AI coach turns'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 16: GymShard
+-- Shard directory, read only on the default shard (the first in DB_SHARDS).
+-- Places a gym's rows on a named MySQL instance; gyms without a row live on
+-- the default shard. Status 'frozen' blocks writes while shard_rebalance.py
+-- moves the gym. Gym, MembershipType and ReferenceDataVersion are loaded on
+-- every shard; Admin only on the default shard.
+-- ----------------------------------------------------------------------------
+CREATE TABLE GymShard (
+    Gym_ID INT PRIMARY KEY,
+    Shard VARCHAR(32) NOT NULL,
+    Status ENUM('active', 'frozen') NOT NULL DEFAULT 'active',
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (Gym_ID)
+        REFERENCES Gym(Gym_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Gym to database shard directory'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 17: Outbox
+-- Side effects of writes, recorded in the writing transaction (see outbox.py).
+-- Seq is NULL until the consumer holding the OutboxState lock numbers the
+-- event and applies its notifications; every process then tails by Seq to
+-- refresh its caches. Sequenced events are purged after a retention window.
+-- ----------------------------------------------------------------------------
+CREATE TABLE Outbox (
+    Event_ID BIGINT PRIMARY KEY AUTO_INCREMENT,
+    Type VARCHAR(32) NOT NULL,
+    M_ID INT NULL,
+    Payload JSON NULL,
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    Seq BIGINT NULL,
+    UNIQUE KEY uq_outbox_seq (Seq),
+    INDEX idx_outbox_pending (Seq, Event_ID),
+    COMMENT 'Write events awaiting or past their side effects'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 18: OutboxState
+-- Single row holding the last Seq handed out. Locked FOR UPDATE SKIP LOCKED
+-- by the process sequencing events, so only one does so at a time.
+-- ----------------------------------------------------------------------------
+CREATE TABLE OutboxState (
+    ID TINYINT PRIMARY KEY DEFAULT 1,
+    LastSeq BIGINT NOT NULL DEFAULT 0,
+    CHECK (ID = 1),
+    COMMENT 'Outbox sequencing position'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 19: NotificationText
+-- Each distinct notification text, stored once and keyed by its SHA-1, so
+-- the same key names the same text on every shard. Texts are never deleted.
+-- ----------------------------------------------------------------------------
+CREATE TABLE NotificationText (
+    TextHash BINARY(20) PRIMARY KEY,
+    Message TEXT NOT NULL,
+    COMMENT 'Shared notification bodies'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 20: Broadcast
+-- One row per announcement to every member of a gym and/or membership tier
+-- (everyone when both are NULL). Broadcasts without a gym are written to
+-- every shard. Members see broadcasts created since they joined.
+-- ----------------------------------------------------------------------------
+CREATE TABLE Broadcast (
+    Broadcast_ID INT PRIMARY KEY AUTO_INCREMENT,
+    Gym_ID INT NULL,
+    MembershipType_ID INT NULL,
+    Message TEXT NOT NULL,
+    Type ENUM('announcement', 'renewal', 'progress', 'system') NOT NULL DEFAULT 'announcement',
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_broadcast_created (CreatedAt),
+    FOREIGN KEY (Gym_ID)
+        REFERENCES Gym(Gym_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    FOREIGN KEY (MembershipType_ID)
+        REFERENCES MembershipType(Type_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Notifications shared by a gym or membership tier'
+);
+
+-- ----------------------------------------------------------------------------
+-- Table 21: BroadcastRead
+-- Per-member read marker: broadcasts up to Broadcast_ID ReadThroughID are
+-- read. Broadcast IDs only grow on a shard, unlike second-precision
+-- timestamps they tell apart broadcasts sent in the same second.
+-- ----------------------------------------------------------------------------
+CREATE TABLE BroadcastRead (
+    M_ID INT PRIMARY KEY,
+    ReadThroughID INT NOT NULL,
+    FOREIGN KEY (M_ID)
+        REFERENCES Member(M_ID)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    COMMENT 'Broadcast read markers'
+);
+
+-- ----------------------------------------------------------------------------
+-- View 1: UserCredentials
+-- Unified login lookup across Member, Trainer and Admin. Each branch is a
+-- point lookup on its UNIQUE Email index; the constant Role column lets the
+-- optimizer push "Email = ? AND Role = ?" down and skip the other branches.
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE VIEW UserCredentials AS
+    SELECT 'member' AS Role, M_ID AS User_ID, Name, Email, Password FROM Member
+    UNION ALL
+    SELECT 'trainer' AS Role, T_ID AS User_ID, Name, Email, Password FROM Trainer
+    UNION ALL
+    SELECT 'admin' AS Role, A_ID AS User_ID, Name, Email, Password FROM Admin;
+
 -- ============================================================================
 -- SECTION 2: DML (Data Manipulation Language)
 -- ============================================================================
@@ -353,9 +605,47 @@ WHERE Status = 'cancelled'
 -- Delete 3: Remove inactive members (Demonstrates CASCADE delete)
 -- This will also delete related WorkoutLogs and HealthMetrics due to CASCADE
 DELETE FROM Member
-WHERE IsActive = FALSE 
+WHERE IsActive = FALSE
   AND DATEDIFF(CURDATE(), JoinDate) > 365;
 
+-- ----------------------------------------------------------------------------
+-- Initialize Materialized Counters
+-- ----------------------------------------------------------------------------
+
+-- Seed GymStats from the base tables; triggers keep it current afterwards
+INSERT INTO GymStats (Gym_ID, TotalMembers, ActiveMembers, TotalTrainers,
+                      UpcomingSessions, TotalRevenue, ActiveRevenue, LastReconciled)
+SELECT g.Gym_ID,
+       (SELECT COUNT(*) FROM Member m WHERE m.Gym_ID = g.Gym_ID),
+       (SELECT COUNT(*) FROM Member m WHERE m.Gym_ID = g.Gym_ID AND m.IsActive = TRUE),
+       (SELECT COUNT(*) FROM Trainer t WHERE t.Gym_ID = g.Gym_ID),
+       (SELECT COUNT(*) FROM Session s JOIN Trainer t ON s.T_ID = t.T_ID
+         WHERE t.Gym_ID = g.Gym_ID AND s.SessionDate >= CURDATE()),
+       (SELECT COALESCE(SUM(mt.Price), 0) FROM Member m
+         JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+         WHERE m.Gym_ID = g.Gym_ID),
+       (SELECT COALESCE(SUM(mt.Price), 0) FROM Member m
+         JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+         WHERE m.Gym_ID = g.Gym_ID AND m.IsActive = TRUE),
+       NOW()
+FROM Gym g;
+
+-- Reference data starts at version 0; triggers bump it on every change
+INSERT INTO ReferenceDataVersion (ID, Version) VALUES (1, 0);
+
+-- No outbox events sequenced yet
+INSERT INTO OutboxState (ID, LastSeq) VALUES (1, 0);
+
+-- Seed TrainerClient from existing session workouts
+INSERT INTO TrainerClient (T_ID, M_ID, FirstSession, LastSession, SessionCount, LastWorkout)
+SELECT s.T_ID, wl.M_ID,
+       MIN(s.SessionDate), MAX(s.SessionDate), COUNT(*),
+       (SELECT MAX(w2.Date) FROM WorkoutLog w2 WHERE w2.M_ID = wl.M_ID)
+FROM WorkoutLog wl
+JOIN Session s ON wl.S_ID = s.S_ID
+WHERE s.T_ID IS NOT NULL
+GROUP BY s.T_ID, wl.M_ID;
+
 -- ============================================================================
 -- SECTION 3: DCL (Data Control Language)
 -- ============================================================================
@@ -458,6 +748,15 @@ GRANT SELECT ON GymFitDB.MembershipType
 GRANT SELECT, UPDATE ON GymFitDB.Notifications 
     TO 'gymfit_member'@'localhost';
 
+GRANT SELECT ON GymFitDB.NotificationText 
+    TO 'gymfit_member'@'localhost';
+
+GRANT SELECT ON GymFitDB.Broadcast 
+    TO 'gymfit_member'@'localhost';
+
+GRANT SELECT, INSERT, UPDATE ON GymFitDB.BroadcastRead 
+    TO 'gymfit_member'@'localhost';
+
 -- ----------------------------------------------------------------------------
 -- Revoke Dangerous Privileges
 -- ----------------------------------------------------------------------------
@@ -501,12 +800,15 @@ SHOW GRANTS FOR 'gymfit_member'@'localhost';
 SUMMARY OF OPERATIONS:
 
 DDL (Data Definition Language):
-- Created 9 tables: Gym, MembershipType, Member, Trainer, Admin, Session, 
-  WorkoutLog, HealthMetrics, Notifications
+- Created 21 tables: Gym, MembershipType, Member, Trainer, Admin, Session, 
+  WorkoutLog, HealthMetrics, Notifications, GymStats, TrainerClient,
+  SessionWaitlist, ReferenceDataVersion, ChatMessage, ChatSummary, GymShard,
+  Outbox, OutboxState, NotificationText, Broadcast, BroadcastRead
+- Created 1 view: UserCredentials (unified login lookup)
 - Implemented PRIMARY KEY constraints with AUTO_INCREMENT
 - Implemented FOREIGN KEY constraints with CASCADE actions
 - Implemented CHECK constraints for data validation
-- Implemented UNIQUE constraints for email fields
+- Implemented UNIQUE constraints for email fields and session bookings
 - Implemented ENUM types for status fields
 
 DML (Data Manipulation Language):
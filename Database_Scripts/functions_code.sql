@@ -221,21 +221,11 @@ BEGIN
     DECLARE max_participants INT;
     DECLARE is_available BOOLEAN;
     
-    -- Get current and max participants
-    SELECT COUNT(*), s.MaxParticipants
+    -- Read the maintained booking counter instead of counting bookings
+    SELECT BookedCount, MaxParticipants
     INTO current_participants, max_participants
-    FROM WorkoutLog wl
-    JOIN Session s ON wl.S_ID = s.S_ID
-    WHERE wl.S_ID = session_id 
-        AND wl.Exercise = 'Session Booking'
-    GROUP BY s.MaxParticipants;
-    
-    -- Handle case where no one has booked yet
-    IF current_participants IS NULL THEN
-        SELECT MaxParticipants INTO max_participants
-        FROM Session WHERE S_ID = session_id;
-        SET current_participants = 0;
-    END IF;
+    FROM Session
+    WHERE S_ID = session_id;
     
     -- Check availability
     IF current_participants < max_participants THEN
@@ -377,19 +367,18 @@ DELIMITER ;
 DROP FUNCTION IF EXISTS CalculateGymRevenue;
 
 DELIMITER //
-CREATE FUNCTION CalculateGymRevenue(gym_id INT)
+CREATE FUNCTION CalculateGymRevenue(p_gym_id INT)
 RETURNS DECIMAL(12,2)
 DETERMINISTIC
 READS SQL DATA
 BEGIN
     DECLARE total_revenue DECIMAL(12,2);
     
-    SELECT COALESCE(SUM(mt.Price), 0)
+    -- Read from the materialized counters instead of re-summing members
+    SELECT COALESCE(MAX(ActiveRevenue), 0)
     INTO total_revenue
-    FROM Member m
-    JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-    WHERE m.Gym_ID = gym_id
-        AND m.IsActive = TRUE;
+    FROM GymStats
+    WHERE Gym_ID = p_gym_id;
     
     RETURN total_revenue;
 END //
@@ -467,6 +456,11 @@ DELIMITER ;
 -- COMPREHENSIVE TESTING QUERIES
 -- ============================================================================
 
+-- Calling the member functions once per row runs a separate scan of
+-- WorkoutLog/HealthMetrics for every member and function. For reports over
+-- many members use CALL GetMemberAnalytics(gym_id) (procedures_code.sql),
+-- which computes the same values in one grouped pass.
+
 -- Test all membership functions
 SELECT 
     M_ID,
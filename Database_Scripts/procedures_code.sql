@@ -376,34 +376,29 @@ DROP PROCEDURE IF EXISTS GetGymStatistics//
 
 CREATE PROCEDURE GetGymStatistics(IN gym_id INT)
 BEGIN
+    -- Counters are read from the materialized GymStats table
     SELECT 
         g.Gym_ID,
         g.Location,
         g.Capacity,
         
         -- Member statistics
-        COUNT(DISTINCT m.M_ID) as TotalMembers,
-        SUM(CASE WHEN m.IsActive = TRUE THEN 1 ELSE 0 END) as ActiveMembers,
+        gs.TotalMembers,
+        gs.ActiveMembers,
         
         -- Trainer statistics
-        COUNT(DISTINCT t.T_ID) as TotalTrainers,
+        gs.TotalTrainers,
         
         -- Session statistics
-        (SELECT COUNT(*) FROM Session s 
-         JOIN Trainer t2 ON s.T_ID = t2.T_ID 
-         WHERE t2.Gym_ID = gym_id 
-           AND s.SessionDate >= CURDATE()) as UpcomingSessions,
+        gs.UpcomingSessions,
         
         -- Revenue statistics
-        SUM(mt.Price) as TotalRevenue,
-        AVG(mt.Price) as AvgMembershipPrice
+        gs.TotalRevenue,
+        IF(gs.TotalMembers > 0, gs.TotalRevenue / gs.TotalMembers, NULL) as AvgMembershipPrice
         
     FROM Gym g
-    LEFT JOIN Member m ON g.Gym_ID = m.Gym_ID
-    LEFT JOIN Trainer t ON g.Gym_ID = t.Gym_ID
-    LEFT JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
-    WHERE g.Gym_ID = gym_id
-    GROUP BY g.Gym_ID, g.Location, g.Capacity;
+    JOIN GymStats gs ON g.Gym_ID = gs.Gym_ID
+    WHERE g.Gym_ID = gym_id;
 END//
 
 DELIMITER ;
@@ -519,6 +514,224 @@ DELIMITER ;
 
 -- Usage: CALL DeactivateExpiredMemberships();
 
+-- ============================================================================
+-- PROCEDURE 11: ReconcileGymStats
+-- Purpose: Recompute GymStats and Session.BookedCount from the base tables,
+--          report GymStats drift and fix it
+-- Parameters: None
+-- Returns: One row per gym whose counters had drifted (empty when consistent)
+-- ============================================================================
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS ReconcileGymStats//
+
+CREATE PROCEDURE ReconcileGymStats()
+BEGIN
+    DROP TEMPORARY TABLE IF EXISTS GymStatsFresh;
+
+    CREATE TEMPORARY TABLE GymStatsFresh AS
+    SELECT 
+        g.Gym_ID,
+        (SELECT COUNT(*) FROM Member m WHERE m.Gym_ID = g.Gym_ID) AS TotalMembers,
+        (SELECT COUNT(*) FROM Member m
+          WHERE m.Gym_ID = g.Gym_ID AND m.IsActive = TRUE) AS ActiveMembers,
+        (SELECT COUNT(*) FROM Trainer t WHERE t.Gym_ID = g.Gym_ID) AS TotalTrainers,
+        (SELECT COUNT(*) FROM Session s JOIN Trainer t ON s.T_ID = t.T_ID
+          WHERE t.Gym_ID = g.Gym_ID AND s.SessionDate >= CURDATE()) AS UpcomingSessions,
+        (SELECT COALESCE(SUM(mt.Price), 0) FROM Member m
+          JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+          WHERE m.Gym_ID = g.Gym_ID) AS TotalRevenue,
+        (SELECT COALESCE(SUM(mt.Price), 0) FROM Member m
+          JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+          WHERE m.Gym_ID = g.Gym_ID AND m.IsActive = TRUE) AS ActiveRevenue
+    FROM Gym g;
+
+    -- Report drift before correcting it
+    SELECT 
+        f.Gym_ID,
+        gs.TotalMembers AS StoredMembers, f.TotalMembers AS ActualMembers,
+        gs.ActiveMembers AS StoredActiveMembers, f.ActiveMembers AS ActualActiveMembers,
+        gs.TotalTrainers AS StoredTrainers, f.TotalTrainers AS ActualTrainers,
+        gs.UpcomingSessions AS StoredUpcomingSessions, f.UpcomingSessions AS ActualUpcomingSessions,
+        gs.TotalRevenue AS StoredRevenue, f.TotalRevenue AS ActualRevenue,
+        gs.ActiveRevenue AS StoredActiveRevenue, f.ActiveRevenue AS ActualActiveRevenue
+    FROM GymStatsFresh f
+    LEFT JOIN GymStats gs ON gs.Gym_ID = f.Gym_ID
+    WHERE gs.Gym_ID IS NULL
+       OR gs.TotalMembers <> f.TotalMembers
+       OR gs.ActiveMembers <> f.ActiveMembers
+       OR gs.TotalTrainers <> f.TotalTrainers
+       OR gs.UpcomingSessions <> f.UpcomingSessions
+       OR gs.TotalRevenue <> f.TotalRevenue
+       OR gs.ActiveRevenue <> f.ActiveRevenue;
+
+    INSERT INTO GymStats (Gym_ID, TotalMembers, ActiveMembers, TotalTrainers,
+                          UpcomingSessions, TotalRevenue, ActiveRevenue, LastReconciled)
+    SELECT Gym_ID, TotalMembers, ActiveMembers, TotalTrainers,
+           UpcomingSessions, TotalRevenue, ActiveRevenue, NOW()
+    FROM GymStatsFresh
+    ON DUPLICATE KEY UPDATE
+        TotalMembers = VALUES(TotalMembers),
+        ActiveMembers = VALUES(ActiveMembers),
+        TotalTrainers = VALUES(TotalTrainers),
+        UpcomingSessions = VALUES(UpcomingSessions),
+        TotalRevenue = VALUES(TotalRevenue),
+        ActiveRevenue = VALUES(ActiveRevenue),
+        LastReconciled = VALUES(LastReconciled);
+
+    DROP TEMPORARY TABLE IF EXISTS GymStatsFresh;
+
+    -- Booked seats of upcoming sessions, should any booking have gone
+    -- without its trigger
+    UPDATE Session s
+    LEFT JOIN (
+        SELECT S_ID, COUNT(*) AS Seats
+        FROM WorkoutLog
+        WHERE S_ID IS NOT NULL
+          AND Exercise = 'Session Booking'
+        GROUP BY S_ID
+    ) b ON b.S_ID = s.S_ID
+    SET s.BookedCount = COALESCE(b.Seats, 0)
+    WHERE s.SessionDate >= CURDATE()
+      AND s.BookedCount <> COALESCE(b.Seats, 0);
+END//
+
+DELIMITER ;
+
+-- Usage: CALL ReconcileGymStats();
+
+-- Nightly reconciliation also retires sessions that moved into the past.
+-- Requires the event scheduler: SET GLOBAL event_scheduler = ON;
+DROP EVENT IF EXISTS GymStatsNightlyReconcile;
+
+CREATE EVENT GymStatsNightlyReconcile
+ON SCHEDULE EVERY 1 DAY
+STARTS (CURDATE() + INTERVAL 1 DAY + INTERVAL 5 MINUTE)
+DO CALL ReconcileGymStats();
+
+-- ============================================================================
+-- PROCEDURE 12: RebuildTrainerClient
+-- Purpose: Rebuild the TrainerClient relationship index from WorkoutLog
+-- Parameters: None
+-- Returns: Number of relationships rebuilt
+-- Note: Only needed after bulk changes that bypass the triggers
+--       (e.g. reassigning sessions to another trainer)
+-- ============================================================================
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS RebuildTrainerClient//
+
+CREATE PROCEDURE RebuildTrainerClient()
+BEGIN
+    DELETE FROM TrainerClient;
+
+    INSERT INTO TrainerClient (T_ID, M_ID, FirstSession, LastSession, SessionCount, LastWorkout)
+    SELECT s.T_ID, wl.M_ID,
+           MIN(s.SessionDate), MAX(s.SessionDate), COUNT(*), lw.LastWorkout
+    FROM WorkoutLog wl
+    JOIN Session s ON wl.S_ID = s.S_ID
+    JOIN (
+        SELECT M_ID, MAX(Date) AS LastWorkout
+        FROM WorkoutLog
+        GROUP BY M_ID
+    ) lw ON lw.M_ID = wl.M_ID
+    WHERE s.T_ID IS NOT NULL
+    GROUP BY s.T_ID, wl.M_ID, lw.LastWorkout;
+
+    SELECT CONCAT('Rebuilt ', ROW_COUNT(), ' trainer-client relationships') AS Result;
+END//
+
+DELIMITER ;
+
+-- Usage: CALL RebuildTrainerClient();
+
+-- ============================================================================
+-- PROCEDURE 13: GetMemberAnalytics
+-- Purpose: Table-valued form of the per-member analytics functions
+--          (CalculateMemberBMI, GetTotalCaloriesBurned,
+--          CalculateWorkoutConsistency, GetAvgWorkoutDuration,
+--          CalculateWeightChange, GetAvgDailySteps, CheckMembershipExpiry)
+--          for every member of a gym in one grouped pass over WorkoutLog
+--          and one over HealthMetrics, instead of a correlated scan per
+--          member and function
+-- Parameters: gym_id (INT) - Gym to report on; NULL for all gyms
+-- Returns: One row per member with the same values the functions return
+--          for 30-day windows (7 days for steps, sleep and weekly workouts)
+-- ============================================================================
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS GetMemberAnalytics//
+
+CREATE PROCEDURE GetMemberAnalytics(IN gym_id INT)
+BEGIN
+    SELECT
+        m.M_ID,
+        m.Name,
+        m.Gym_ID,
+        COALESCE(w.MonthlyWorkouts, 0) AS WorkoutsLast30Days,
+        COALESCE(w.WeeklyWorkouts, 0) AS WeeklyWorkouts,
+        COALESCE(w.TotalMonthlyCalories, 0) AS CaloriesLast30Days,
+        w.AvgMonthlyCalories,
+        COALESCE(w.ActiveDays, 0) / 30 * 100 AS ConsistencyPercent,
+        COALESCE(w.AvgDuration, 0) AS AvgWorkoutDuration,
+        IF(h.CurrentWeight IS NOT NULL AND h.CurrentHeight > 0,
+           h.CurrentWeight / POWER(h.CurrentHeight / 100, 2), 0) AS BMI,
+        IF(h.CurrentWeight IS NOT NULL AND h.PastWeight IS NOT NULL,
+           h.CurrentWeight - h.PastWeight, 0) AS WeightChange30Days,
+        h.CurrentWeight,
+        h.StartingWeight,
+        ROUND(COALESCE(h.AvgSteps, 0)) AS AvgDailySteps,
+        h.AvgSleep AS AvgWeeklySleep,
+        DATEDIFF(DATE_ADD(m.JoinDate, INTERVAL mt.Duration MONTH), CURDATE()) AS DaysUntilExpiry
+    FROM Member m
+    LEFT JOIN MembershipType mt ON m.MembershipType_ID = mt.Type_ID
+    LEFT JOIN (
+        SELECT wl.M_ID,
+               COUNT(*) AS MonthlyWorkouts,
+               COUNT(CASE WHEN wl.Date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN 1 END) AS WeeklyWorkouts,
+               SUM(wl.CaloriesBurnt) AS TotalMonthlyCalories,
+               AVG(wl.CaloriesBurnt) AS AvgMonthlyCalories,
+               COUNT(DISTINCT wl.Date) AS ActiveDays,
+               AVG(CASE WHEN wl.Exercise != 'Session Booking' THEN wl.Duration END) AS AvgDuration
+        FROM WorkoutLog wl
+        JOIN Member wm ON wm.M_ID = wl.M_ID
+        WHERE wl.Date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+          AND (gym_id IS NULL OR wm.Gym_ID = gym_id)
+        GROUP BY wl.M_ID
+    ) w ON w.M_ID = m.M_ID
+    LEFT JOIN (
+        SELECT M_ID,
+               MAX(CASE WHEN Newest = 1 THEN Weight END) AS CurrentWeight,
+               MAX(CASE WHEN Newest = 1 THEN Height END) AS CurrentHeight,
+               MAX(CASE WHEN Oldest = 1 THEN Weight END) AS StartingWeight,
+               MAX(CASE WHEN Date <= DATE_SUB(CURDATE(), INTERVAL 30 DAY) AND NewestBefore = 1
+                        THEN Weight END) AS PastWeight,
+               AVG(CASE WHEN Date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN Steps END) AS AvgSteps,
+               AVG(CASE WHEN Date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN SleepHours END) AS AvgSleep
+        FROM (
+            SELECT hm.M_ID, hm.Date, hm.Weight, hm.Height, hm.Steps, hm.SleepHours,
+                   ROW_NUMBER() OVER (PARTITION BY hm.M_ID ORDER BY hm.Date DESC, hm.Metric_ID DESC) AS Newest,
+                   ROW_NUMBER() OVER (PARTITION BY hm.M_ID ORDER BY hm.Date, hm.Metric_ID) AS Oldest,
+                   ROW_NUMBER() OVER (PARTITION BY hm.M_ID, hm.Date <= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+                                      ORDER BY hm.Date DESC, hm.Metric_ID DESC) AS NewestBefore
+            FROM HealthMetrics hm
+            JOIN Member hmm ON hmm.M_ID = hm.M_ID
+            WHERE gym_id IS NULL OR hmm.Gym_ID = gym_id
+        ) ranked
+        GROUP BY M_ID
+    ) h ON h.M_ID = m.M_ID
+    WHERE gym_id IS NULL OR m.Gym_ID = gym_id
+    ORDER BY m.M_ID;
+END//
+
+DELIMITER ;
+
+-- Usage: CALL GetMemberAnalytics(1);     -- one gym
+--        CALL GetMemberAnalytics(NULL);  -- every member
+
 -- ============================================================================
 -- End of Stored Procedures
 -- ============================================================================
@@ -536,6 +749,9 @@ PROCEDURE SUMMARY:
 8. CreateSessionReminders - Automated session reminders
 9. GetMembershipExpiringReport - Expiring memberships report
 10. DeactivateExpiredMemberships - Auto-deactivate expired memberships
+11. ReconcileGymStats - Verify and repair materialized gym counters and booked seats
+12. RebuildTrainerClient - Rebuild the trainer-client relationship index
+13. GetMemberAnalytics - Per-member analytics for a gym in one grouped pass
 
 All procedures include:
 - Input validation
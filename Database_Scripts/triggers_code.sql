@@ -6,11 +6,24 @@
 
 USE GymFitDB;
 
+-- Triggers on Member, Trainer, Session, WorkoutLog and HealthMetrics return
+-- immediately while @gymfit_shard_copy is set. shard_rebalance.py sets it on
+-- its connections when moving a gym between shards: copied rows already carry
+-- their effects (booked counts, notifications, TrainerClient rows), and the
+-- GymStats counters on both shards are rebuilt by ReconcileGymStats afterwards.
+
 -- ============================================================================
 -- TRIGGER 1: CheckSessionCapacity
 -- Type: BEFORE INSERT
--- Purpose: Prevent session booking if capacity is full
--- Table: WorkoutLog
+-- Purpose: Atomically reserve a seat, preventing booking if capacity is full
+-- Table: WorkoutLog, Member
+-- Note: The conditional UPDATE on Session.BookedCount takes the session row
+--       lock and checks capacity in one statement, so concurrent bookings
+--       cannot overbook. A failing INSERT (e.g. the uq_workoutlog_booking
+--       duplicate check) rolls the reservation back with the statement.
+--       Deleting a member cascades to WorkoutLog, and cascaded deletes do not
+--       fire WorkoutLog triggers, so ReleaseMemberBookings frees the member's
+--       seats before the delete.
 -- ============================================================================
 
 DELIMITER //
@@ -20,29 +33,68 @@ DROP TRIGGER IF EXISTS CheckSessionCapacity//
 CREATE TRIGGER CheckSessionCapacity
 BEFORE INSERT ON WorkoutLog
 FOR EACH ROW
-BEGIN
-    DECLARE current_participants INT;
-    DECLARE max_participants INT;
-    
-    -- Only check if this is a session booking
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    -- Only reserve if this is a session booking
     IF NEW.S_ID IS NOT NULL AND NEW.Exercise = 'Session Booking' THEN
         
-        -- Get current participant count and max capacity
-        SELECT COUNT(*), s.MaxParticipants
-        INTO current_participants, max_participants
-        FROM WorkoutLog wl
-        JOIN Session s ON wl.S_ID = s.S_ID
-        WHERE wl.S_ID = NEW.S_ID 
-          AND wl.Exercise = 'Session Booking';
+        UPDATE Session
+        SET BookedCount = BookedCount + 1
+        WHERE S_ID = NEW.S_ID
+          AND BookedCount < MaxParticipants;
         
         -- Prevent booking if session is full
-        IF current_participants >= max_participants THEN
+        IF ROW_COUNT() = 0 THEN
             SIGNAL SQLSTATE '45000'
             SET MESSAGE_TEXT = 'Session is already full. Cannot book this session.';
         END IF;
     END IF;
 END//
 
+DROP TRIGGER IF EXISTS ReleaseSessionCapacity//
+
+CREATE TRIGGER ReleaseSessionCapacity
+AFTER DELETE ON WorkoutLog
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    -- Free the seat when a booking is cancelled
+    IF OLD.S_ID IS NOT NULL AND OLD.Exercise = 'Session Booking' THEN
+        UPDATE Session
+        SET BookedCount = GREATEST(BookedCount - 1, 0)
+        WHERE S_ID = OLD.S_ID;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS ReleaseMemberBookings//
+
+CREATE TRIGGER ReleaseMemberBookings
+BEFORE DELETE ON Member
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    -- Free every seat the member holds; the application promotes the waitlists
+    UPDATE Session s
+    JOIN (
+        SELECT S_ID, COUNT(*) AS Seats
+        FROM WorkoutLog
+        WHERE M_ID = OLD.M_ID
+          AND S_ID IS NOT NULL
+          AND Exercise = 'Session Booking'
+        GROUP BY S_ID
+    ) b ON b.S_ID = s.S_ID
+    SET s.BookedCount = GREATEST(s.BookedCount - b.Seats, 0);
+END//
+
 DELIMITER ;
 
 -- Test: Try to book a session that's at capacity
@@ -63,9 +115,13 @@ DROP TRIGGER IF EXISTS CheckMembershipRenewal//
 CREATE TRIGGER CheckMembershipRenewal 
 BEFORE UPDATE ON Member
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
     DECLARE membership_duration INT;
     DECLARE renewal_date DATE;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
     
     -- Get membership duration
     SELECT Duration INTO membership_duration 
@@ -109,7 +165,7 @@ DELIMITER ;
 -- ============================================================================
 -- TRIGGER 3: TrackWorkoutProgress
 -- Type: AFTER INSERT
--- Purpose: Create progress milestone notifications
+-- Purpose: Create progress milestone notifications (retired, see outbox.py)
 -- Table: WorkoutLog
 -- ============================================================================
 
@@ -117,43 +173,12 @@ DELIMITER //
 
 DROP TRIGGER IF EXISTS TrackWorkoutProgress//
 
-CREATE TRIGGER TrackWorkoutProgress 
-AFTER INSERT ON WorkoutLog
-FOR EACH ROW
-BEGIN
-    DECLARE total_workouts INT;
-    DECLARE progress_message VARCHAR(255);
-    
-    -- Count total workouts for this member (excluding session bookings)
-    SELECT COUNT(*) INTO total_workouts 
-    FROM WorkoutLog 
-    WHERE M_ID = NEW.M_ID 
-      AND Exercise != 'Session Booking';
-    
-    -- Set milestone messages
-    IF total_workouts = 10 THEN
-        SET progress_message = 'Congratulations! You have completed 10 workouts. Keep up the great work!';
-    ELSEIF total_workouts = 25 THEN
-        SET progress_message = 'Amazing! 25 workouts completed. You are making excellent progress!';
-    ELSEIF total_workouts = 50 THEN
-        SET progress_message = 'Incredible milestone! 50 workouts completed. You are a fitness champion!';
-    ELSEIF total_workouts = 100 THEN
-        SET progress_message = 'Legendary achievement! 100 workouts completed. Outstanding dedication!';
-    END IF;
-    
-    -- Insert progress notification if milestone reached
-    IF progress_message IS NOT NULL THEN
-        INSERT INTO Notifications (M_ID, Message, Type)
-        VALUES (NEW.M_ID, progress_message, 'progress');
-    END IF;
-END//
+-- Retired: counting a member's workouts on every insert serialized bulk
+-- loads. Milestone notifications are now created once per batch by the
+-- outbox consumer (Backend/outbox.py) from WORKOUT_LOGGED events.
 
 DELIMITER ;
 
--- Test: Add workout logs to reach milestone
--- INSERT INTO WorkoutLog (M_ID, Exercise, Date, Duration, CaloriesBurnt)
--- VALUES (1, 'Running', CURDATE(), 30, 300);
-
 -- ============================================================================
 -- TRIGGER 4: ValidateHealthMetrics
 -- Type: BEFORE INSERT
@@ -168,7 +193,11 @@ DROP TRIGGER IF EXISTS ValidateHealthMetrics//
 CREATE TRIGGER ValidateHealthMetrics
 BEFORE INSERT ON HealthMetrics
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
     -- Validate Weight (20 kg to 300 kg)
     IF NEW.Weight IS NOT NULL AND (NEW.Weight < 20 OR NEW.Weight > 300) THEN
         SIGNAL SQLSTATE '45000'
@@ -219,7 +248,11 @@ DROP TRIGGER IF EXISTS ValidateWorkoutData//
 CREATE TRIGGER ValidateWorkoutData
 BEFORE INSERT ON WorkoutLog
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
     -- Validate Duration (5 to 300 minutes)
     IF NEW.Duration IS NOT NULL AND (NEW.Duration < 5 OR NEW.Duration > 300) THEN
         SIGNAL SQLSTATE '45000'
@@ -238,8 +271,8 @@ BEGIN
         SET MESSAGE_TEXT = 'Distance must be between 0 and 50 km';
     END IF;
     
-    -- Ensure workout date is not in future
-    IF NEW.Date > CURDATE() THEN
+    -- Ensure workout date is not in future (bookings carry the session date)
+    IF NEW.Date > CURDATE() AND NOT (NEW.Exercise <=> 'Session Booking') THEN
         SIGNAL SQLSTATE '45000'
         SET MESSAGE_TEXT = 'Workout date cannot be in the future';
     END IF;
@@ -265,7 +298,11 @@ DROP TRIGGER IF EXISTS UpdateSessionStatus//
 CREATE TRIGGER UpdateSessionStatus
 AFTER UPDATE ON Session
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
     -- If session date has passed and status is still scheduled, mark as completed
     IF NEW.SessionDate < CURDATE() AND NEW.Status = 'scheduled' THEN
         UPDATE Session 
@@ -279,7 +316,7 @@ DELIMITER ;
 -- ============================================================================
 -- TRIGGER 7: LogMemberActivity
 -- Type: AFTER INSERT
--- Purpose: Track last activity date for member engagement
+-- Purpose: Track last activity date for member engagement (retired, see outbox.py)
 -- Table: WorkoutLog
 -- ============================================================================
 
@@ -287,22 +324,9 @@ DELIMITER //
 
 DROP TRIGGER IF EXISTS LogMemberActivity//
 
-CREATE TRIGGER LogMemberActivity
-AFTER INSERT ON WorkoutLog
-FOR EACH ROW
-BEGIN
-    -- Update member's last activity (could be used for engagement tracking)
-    -- This would require an additional LastActivity column in Member table
-    -- For demonstration, we'll create a system notification instead
-    
-    IF (SELECT COUNT(*) FROM WorkoutLog WHERE M_ID = NEW.M_ID) = 1 THEN
-        -- First workout - welcome message
-        INSERT INTO Notifications (M_ID, Message, Type)
-        VALUES (NEW.M_ID, 
-                'Welcome to GymFit! You have logged your first workout. Great start!', 
-                'system');
-    END IF;
-END//
+-- Retired: the first-workout welcome notification is now created by the
+-- outbox consumer (Backend/outbox.py) from WORKOUT_LOGGED and SESSION_BOOKED
+-- events.
 
 DELIMITER ;
 
@@ -320,8 +344,12 @@ DROP TRIGGER IF EXISTS PreventPastSessionBooking//
 CREATE TRIGGER PreventPastSessionBooking
 BEFORE INSERT ON WorkoutLog
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
     DECLARE session_date DATE;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
     
     -- Only check for session bookings
     IF NEW.S_ID IS NOT NULL AND NEW.Exercise = 'Session Booking' THEN
@@ -355,7 +383,11 @@ DROP TRIGGER IF EXISTS ValidateMemberAgeInsert//
 CREATE TRIGGER ValidateMemberAgeInsert
 BEFORE INSERT ON Member
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
     IF NEW.Age < 10 OR NEW.Age > 100 THEN
         SIGNAL SQLSTATE '45000'
         SET MESSAGE_TEXT = 'Member age must be between 10 and 100 years';
@@ -367,7 +399,11 @@ DROP TRIGGER IF EXISTS ValidateMemberAgeUpdate//
 CREATE TRIGGER ValidateMemberAgeUpdate
 BEFORE UPDATE ON Member
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
     IF NEW.Age < 10 OR NEW.Age > 100 THEN
         SIGNAL SQLSTATE '45000'
         SET MESSAGE_TEXT = 'Member age must be between 10 and 100 years';
@@ -390,9 +426,13 @@ DROP TRIGGER IF EXISTS NotifyLowEngagement//
 CREATE TRIGGER NotifyLowEngagement
 AFTER UPDATE ON HealthMetrics
 FOR EACH ROW
-BEGIN
+shard_copy: BEGIN
     DECLARE last_workout_date DATE;
     DECLARE days_since_workout INT;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
     
     -- Get last workout date
     SELECT MAX(Date) INTO last_workout_date
@@ -424,6 +464,542 @@ END//
 
 DELIMITER ;
 
+-- ============================================================================
+-- TRIGGER 11: InitGymStats
+-- Type: AFTER INSERT
+-- Purpose: Create the materialized counter row for a newly added gym
+-- Table: Gym
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS InitGymStats//
+
+CREATE TRIGGER InitGymStats
+AFTER INSERT ON Gym
+FOR EACH ROW
+BEGIN
+    INSERT IGNORE INTO GymStats (Gym_ID) VALUES (NEW.Gym_ID);
+END//
+
+DELIMITER ;
+
+-- ============================================================================
+-- TRIGGER 12: MaintainGymStatsMember
+-- Type: AFTER INSERT, AFTER UPDATE, AFTER DELETE
+-- Purpose: Keep member counts and membership revenue in GymStats current
+-- Table: Member
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS GymStatsMemberInsert//
+
+CREATE TRIGGER GymStatsMemberInsert
+AFTER INSERT ON Member
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE new_price DECIMAL(8,2);
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    SELECT COALESCE(MAX(Price), 0) INTO new_price
+    FROM MembershipType
+    WHERE Type_ID = NEW.MembershipType_ID;
+
+    UPDATE GymStats
+    SET TotalMembers = TotalMembers + 1,
+        ActiveMembers = ActiveMembers + IF(NEW.IsActive, 1, 0),
+        TotalRevenue = TotalRevenue + new_price,
+        ActiveRevenue = ActiveRevenue + IF(NEW.IsActive, new_price, 0)
+    WHERE Gym_ID = NEW.Gym_ID;
+END//
+
+DROP TRIGGER IF EXISTS GymStatsMemberUpdate//
+
+CREATE TRIGGER GymStatsMemberUpdate
+AFTER UPDATE ON Member
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE old_price DECIMAL(8,2);
+    DECLARE new_price DECIMAL(8,2);
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    -- Only membership, activity or gym changes affect the counters
+    IF NOT (OLD.Gym_ID <=> NEW.Gym_ID)
+       OR NOT (OLD.IsActive <=> NEW.IsActive)
+       OR NOT (OLD.MembershipType_ID <=> NEW.MembershipType_ID) THEN
+
+        SELECT COALESCE(MAX(Price), 0) INTO old_price
+        FROM MembershipType
+        WHERE Type_ID = OLD.MembershipType_ID;
+
+        SELECT COALESCE(MAX(Price), 0) INTO new_price
+        FROM MembershipType
+        WHERE Type_ID = NEW.MembershipType_ID;
+
+        -- Remove the old contribution, then add the new one
+        UPDATE GymStats
+        SET TotalMembers = TotalMembers - 1,
+            ActiveMembers = ActiveMembers - IF(OLD.IsActive, 1, 0),
+            TotalRevenue = TotalRevenue - old_price,
+            ActiveRevenue = ActiveRevenue - IF(OLD.IsActive, old_price, 0)
+        WHERE Gym_ID = OLD.Gym_ID;
+
+        UPDATE GymStats
+        SET TotalMembers = TotalMembers + 1,
+            ActiveMembers = ActiveMembers + IF(NEW.IsActive, 1, 0),
+            TotalRevenue = TotalRevenue + new_price,
+            ActiveRevenue = ActiveRevenue + IF(NEW.IsActive, new_price, 0)
+        WHERE Gym_ID = NEW.Gym_ID;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS GymStatsMemberDelete//
+
+CREATE TRIGGER GymStatsMemberDelete
+AFTER DELETE ON Member
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE old_price DECIMAL(8,2);
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    SELECT COALESCE(MAX(Price), 0) INTO old_price
+    FROM MembershipType
+    WHERE Type_ID = OLD.MembershipType_ID;
+
+    UPDATE GymStats
+    SET TotalMembers = TotalMembers - 1,
+        ActiveMembers = ActiveMembers - IF(OLD.IsActive, 1, 0),
+        TotalRevenue = TotalRevenue - old_price,
+        ActiveRevenue = ActiveRevenue - IF(OLD.IsActive, old_price, 0)
+    WHERE Gym_ID = OLD.Gym_ID;
+END//
+
+DELIMITER ;
+
+-- ============================================================================
+-- TRIGGER 13: MaintainGymStatsTrainer
+-- Type: AFTER INSERT, AFTER UPDATE, BEFORE DELETE
+-- Purpose: Keep trainer counts in GymStats current
+-- Table: Trainer
+-- Note: Deleting a trainer cascades to Session, and cascaded deletes do not
+--       fire Session triggers, so the BEFORE DELETE trigger also removes the
+--       trainer's upcoming sessions from the counters.
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS GymStatsTrainerInsert//
+
+CREATE TRIGGER GymStatsTrainerInsert
+AFTER INSERT ON Trainer
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    UPDATE GymStats
+    SET TotalTrainers = TotalTrainers + 1
+    WHERE Gym_ID = NEW.Gym_ID;
+END//
+
+DROP TRIGGER IF EXISTS GymStatsTrainerUpdate//
+
+CREATE TRIGGER GymStatsTrainerUpdate
+AFTER UPDATE ON Trainer
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE upcoming INT;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    IF NOT (OLD.Gym_ID <=> NEW.Gym_ID) THEN
+        SELECT COUNT(*) INTO upcoming
+        FROM Session
+        WHERE T_ID = NEW.T_ID
+          AND SessionDate >= CURDATE();
+
+        UPDATE GymStats
+        SET TotalTrainers = TotalTrainers - 1,
+            UpcomingSessions = UpcomingSessions - upcoming
+        WHERE Gym_ID = OLD.Gym_ID;
+
+        UPDATE GymStats
+        SET TotalTrainers = TotalTrainers + 1,
+            UpcomingSessions = UpcomingSessions + upcoming
+        WHERE Gym_ID = NEW.Gym_ID;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS GymStatsTrainerDelete//
+
+CREATE TRIGGER GymStatsTrainerDelete
+BEFORE DELETE ON Trainer
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE upcoming INT;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    SELECT COUNT(*) INTO upcoming
+    FROM Session
+    WHERE T_ID = OLD.T_ID
+      AND SessionDate >= CURDATE();
+
+    UPDATE GymStats
+    SET TotalTrainers = TotalTrainers - 1,
+        UpcomingSessions = UpcomingSessions - upcoming
+    WHERE Gym_ID = OLD.Gym_ID;
+END//
+
+DELIMITER ;
+
+-- ============================================================================
+-- TRIGGER 14: MaintainGymStatsSession
+-- Type: AFTER INSERT, AFTER UPDATE, AFTER DELETE
+-- Purpose: Keep upcoming session counts in GymStats current
+-- Table: Session
+-- Note: Sessions that slip into the past are handled by ReconcileGymStats,
+--       which the GymStatsNightlyReconcile event runs once a day.
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS GymStatsSessionInsert//
+
+CREATE TRIGGER GymStatsSessionInsert
+AFTER INSERT ON Session
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    IF NEW.SessionDate >= CURDATE() THEN
+        UPDATE GymStats gs
+        JOIN Trainer t ON t.Gym_ID = gs.Gym_ID
+        SET gs.UpcomingSessions = gs.UpcomingSessions + 1
+        WHERE t.T_ID = NEW.T_ID;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS GymStatsSessionUpdate//
+
+CREATE TRIGGER GymStatsSessionUpdate
+AFTER UPDATE ON Session
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    IF NOT (OLD.T_ID <=> NEW.T_ID)
+       OR NOT (OLD.SessionDate <=> NEW.SessionDate) THEN
+
+        IF OLD.SessionDate >= CURDATE() THEN
+            UPDATE GymStats gs
+            JOIN Trainer t ON t.Gym_ID = gs.Gym_ID
+            SET gs.UpcomingSessions = gs.UpcomingSessions - 1
+            WHERE t.T_ID = OLD.T_ID;
+        END IF;
+
+        IF NEW.SessionDate >= CURDATE() THEN
+            UPDATE GymStats gs
+            JOIN Trainer t ON t.Gym_ID = gs.Gym_ID
+            SET gs.UpcomingSessions = gs.UpcomingSessions + 1
+            WHERE t.T_ID = NEW.T_ID;
+        END IF;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS GymStatsSessionDelete//
+
+CREATE TRIGGER GymStatsSessionDelete
+AFTER DELETE ON Session
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    IF OLD.SessionDate >= CURDATE() THEN
+        UPDATE GymStats gs
+        JOIN Trainer t ON t.Gym_ID = gs.Gym_ID
+        SET gs.UpcomingSessions = gs.UpcomingSessions - 1
+        WHERE t.T_ID = OLD.T_ID;
+    END IF;
+END//
+
+DELIMITER ;
+
+-- ============================================================================
+-- TRIGGER 15: GymStatsPriceChange
+-- Type: AFTER UPDATE
+-- Purpose: Re-price revenue counters when a membership plan price changes
+-- Table: MembershipType
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS GymStatsPriceChange//
+
+CREATE TRIGGER GymStatsPriceChange
+AFTER UPDATE ON MembershipType
+FOR EACH ROW
+BEGIN
+    IF OLD.Price <> NEW.Price THEN
+        UPDATE GymStats gs
+        JOIN (
+            SELECT Gym_ID,
+                   COUNT(*) AS member_count,
+                   SUM(IF(IsActive, 1, 0)) AS active_count
+            FROM Member
+            WHERE MembershipType_ID = NEW.Type_ID
+            GROUP BY Gym_ID
+        ) mc ON mc.Gym_ID = gs.Gym_ID
+        SET gs.TotalRevenue = gs.TotalRevenue + (NEW.Price - OLD.Price) * mc.member_count,
+            gs.ActiveRevenue = gs.ActiveRevenue + (NEW.Price - OLD.Price) * mc.active_count;
+    END IF;
+END//
+
+DELIMITER ;
+
+-- ============================================================================
+-- TRIGGER 16: MaintainTrainerClient
+-- Type: AFTER INSERT, AFTER DELETE on WorkoutLog; BEFORE DELETE on Session
+-- Purpose: Keep the TrainerClient relationship index current on booking,
+--          cancellation and workout logging
+-- Table: WorkoutLog, Session
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS TrainerClientWorkoutInsert//
+
+CREATE TRIGGER TrainerClientWorkoutInsert
+AFTER INSERT ON WorkoutLog
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE trainer_id INT DEFAULT NULL;
+    DECLARE session_date DATE;
+    DECLARE last_workout DATE;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    -- Any workout moves the member's last workout date forward
+    IF NEW.Date IS NOT NULL THEN
+        UPDATE TrainerClient
+        SET LastWorkout = GREATEST(COALESCE(LastWorkout, NEW.Date), NEW.Date)
+        WHERE M_ID = NEW.M_ID;
+    END IF;
+
+    -- Session workouts and bookings create or extend the relationship
+    IF NEW.S_ID IS NOT NULL THEN
+        SELECT T_ID, SessionDate INTO trainer_id, session_date
+        FROM Session
+        WHERE S_ID = NEW.S_ID;
+
+        IF trainer_id IS NOT NULL THEN
+            SELECT MAX(Date) INTO last_workout
+            FROM WorkoutLog
+            WHERE M_ID = NEW.M_ID;
+
+            INSERT INTO TrainerClient (T_ID, M_ID, FirstSession, LastSession, SessionCount, LastWorkout)
+            VALUES (trainer_id, NEW.M_ID, session_date, session_date, 1, last_workout)
+            ON DUPLICATE KEY UPDATE
+                FirstSession = LEAST(COALESCE(FirstSession, VALUES(FirstSession)), VALUES(FirstSession)),
+                LastSession = GREATEST(COALESCE(LastSession, VALUES(LastSession)), VALUES(LastSession)),
+                SessionCount = SessionCount + 1;
+        END IF;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS TrainerClientWorkoutDelete//
+
+CREATE TRIGGER TrainerClientWorkoutDelete
+AFTER DELETE ON WorkoutLog
+FOR EACH ROW
+shard_copy: BEGIN
+    DECLARE trainer_id INT DEFAULT NULL;
+
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    IF OLD.S_ID IS NOT NULL THEN
+        SELECT T_ID INTO trainer_id
+        FROM Session
+        WHERE S_ID = OLD.S_ID;
+
+        IF trainer_id IS NOT NULL THEN
+            UPDATE TrainerClient
+            SET SessionCount = SessionCount - 1
+            WHERE T_ID = trainer_id AND M_ID = OLD.M_ID;
+
+            DELETE FROM TrainerClient
+            WHERE T_ID = trainer_id AND M_ID = OLD.M_ID AND SessionCount <= 0;
+
+            -- Recompute the session window for this pair only (member-indexed)
+            UPDATE TrainerClient
+            SET FirstSession = (SELECT MIN(s.SessionDate) FROM WorkoutLog wl
+                                JOIN Session s ON wl.S_ID = s.S_ID
+                                WHERE wl.M_ID = OLD.M_ID AND s.T_ID = trainer_id),
+                LastSession = (SELECT MAX(s.SessionDate) FROM WorkoutLog wl
+                               JOIN Session s ON wl.S_ID = s.S_ID
+                               WHERE wl.M_ID = OLD.M_ID AND s.T_ID = trainer_id)
+            WHERE T_ID = trainer_id AND M_ID = OLD.M_ID;
+        END IF;
+    END IF;
+
+    -- Removing the member's latest row moves their last workout date back
+    UPDATE TrainerClient
+    SET LastWorkout = (SELECT MAX(Date) FROM WorkoutLog WHERE M_ID = OLD.M_ID)
+    WHERE M_ID = OLD.M_ID
+      AND LastWorkout = OLD.Date;
+END//
+
+DROP TRIGGER IF EXISTS TrainerClientSessionDelete//
+
+CREATE TRIGGER TrainerClientSessionDelete
+BEFORE DELETE ON Session
+FOR EACH ROW
+shard_copy: BEGIN
+    IF @gymfit_shard_copy THEN
+        LEAVE shard_copy;
+    END IF;
+
+    -- WorkoutLog.S_ID is SET NULL by the cascade, which fires no triggers
+    UPDATE TrainerClient tc
+    JOIN (
+        SELECT M_ID, COUNT(*) AS removed
+        FROM WorkoutLog
+        WHERE S_ID = OLD.S_ID
+        GROUP BY M_ID
+    ) r ON r.M_ID = tc.M_ID
+    SET tc.SessionCount = tc.SessionCount - r.removed
+    WHERE tc.T_ID = OLD.T_ID;
+
+    DELETE FROM TrainerClient
+    WHERE T_ID = OLD.T_ID AND SessionCount <= 0;
+END//
+
+DELIMITER ;
+
+-- ============================================================================
+-- TRIGGER 17: BumpReferenceDataVersion
+-- Type: AFTER INSERT, AFTER UPDATE, AFTER DELETE
+-- Purpose: Invalidate application reference caches when Gym, MembershipType
+--          or Trainer rows change
+-- Table: Gym, MembershipType, Trainer
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS RefVersionGymInsert//
+
+CREATE TRIGGER RefVersionGymInsert
+AFTER INSERT ON Gym
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionGymUpdate//
+
+CREATE TRIGGER RefVersionGymUpdate
+AFTER UPDATE ON Gym
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionGymDelete//
+
+CREATE TRIGGER RefVersionGymDelete
+AFTER DELETE ON Gym
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionTypeInsert//
+
+CREATE TRIGGER RefVersionTypeInsert
+AFTER INSERT ON MembershipType
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionTypeUpdate//
+
+CREATE TRIGGER RefVersionTypeUpdate
+AFTER UPDATE ON MembershipType
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionTypeDelete//
+
+CREATE TRIGGER RefVersionTypeDelete
+AFTER DELETE ON MembershipType
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionTrainerInsert//
+
+CREATE TRIGGER RefVersionTrainerInsert
+AFTER INSERT ON Trainer
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionTrainerUpdate//
+
+CREATE TRIGGER RefVersionTrainerUpdate
+AFTER UPDATE ON Trainer
+FOR EACH ROW
+BEGIN
+    -- Password rehashes on login do not touch cached columns
+    IF NOT (OLD.Name <=> NEW.Name)
+       OR NOT (OLD.Email <=> NEW.Email)
+       OR NOT (OLD.Specialization <=> NEW.Specialization)
+       OR NOT (OLD.Gym_ID <=> NEW.Gym_ID) THEN
+        UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS RefVersionTrainerDelete//
+
+CREATE TRIGGER RefVersionTrainerDelete
+AFTER DELETE ON Trainer
+FOR EACH ROW
+BEGIN
+    UPDATE ReferenceDataVersion SET Version = Version + 1 WHERE ID = 1;
+END//
+
+DELIMITER ;
+
 -- ============================================================================
 -- End of Triggers
 -- ============================================================================
@@ -431,16 +1007,28 @@ DELIMITER ;
 /*
 TRIGGER SUMMARY:
 
-1. CheckSessionCapacity - Prevent overbooking sessions (BEFORE INSERT)
+1. CheckSessionCapacity - Atomic seat reservation, prevents overbooking (BEFORE INSERT)
+   ReleaseSessionCapacity - Free the seat on cancellation (AFTER DELETE)
+   ReleaseMemberBookings - Free a deleted member's seats (BEFORE DELETE on Member)
 2. CheckMembershipRenewal - Auto-renewal notifications (BEFORE UPDATE)
-3. TrackWorkoutProgress - Milestone notifications (AFTER INSERT)
+3. TrackWorkoutProgress - Retired; milestones come from the outbox consumer
 4. ValidateHealthMetrics - Validate health data ranges (BEFORE INSERT)
 5. ValidateWorkoutData - Validate workout data (BEFORE INSERT)
 6. UpdateSessionStatus - Auto-update session status (AFTER UPDATE)
-7. LogMemberActivity - Track member engagement (AFTER INSERT)
+7. LogMemberActivity - Retired; welcome message comes from the outbox consumer
 8. PreventPastSessionBooking - Block past session bookings (BEFORE INSERT)
 9. ValidateMemberAge - Validate age constraints (BEFORE INSERT/UPDATE)
 10. NotifyLowEngagement - Re-engagement notifications (AFTER UPDATE)
+11. InitGymStats - Create counter row for new gyms (AFTER INSERT)
+12. GymStatsMember* - Maintain member and revenue counters (AFTER INSERT/UPDATE/DELETE)
+13. GymStatsTrainer* - Maintain trainer counters (AFTER INSERT/UPDATE, BEFORE DELETE)
+14. GymStatsSession* - Maintain upcoming session counters (AFTER INSERT/UPDATE/DELETE)
+15. GymStatsPriceChange - Re-price revenue counters (AFTER UPDATE)
+16. TrainerClient* - Maintain trainer-client relationship index (AFTER INSERT/DELETE)
+17. RefVersion* - Invalidate cached Gym/MembershipType/Trainer data (AFTER INSERT/UPDATE/DELETE)
+
+All triggers except InitGymStats, GymStatsPriceChange and RefVersion* are
+skipped while @gymfit_shard_copy is set (shard moves, see shard_rebalance.py).
 
 Trigger Types Demonstrated:
 - BEFORE INSERT: Data validation before insertion
@@ -206,21 +206,53 @@ async function handleLogout() {
     sessionStorage.clear();
     currentUser = null;
     currentRole = null;
+    sessionsLoadedAt = 0;
+    const chatMessages = document.getElementById('chatMessages');
+    if (chatMessages) chatMessages.innerHTML = '';
     destroyAllCharts();
     showRoleSelection();
     showNotification('Logged out successfully');
 }
 
+// The dashboard and its panels are fetched together through /api/batch;
+// each entry is [id, path, render]
+function dashboardRequests(role, userId) {
+    const requests = [
+        ['dashboard', `/api/dashboard/${role}/${userId}`, data => updateDashboardUI(role, data)],
+        ['notifications', '/api/notifications', data => renderNotifications(role, data)]
+    ];
+    if (role === 'member') {
+        requests.push(
+            ['progress', `/api/member/${userId}/progress?format=columnar&points=${CHART_MAX_POINTS}`, renderProgressCharts],
+            ['recommendations', `/api/member/${userId}/recommendations`, renderRecommendations],
+            ['sessions', '/api/sessions/available', renderAvailableSessions]
+        );
+    }
+    return requests;
+}
+
 async function loadDashboard(role, userId) {
-    const data = await apiRequest(`/dashboard/${role}/${userId}`);
-    if (data) {
-        updateDashboardUI(role, data);
-        loadNotifications(role);
-        if (role === 'member') {
-            loadProgressCharts(userId);
-            loadRecommendations(userId);
-        }
+    const requests = dashboardRequests(role, userId);
+    const data = await apiRequest('/batch', 'POST', {
+        requests: requests.map(([id, path]) => ({ id, path }))
+    });
+    if (!data) return;
+
+    const responses = data.responses || [];
+    if (responses.some(response => response.status === 401)) {
+        handleLogout();
+        showNotification('Your session has expired. Please log in again.', 'error');
+        return;
     }
+    responses.forEach((response, i) => {
+        const [id, path, render] = requests[i];
+        if (response.status === 200) {
+            render(response.body);
+        } else {
+            console.error(`Batch request ${id} (${path}) failed:`, response.body?.error);
+            if (id === 'dashboard') showNotification(response.body?.error || 'Failed to load dashboard', 'error');
+        }
+    });
 }
 
 // --- Dashboard UI Updates ---
@@ -353,7 +385,7 @@ function updateAdminDashboard(data) {
 // --- Modal & Form Logic ---
 
 function openModal(modalId) {
-    if (modalId === 'sessionModal') {
+    if (modalId === 'sessionModal' && Date.now() - sessionsLoadedAt > SESSIONS_STALE_MS) {
         loadAvailableSessions();
     }
     const modal = document.getElementById(modalId);
@@ -397,8 +429,17 @@ async function handleAddWorkout(e) {
     }
 }
 
+// Available sessions arrive with the member dashboard batch; opening the
+// booking modal refetches them only once they are older than this
+const SESSIONS_STALE_MS = 60000;
+let sessionsLoadedAt = 0;
+
 async function loadAvailableSessions() {
     const data = await apiRequest('/sessions/available');
+    renderAvailableSessions(data);
+}
+
+function renderAvailableSessions(data) {
     const sessionList = document.getElementById('availableSessionsList');
     if (data && data.sessions && sessionList) {
         sessionList.innerHTML = data.sessions.length ? data.sessions.map(session => `
@@ -414,15 +455,17 @@ async function loadAvailableSessions() {
                 <button class="btn-primary" onclick="bookSession(${session.S_ID})">Book</button>
             </div>
         `).join('') : '<div class="empty-state">No sessions available at the moment.</div>';
+        sessionsLoadedAt = Date.now();
     }
 }
 
 async function bookSession(sessionId) {
-    const data = await apiRequest('/sessions/book', 'POST', { session_id: sessionId });
+    // If the last seat is taken meanwhile, queue on the waitlist instead of failing
+    const data = await apiRequest('/sessions/book', 'POST', { session_id: sessionId, join_waitlist: true });
     if (data && data.success) {
         closeModal('sessionModal');
         loadDashboard(currentUser.role, currentUser.id);
-        showNotification('Session booked successfully!');
+        showNotification(data.waitlisted ? data.message : 'Session booked successfully!');
     }
 }
 
@@ -535,7 +578,7 @@ async function sendChatMessage() {
     }
 }
 
-function addChatMessage(message, type, isMarkdown = false) {
+function addChatMessage(message, type, isMarkdown = false, time = new Date()) {
     const chatMessages = document.getElementById('chatMessages');
     const messageDiv = document.createElement('div');
     messageDiv.className = `chat-message ${type}`;
@@ -551,7 +594,7 @@ function addChatMessage(message, type, isMarkdown = false) {
     
     messageDiv.innerHTML = `
         <div class="message-content">${formattedMessage}</div>
-        <div class="message-time">${new Date().toLocaleTimeString('en-US', { hour: 'numeric', minute: '2-digit' })}</div>
+        <div class="message-time">${time.toLocaleTimeString('en-US', { hour: 'numeric', minute: '2-digit' })}</div>
     `;
     
     chatMessages.appendChild(messageDiv);
@@ -590,9 +633,9 @@ function parseMarkdown(text) {
     return text;
 }
 
-function openChatbot() {
+async function openChatbot() {
     openModal('chatbotModal');
-    // Initialize with welcome message if chat is empty
+    // Initialize with welcome message and saved history if chat is empty
     const chatMessages = document.getElementById('chatMessages');
     if (chatMessages && chatMessages.children.length === 0) {
         const welcomeMsg = `👋 **Hello ${currentUser.name}!** I'm your AI fitness assistant powered by advanced AI.
@@ -607,6 +650,16 @@ I can help you with:
 
 Ask me anything about your fitness journey!`;
         addChatMessage(welcomeMsg, 'bot', true);
+
+        const history = await apiRequest(`/member/${currentUser.id}/chat/history`);
+        if (Array.isArray(history)) {
+            history.forEach(message => addChatMessage(
+                message.content,
+                message.role === 'user' ? 'user' : 'bot',
+                message.role !== 'user',
+                message.createdAt ? new Date(message.createdAt) : new Date()
+            ));
+        }
     }
 }
 
@@ -689,12 +742,19 @@ function destroyAllCharts() {
     chartInstances = {};
 }
 
+// Long weight/calorie histories are downsampled server-side to about this many points
+const CHART_MAX_POINTS = 200;
+
 async function loadProgressCharts(memberId) {
-    const data = await apiRequest(`/member/${memberId}/progress`);
+    const data = await apiRequest(`/member/${memberId}/progress?format=columnar&points=${CHART_MAX_POINTS}`);
+    renderProgressCharts(data);
+}
+
+function renderProgressCharts(data) {
     if (data) {
-        renderWorkoutFrequencyChart(data.workoutFrequency || []);
-        renderWeightProgressChart(data.weightProgress || []);
-        renderCalorieTrendChart(data.calorieTrend || []);
+        renderWorkoutFrequencyChart(data.workoutFrequency || { dates: [], counts: [] });
+        renderWeightProgressChart(data.weightProgress || { dates: [], weights: [] });
+        renderCalorieTrendChart(data.calorieTrend || { dates: [], calories: [] });
     }
 }
 
@@ -711,10 +771,10 @@ function renderWorkoutFrequencyChart(data) {
     chartInstances[chartId] = new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: data.map(d => formatDate(d.Date)),
+            labels: data.dates.map(formatDate),
             datasets: [{
                 label: 'Workouts',
-                data: data.map(d => d.workout_count),
+                data: data.counts,
                 backgroundColor: 'rgba(79, 70, 229, 0.7)',
                 borderColor: 'rgba(79, 70, 229, 1)',
                 borderWidth: 1
@@ -753,10 +813,10 @@ function renderWeightProgressChart(data) {
     chartInstances[chartId] = new Chart(ctx, {
         type: 'line',
         data: {
-            labels: data.map(d => formatDate(d.Date)),
+            labels: data.dates.map(formatDate),
             datasets: [{
                 label: 'Weight (kg)',
-                data: data.map(d => d.Weight),
+                data: data.weights,
                 borderColor: 'rgba(79, 70, 229, 1)',
                 backgroundColor: 'rgba(79, 70, 229, 0.1)',
                 fill: true,
@@ -793,10 +853,10 @@ function renderCalorieTrendChart(data) {
     chartInstances[chartId] = new Chart(ctx, {
         type: 'line',
         data: {
-            labels: data.map(d => formatDate(d.Date)),
+            labels: data.dates.map(formatDate),
             datasets: [{
                 label: 'Calories Burnt',
-                data: data.map(d => d.daily_calories),
+                data: data.calories,
                 borderColor: 'rgba(5, 150, 105, 1)',
                 backgroundColor: 'rgba(5, 150, 105, 0.1)',
                 fill: true,
@@ -822,6 +882,10 @@ function renderCalorieTrendChart(data) {
 
 async function loadRecommendations(memberId) {
     const data = await apiRequest(`/member/${memberId}/recommendations`);
+    renderRecommendations(data);
+}
+
+function renderRecommendations(data) {
     const recommendationsList = document.getElementById('recommendationsList');
     if (data && data.recommendations && recommendationsList) {
         recommendationsList.innerHTML = data.recommendations.length ? data.recommendations.map(rec => `
@@ -840,6 +904,10 @@ async function loadRecommendations(memberId) {
 
 async function loadNotifications(role) {
     const data = await apiRequest('/notifications');
+    renderNotifications(role, data);
+}
+
+function renderNotifications(role, data) {
     if (data && data.notifications) {
         const unreadCount = data.notifications.filter(n => !n.IsRead).length;
         const badge = document.getElementById(`${role}NotificationBadge`);